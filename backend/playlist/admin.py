@@ -1,5 +1,6 @@
 from django.contrib import admin
-from .models import Track, PlaylistTrack
+from django.db import transaction
+from .models import Playlist, Track, PlaylistTrack
 
 
 @admin.register(Track)
@@ -8,10 +9,35 @@ class TrackAdmin(admin.ModelAdmin):
     search_fields = ['title', 'artist', 'album']
     list_filter = ['genre']
 
+    # save_model() and delete_model() go through Track.save() and
+    # Track.delete(); a bulk delete does not
+    def delete_queryset(self, request, queryset):
+        with transaction.atomic():
+            Track.changed(queryset)
+            super().delete_queryset(request, queryset)
+
 
 @admin.register(PlaylistTrack)
 class PlaylistTrackAdmin(admin.ModelAdmin):
-    list_display = ['id', 'track', 'position', 'votes', 'added_by', 'added_at', 'is_playing']
-    list_filter = ['is_playing', 'added_at']
+    list_display = ['id', 'playlist', 'track', 'position', 'votes', 'added_by', 'added_at', 'is_playing']
+    list_filter = ['playlist', 'is_playing', 'added_at']
     search_fields = ['track__title', 'track__artist', 'added_by']
 
+    # Edits made here bypass the playlist services, so bump the room's version
+    # to expire cached responses and make clients resync on their next event
+    def save_model(self, request, obj, form, change):
+        if obj.is_playing and 'is_playing' in form.changed_data:
+            # Only one item per room may play; the admin view is atomic
+            obj.start_playing()
+        super().save_model(request, obj, form, change)
+        Playlist.next_version(obj.playlist_id)
+
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        Playlist.next_version(obj.playlist_id)
+
+    def delete_queryset(self, request, queryset):
+        rooms = set(queryset.values_list('playlist_id', flat=True))
+        super().delete_queryset(request, queryset)
+        for room in rooms:
+            Playlist.next_version(room)
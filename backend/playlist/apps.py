@@ -1,7 +1,28 @@
 from django.apps import AppConfig
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_migrate
+
+
+def restore_search_index(sender, using, **kwargs):
+    """Recreate the search index if a migration rebuilt the track table"""
+    from django.db import connections
+    from django.db.migrations.recorder import MigrationRecorder
+    from .search import ensure_search_index
+
+    connection = connections[using]
+    # Leave it alone while the migration that adds it is unapplied
+    if ('playlist', '0007_track_search_index') in MigrationRecorder(connection).applied_migrations():
+        ensure_search_index(connection)
 
 
 class PlaylistConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'playlist'
 
+    def ready(self):
+        from .budgets import install_query_recorder
+        from .database import configure_sqlite
+
+        connection_created.connect(configure_sqlite)
+        connection_created.connect(install_query_recorder)
+        post_migrate.connect(restore_search_index, sender=self)
@@ -0,0 +1,25 @@
+from django.urls import include, path, re_path
+from . import async_views
+from .utils import ROOM_ID_PATTERN
+
+# Playlist routes, served for the default room at /api/playlist and for any
+# other room at /api/rooms/<room>/playlist
+playlist_patterns = [
+    path('playlist', async_views.playlist_list, name='playlist-list'),
+    path('playlist/mode', async_views.playlist_mode, name='playlist-mode'),
+    path('playlist/batch', async_views.playlist_batch, name='playlist-batch'),
+    path('playlist/<str:playlist_id>', async_views.playlist_update, name='playlist-update'),
+    path('playlist/<str:playlist_id>/vote', async_views.playlist_vote, name='playlist-vote'),
+    path('playlist/<str:playlist_id>/reorder', async_views.playlist_reorder, name='playlist-reorder'),
+]
+
+urlpatterns = [
+    path('tracks', async_views.tracks_list, name='tracks-list'),
+    path('tracks/search', async_views.tracks_search, name='tracks-search'),
+    path('cache/stats', async_views.cache_stats_view, name='cache-stats'),
+    path('sockets/stats', async_views.socket_stats_view, name='socket-stats'),
+    path('metrics', async_views.metrics_view, name='metrics'),
+    path('metrics/prometheus', async_views.prometheus_metrics_view, name='metrics-prometheus'),
+    *playlist_patterns,
+    re_path(rf'^rooms/(?P<room>{ROOM_ID_PATTERN})/', include((playlist_patterns, 'room'))),
+]
@@ -0,0 +1,227 @@
+"""
+Async versions of the playlist REST views for ASGI deployments.
+
+Under Daphne every sync view runs in a thread from the sync executor and
+every broadcast hops threads again through async_to_sync. These views run
+on the event loop instead: each cached read and each mutation makes a
+single database_sync_to_async call, and mutations then await group_send
+directly.
+
+They do not use Django's async ORM (aget, async for). In Django 5.0 it
+wraps every query in sync_to_async, so it would add a thread hop per query
+and could not span transaction.atomic. Nor do they save threads: Django's
+ASGI handler gives each request a thread of its own for the request
+signals and the sync middleware, whichever views serve it.
+
+Enabled with PLAYLIST_ASYNC_VIEWS=True; responses match the DRF views.
+"""
+
+import json
+from functools import wraps
+
+from channels.db import database_sync_to_async
+from django.http import Http404, HttpResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_http_methods
+from rest_framework.renderers import JSONRenderer
+
+from . import services
+from .caching import cache_stats, cached_playlist, cached_tracks
+from .events import abroadcast_events
+from .metrics import metrics, prometheus_metrics, timed_service
+from .models import Playlist
+from .outbox import outbox_stats
+from .services import PlaylistError
+from .votes import get_vote_buffer
+
+
+def json_response(data, status=200, headers=None):
+    """Render a response exactly as the DRF views do"""
+    content = JSONRenderer().render(data) if data is not None else b''
+    return HttpResponse(content, status=status, headers=headers, content_type='application/json')
+
+
+def parse_body(request):
+    """Parse a JSON request body, raising ValueError if it is malformed"""
+    if not request.body:
+        return {}
+    data = json.loads(request.body)
+    if not isinstance(data, dict):
+        raise ValueError('JSON body must be an object')
+    return data
+
+
+def cached_response(data, headers):
+    """Response for a cached GET, empty if the client's copy is current"""
+    if data is None:
+        return json_response(None, status=304, headers=headers)
+    return json_response(data, headers=headers)
+
+
+async def run_mutation(service, *args, status=200):
+    """Run a playlist service in one DB hop, then broadcast its events"""
+    try:
+        with timed_service(service.__name__):
+            data, events = await database_sync_to_async(service)(*args)
+    except PlaylistError as error:
+        return json_response(error.as_data(), status=error.status)
+    except Http404:
+        return json_response({'detail': 'Not found.'}, status=404)
+
+    await abroadcast_events(events)
+    return json_response(data, status=status)
+
+
+def with_body(view):
+    """Parse the JSON body into a `body` argument, rejecting malformed JSON"""
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        try:
+            body = parse_body(request)
+        except ValueError as error:
+            return json_response({'detail': f'JSON parse error - {error}'}, status=400)
+        return await view(request, body, *args, **kwargs)
+    return wrapper
+
+
+@require_http_methods(['GET'])
+async def tracks_list(request):
+    """GET /api/tracks - Get one page of the track library, optionally filtered"""
+    try:
+        with timed_service('cached_tracks'):
+            tracks, headers = await database_sync_to_async(cached_tracks)(
+                request.GET, request.headers.get('If-None-Match')
+            )
+    except PlaylistError as error:
+        return json_response(error.as_data(), status=error.status)
+    return cached_response(tracks, headers)
+
+
+@require_http_methods(['GET'])
+async def tracks_search(request):
+    """GET /api/tracks/search - Ranked prefix search of the track library"""
+    try:
+        with timed_service('search_tracks'):
+            tracks = await database_sync_to_async(services.search_tracks)(
+                request.GET.get('q', '').strip(),
+                request.GET.get('limit', services.SEARCH_LIMIT)
+            )
+    except PlaylistError as error:
+        return json_response(error.as_data(), status=error.status)
+    return json_response(tracks)
+
+
+@csrf_exempt
+@require_http_methods(['GET', 'POST'])
+@with_body
+async def playlist_list(request, body, room=Playlist.DEFAULT_ID):
+    """GET /api/playlist - Get current playlist ordered by position
+       POST /api/playlist - Add track to playlist"""
+    if request.method == 'GET':
+        with timed_service('cached_playlist'):
+            cached = await database_sync_to_async(cached_playlist)(
+                request.headers.get('If-None-Match'), room
+            )
+        return cached_response(*cached)
+
+    return await run_mutation(
+        services.add_track,
+        body.get('track_id'),
+        body.get('added_by', 'Anonymous'),
+        room,
+        status=201
+    )
+
+
+@csrf_exempt
+@require_http_methods(['GET', 'PUT'])
+@with_body
+async def playlist_mode(request, body, room=Playlist.DEFAULT_ID):
+    """GET /api/playlist/mode - Get the queue mode (position or votes)
+       PUT /api/playlist/mode - Switch the queue mode"""
+    if request.method == 'GET':
+        return json_response(await database_sync_to_async(services.get_queue_mode)(room))
+
+    return await run_mutation(services.set_queue_mode, body.get('mode'), room)
+
+
+@csrf_exempt
+@require_http_methods(['POST'])
+@with_body
+async def playlist_batch(request, body, room=Playlist.DEFAULT_ID):
+    """POST /api/playlist/batch - Apply several operations in one transaction"""
+    return await run_mutation(services.apply_batch, body.get('operations'), room)
+
+
+@csrf_exempt
+@require_http_methods(['PATCH', 'DELETE'])
+@with_body
+async def playlist_update(request, body, playlist_id, room=Playlist.DEFAULT_ID):
+    """PATCH /api/playlist/{id} - Update position or playing status
+       DELETE /api/playlist/{id} - Remove track from playlist"""
+    if request.method == 'DELETE':
+        try:
+            with timed_service('remove_track'):
+                events = await database_sync_to_async(services.remove_track)(playlist_id, room)
+        except Http404:
+            return json_response({'detail': 'Not found.'}, status=404)
+        await abroadcast_events(events)
+        return json_response(None, status=204)
+
+    return await run_mutation(services.update_track, playlist_id, body, room)
+
+
+@csrf_exempt
+@require_http_methods(['POST'])
+@with_body
+async def playlist_vote(request, body, playlist_id, room=Playlist.DEFAULT_ID):
+    """POST /api/playlist/{id}/vote - Vote on a track"""
+    buffer = get_vote_buffer()
+    if buffer is None:
+        return await run_mutation(
+            services.vote_track, playlist_id, body.get('direction', 'up'), room
+        )
+
+    # Coalesce with the other votes arriving in this window
+    try:
+        delta = services.vote_delta(body.get('direction', 'up'))
+        data = await buffer.add(playlist_id, delta, room)
+    except PlaylistError as error:
+        return json_response(error.as_data(), status=error.status)
+    except Http404:
+        return json_response({'detail': 'Not found.'}, status=404)
+    return json_response(data)
+
+
+@csrf_exempt
+@require_http_methods(['POST'])
+@with_body
+async def playlist_reorder(request, body, playlist_id, room=Playlist.DEFAULT_ID):
+    """POST /api/playlist/{id}/reorder - Reorder track to a new position"""
+    return await run_mutation(
+        services.reorder_track, playlist_id, body.get('target_index'), room
+    )
+
+
+@require_http_methods(['GET'])
+async def cache_stats_view(request):
+    """GET /api/cache/stats - Response cache hit rates for this process"""
+    return json_response(cache_stats())
+
+
+@require_http_methods(['GET'])
+async def socket_stats_view(request):
+    """GET /api/sockets/stats - WebSocket outbound queues of this process"""
+    return json_response(outbox_stats())
+
+
+@require_http_methods(['GET'])
+async def metrics_view(request):
+    """GET /api/metrics - Realtime pipeline latency histograms of this process"""
+    return json_response(metrics())
+
+
+@require_http_methods(['GET'])
+async def prometheus_metrics_view(request):
+    """GET /api/metrics/prometheus - The same in the Prometheus text format"""
+    return HttpResponse(prometheus_metrics(), content_type='text/plain; version=0.0.4')
@@ -0,0 +1,29 @@
+"""
+Performance benchmarks for the playlist backend.
+
+Each benchmark module exposes ``add_arguments(parser)`` and
+``run(**options)``, which returns a list of result rows (dicts).
+Run with: python manage.py benchmark <name>
+"""
+
+from . import (
+    broadcast, layers, load, mutations, playback, positions, ranking, rest, rooms, search,
+    serialize, votes, wire, writes,
+)
+
+BENCHMARKS = {
+    'broadcast': broadcast,
+    'layers': layers,
+    'load': load,
+    'mutations': mutations,
+    'playback': playback,
+    'positions': positions,
+    'ranking': ranking,
+    'rest': rest,
+    'rooms': rooms,
+    'search': search,
+    'serialize': serialize,
+    'votes': votes,
+    'wire': wire,
+    'writes': writes,
+}
@@ -0,0 +1,92 @@
+"""
+Saving benchmark results as a JSON baseline and comparing later runs to it.
+
+Rows are compared in order. String and integer fields other than the
+counters describe the run (mode, sizes, client counts) and must match
+between the baseline and the new run. Float fields are metrics: their
+name says which way is better, and a metric that is worse than the
+baseline by more than the tolerance is a regression. Counters such as
+errors regress when they exceed the baseline by more than the tolerance.
+"""
+
+import json
+
+
+# Units in a metric's name for which a lower value is better (p99_ms,
+# cpu_us_per_room, peak_rss_mb, bytes_per_frame)
+LOWER_IS_BETTER = {'ms', 'us', 'bytes', 'kb', 'mb', 'seconds'}
+# Integer fields that count failures rather than describe the run
+COUNTERS = ('errors', 'undelivered')
+
+
+class BaselineMismatch(Exception):
+    """The baseline was recorded by another benchmark or with other options"""
+
+
+def save_baseline(path, benchmark, rows):
+    with open(path, 'w') as file:
+        json.dump({'benchmark': benchmark, 'rows': rows}, file, indent=2)
+        file.write('\n')
+
+
+def load_baseline(path, benchmark):
+    with open(path) as file:
+        baseline = json.load(file)
+    if baseline.get('benchmark') != benchmark:
+        raise BaselineMismatch(f'{path} is a baseline of {baseline.get("benchmark")!r}, not {benchmark!r}')
+    return baseline['rows']
+
+
+def run_fields(row):
+    """The fields of a row that describe the run rather than measure it"""
+    return {
+        key: value for key, value in row.items()
+        if not isinstance(value, float) and key not in COUNTERS
+    }
+
+
+def direction(key):
+    """-1 if lower is better, 1 if higher is better, 0 if not compared"""
+    if key.endswith('_per_sec') or key == 'speedup':
+        return 1
+    if LOWER_IS_BETTER.intersection(key.split('_')):
+        return -1
+    return 0
+
+
+def compare_rows(baseline_rows, rows, tolerance):
+    """
+    Find the metrics of `rows` that regressed against the baseline.
+
+    Raises:
+        BaselineMismatch: If the runs are not the same as the baseline's
+
+    Returns:
+        list: Descriptions of the regressions, empty if there are none
+    """
+    if len(baseline_rows) != len(rows):
+        raise BaselineMismatch(f'Baseline has {len(baseline_rows)} rows, this run {len(rows)}')
+
+    regressions = []
+    for old, new in zip(baseline_rows, rows):
+        fields = run_fields(new)
+        if run_fields(old) != fields:
+            raise BaselineMismatch(f'Baseline row {run_fields(old)} does not match {fields}')
+        label = ' '.join(f'{key}={value}' for key, value in fields.items())
+        for key, value in new.items():
+            before = old.get(key)
+            if before is None:
+                continue
+            if key in COUNTERS:
+                worse = value > before * (1 + tolerance)
+            elif isinstance(value, float):
+                sign = direction(key)
+                worse = (
+                    (sign < 0 and value > before * (1 + tolerance))
+                    or (sign > 0 and value < before * (1 - tolerance))
+                )
+            else:
+                continue
+            if worse:
+                regressions.append(f'{label}: {key} {before:g} -> {value:g}')
+    return regressions
@@ -0,0 +1,124 @@
+"""
+Encode CPU per broadcast event as the number of subscribers grows.
+
+Compares the legacy fan-out, where every consumer handler called
+``json.dumps`` on the event, against pre-encoded frames built once by
+``broadcast_to_group``. Both paths go through an InMemoryChannelLayer
+group with one channel per simulated socket.
+"""
+
+import asyncio
+import json
+import time
+
+from channels.layers import InMemoryChannelLayer
+
+from playlist.consumers import PlaylistConsumer, build_group_message
+
+
+SAMPLE_EVENT = {
+    'type': 'track.added',
+    'item': {
+        'id': 'playlist-item-0123456789ab',
+        'track_id': 'track-1',
+        'track': {
+            'id': 'track-1',
+            'title': 'Bohemian Rhapsody',
+            'artist': 'Queen',
+            'album': 'A Night at the Opera',
+            'duration_seconds': 355,
+            'genre': 'Rock',
+            'cover_url': '/rock-guitar-concert.jpg',
+        },
+        'position': 11.0,
+        'votes': 0,
+        'added_by': 'Anonymous',
+        'added_at': '2025-01-27T10:00:00Z',
+        'is_playing': False,
+        'played_at': None,
+    },
+}
+
+
+class SinkConsumer(PlaylistConsumer):
+    """PlaylistConsumer whose socket just counts outgoing frames"""
+
+    def __init__(self):
+        super().__init__()
+        self.frames = 0
+
+    async def send(self, text_data=None, bytes_data=None, close=False):
+        self.frames += 1
+
+    async def queue_event(self, frame, label='event'):
+        # No socket, so no outbox or writer task: send straight away
+        await self.send(text_data=frame)
+
+
+async def legacy_track_added(consumer, event):
+    """The handler as it was before frames were pre-encoded"""
+    await consumer.send(text_data=json.dumps({
+        'type': 'track.added',
+        'item': event['item']
+    }))
+
+
+def add_arguments(parser):
+    parser.add_argument(
+        '--subscribers',
+        default='1,10,100,1000,2000',
+        help='Comma-separated subscriber counts to measure',
+    )
+    parser.add_argument(
+        '--events',
+        type=int,
+        default=20,
+        help='Events broadcast per subscriber count',
+    )
+
+
+async def fan_out(layer, channels, consumer, message, handler):
+    await layer.group_send('playlist', message)
+    # Drain the channel queues directly: InMemoryChannelLayer.receive() sweeps
+    # every channel for expired messages on each call, which would swamp the
+    # encode cost being measured here.
+    for channel in channels:
+        _, received = layer.channels.pop(channel).get_nowait()
+        await handler(consumer, received)
+
+
+async def measure(subscribers, events):
+    layer = InMemoryChannelLayer()
+    channels = [await layer.new_channel() for _ in range(subscribers)]
+    for channel in channels:
+        await layer.group_add('playlist', channel)
+    consumer = SinkConsumer()
+
+    start = time.process_time()
+    for _ in range(events):
+        legacy_message = {'type': 'track_added', **SAMPLE_EVENT}
+        await fan_out(layer, channels, consumer, legacy_message, legacy_track_added)
+    legacy = (time.process_time() - start) / events
+
+    start = time.process_time()
+    for _ in range(events):
+        message = build_group_message(SAMPLE_EVENT)
+        await fan_out(layer, channels, consumer, message, PlaylistConsumer.track_added)
+    frames = (time.process_time() - start) / events
+
+    return legacy, frames
+
+
+def run(subscribers, events, **options):
+    rows = []
+    for count in (int(n) for n in subscribers.split(',')):
+        legacy, frames = asyncio.run(measure(count, events))
+        rows.append({
+            'subscribers': count,
+            'legacy_encodes': count,
+            'frame_encodes': 1,
+            'legacy_ms_per_event': legacy * 1000,
+            'frame_ms_per_event': frames * 1000,
+            'speedup': legacy / frames if frames else 0.0,
+        })
+    return rows
@@ -0,0 +1,162 @@
+"""
+Shared helpers for benchmarks that drive the app in-process.
+
+Benchmarks run against a throwaway test database and call the Django ASGI
+application directly, so no server, network or outside service is needed.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import tempfile
+import time
+from contextlib import contextmanager
+
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import override_settings
+
+from playlist.models import Track, PlaylistTrack
+
+
+@contextmanager
+def benchmark_database():
+    """
+    Create a fresh test database for the duration of a benchmark.
+
+    SQLite test databases default to a shared-cache in-memory database,
+    whose table locks fail immediately under concurrent requests; a
+    temporary file behaves like the real deployment instead.
+    """
+    # Failed requests are counted by the benchmarks, not logged one by one
+    request_logger = logging.getLogger('django.request')
+    old_level = request_logger.level
+    request_logger.setLevel(logging.CRITICAL)
+
+    # Versions start over in the new database, so responses cached under
+    # the same keys by an earlier run would be served again
+    cache.clear()
+
+    old_name = connection.settings_dict['NAME']
+    test_settings = connection.settings_dict.setdefault('TEST', {})
+    old_test_name = test_settings.get('NAME')
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        if connection.vendor == 'sqlite':
+            test_settings['NAME'] = os.path.join(tmp_dir, 'benchmark.sqlite3')
+        connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            with override_settings(ROOT_URLCONF='playlist.benchmarks.urls'):
+                yield
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            test_settings['NAME'] = old_test_name
+            request_logger.setLevel(old_level)
+
+
+def create_playlist(size, prefix='bench'):
+    """Fill the library and playlist with `size` tracks; returns item IDs"""
+    tracks = [
+        Track(
+            id=f'{prefix}-track-{i}',
+            title=f'Track {i}',
+            artist=f'Artist {i % 50}',
+            album=f'Album {i % 200}',
+            duration_seconds=180 + i % 120,
+            genre='Rock',
+        )
+        for i in range(size)
+    ]
+    Track.objects.bulk_create(tracks)
+    items = [
+        PlaylistTrack(
+            id=f'{prefix}-item-{i}',
+            track=track,
+            position=float(i + 1),
+        )
+        for i, track in enumerate(tracks)
+    ]
+    PlaylistTrack.objects.bulk_create(items)
+    return [item.id for item in items]
+
+
+async def asgi_request(app, method, path, body=None, headers=()):
+    """
+    Send one HTTP request straight to an ASGI application.
+
+    Returns:
+        tuple: (status code, response headers dict, response body bytes)
+    """
+    path, _, query = path.partition('?')
+    scope = {
+        'type': 'http',
+        'asgi': {'version': '3.0'},
+        'http_version': '1.1',
+        'method': method,
+        'scheme': 'http',
+        'path': path,
+        'raw_path': path.encode(),
+        'query_string': query.encode(),
+        'root_path': '',
+        'headers': [
+            (b'host', b'localhost'),
+            (b'content-type', b'application/json'),
+            *headers,
+        ],
+        'client': ('127.0.0.1', 0),
+        'server': ('localhost', 80),
+    }
+    pending = [{
+        'type': 'http.request',
+        'body': json.dumps(body).encode() if body is not None else b'',
+        'more_body': False,
+    }]
+    response = {'status': None, 'headers': {}, 'body': b''}
+
+    async def receive():
+        if pending:
+            return pending.pop()
+        # Keep the connection open until the app is done with it
+        await asyncio.Event().wait()
+
+    async def send(message):
+        if message['type'] == 'http.response.start':
+            response['status'] = message['status']
+            response['headers'] = {
+                key.decode().lower(): value.decode() for key, value in message['headers']
+            }
+        elif message['type'] == 'http.response.body':
+            response['body'] += message.get('body', b'')
+
+    await app(scope, receive, send)
+    return response['status'], response['headers'], response['body']
+
+
+async def run_load(worker, requests, concurrency):
+    """
+    Run `requests` calls of `worker(i)` with `concurrency` in flight.
+
+    Returns:
+        tuple: (elapsed seconds, list of per-request latencies in seconds)
+    """
+    latencies = []
+    counter = iter(range(requests))
+
+    async def loop():
+        for i in counter:
+            start = time.perf_counter()
+            await worker(i)
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(loop() for _ in range(concurrency)))
+    return time.perf_counter() - start, latencies
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list of numbers"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
@@ -0,0 +1,136 @@
+"""
+Cross-process broadcast latency through the Redis pub/sub channel layer.
+
+Starts worker processes that each hold a number of channels in one group,
+as ASGI workers holding WebSocket sockets would, then broadcasts events to
+the group from the benchmark process and reports how long each event took
+to reach the last channel in every worker. Uses the local Redis-protocol
+stand-in (playlist.respserver) unless --redis-url points at a real Redis.
+"""
+
+import asyncio
+import multiprocessing
+import time
+
+from channels_redis.pubsub import RedisPubSubChannelLayer
+
+from playlist.respserver import RespServer
+
+from .harness import percentile
+
+
+GROUP = 'benchmark'
+
+
+def add_arguments(parser):
+    parser.add_argument(
+        '--processes',
+        default='1,2,4,8',
+        help='Comma-separated numbers of worker processes to measure',
+    )
+    parser.add_argument(
+        '--sockets',
+        type=int,
+        default=100,
+        help='Channels joined to the group in each worker process',
+    )
+    parser.add_argument(
+        '--events',
+        type=int,
+        default=200,
+        help='Events broadcast per measurement',
+    )
+    parser.add_argument(
+        '--interval-ms',
+        type=float,
+        default=2.0,
+        help='Pause between broadcasts, so latency is measured below saturation',
+    )
+    parser.add_argument(
+        '--redis-url',
+        default=None,
+        help='Redis to use instead of the local stand-in',
+    )
+
+
+async def receive_events(url, sockets, events, ready):
+    """Join the group and time every event's arrival on all channels"""
+    layer = RedisPubSubChannelLayer(hosts=[url])
+    channels = [await layer.new_channel() for _ in range(sockets)]
+    for channel in channels:
+        await layer.group_add(GROUP, channel)
+    ready.set()
+
+    latencies = []
+    for _ in range(events):
+        for channel in channels:
+            message = await layer.receive(channel)
+        latencies.append(time.time() - message['sent'])
+    await layer.flush()
+    return latencies
+
+
+def worker(url, sockets, events, ready, results):
+    results.put(asyncio.run(receive_events(url, sockets, events, ready)))
+
+
+async def broadcast(url, events, interval):
+    layer = RedisPubSubChannelLayer(hosts=[url])
+    # The receivers only start polling once they see their first message
+    await layer.group_send(GROUP, {'type': 'benchmark', 'sent': time.time()})
+    await asyncio.sleep(0.2)
+    start = time.perf_counter()
+    for _ in range(events):
+        await layer.group_send(GROUP, {'type': 'benchmark', 'sent': time.time()})
+        await asyncio.sleep(interval)
+    elapsed = time.perf_counter() - start
+    await layer.flush()
+    return elapsed
+
+
+def measure(url, processes, sockets, events, interval):
+    results = multiprocessing.Queue()
+    readies = [multiprocessing.Event() for _ in range(processes)]
+    workers = [
+        # One extra event for the warm-up broadcast
+        multiprocessing.Process(target=worker, args=(url, sockets, events + 1, ready, results))
+        for ready in readies
+    ]
+    for process in workers:
+        process.start()
+    for ready in readies:
+        ready.wait()
+    # Subscriptions are sent without waiting for the reply
+    time.sleep(0.2)
+
+    elapsed = asyncio.run(broadcast(url, events, interval))
+    per_worker = [results.get()[1:] for _ in workers]
+    for process in workers:
+        process.join()
+
+    # An event has fanned out once the slowest worker has it everywhere
+    latencies = [max(arrivals) for arrivals in zip(*per_worker)]
+    return {
+        'processes': processes,
+        'sockets': processes * sockets,
+        'events': events,
+        'events_per_sec': events / elapsed if elapsed else 0.0,
+        'p50_ms': percentile(latencies, 50) * 1000,
+        'p99_ms': percentile(latencies, 99) * 1000,
+        'max_ms': max(latencies) * 1000,
+    }
+
+
+def run(processes, sockets, events, interval_ms, redis_url, **options):
+    server = None
+    if redis_url is None:
+        server = RespServer().start()
+        redis_url = server.url
+    try:
+        return [
+            measure(redis_url, int(count), sockets, events, interval_ms / 1000)
+            for count in processes.split(',')
+        ]
+    finally:
+        if server is not None:
+            server.stop()
@@ -0,0 +1,235 @@
+"""
+End-to-end load: writers mutating a room while listeners receive the events.
+
+Starts N listeners on ws/playlist/ and M writers sending a mix of votes,
+adds and reorders, either as REST requests to the async views or as
+commands on their own sockets, all against the in-process ASGI
+application. Every mutation carries a trace ID (see playlist.metrics), so
+each listener can match the events it receives to the mutation that caused
+them. Reports mutation throughput, p50/p99 of the writers' response time
+and of mutation-to-delivery latency across every listener, deliveries that
+never arrived, and the process's peak resident memory.
+"""
+
+import asyncio
+import random
+import resource
+import sys
+import time
+
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.core.asgi import get_asgi_application
+
+from playlist.models import Track
+from playlist.routing import websocket_urlpatterns
+
+from .harness import asgi_request, benchmark_database, create_playlist, percentile, run_load
+
+
+MODES = ['rest', 'socket']
+
+
+def add_arguments(parser):
+    parser.add_argument(
+        '--listeners',
+        default='10,100',
+        help='Comma-separated numbers of sockets receiving the room\'s events',
+    )
+    parser.add_argument(
+        '--writers',
+        type=int,
+        default=4,
+        help='Clients sending mutations at once',
+    )
+    parser.add_argument(
+        '--mutations',
+        type=int,
+        default=500,
+        help='Mutations per run',
+    )
+    parser.add_argument(
+        '--size',
+        type=int,
+        default=100,
+        help='Number of playlist items to start with',
+    )
+    parser.add_argument(
+        '--mix',
+        default='vote:8,add:1,reorder:1',
+        help='Comma-separated operation:weight pairs (vote, add, reorder)',
+    )
+    parser.add_argument(
+        '--via',
+        default=','.join(MODES),
+        help='Comma-separated paths the writers use (rest, socket)',
+    )
+    parser.add_argument(
+        '--drain-timeout',
+        type=float,
+        default=10.0,
+        help='Seconds to wait for outstanding deliveries after the last mutation',
+    )
+
+
+def parse_mix(mix):
+    """'vote:8,add:1' -> (['vote', 'add'], [8, 1])"""
+    operations, weights = [], []
+    for part in mix.split(','):
+        operation, _, weight = part.partition(':')
+        operations.append(operation.strip())
+        weights.append(float(weight or 1))
+    return operations, weights
+
+
+def peak_rss_mb():
+    """Peak resident memory of this process so far"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and kilobytes elsewhere
+    return peak / (1024 * 1024 if sys.platform == 'darwin' else 1024)
+
+
+async def open_socket(application):
+    communicator = WebsocketCommunicator(application, '/ws/playlist/')
+    await communicator.connect()
+    # Initial snapshot
+    await communicator.receive_json_from()
+    return communicator
+
+
+async def listen(communicator, sent_at, latencies):
+    """Record the delivery latency of every traced event until cancelled"""
+    while True:
+        message = await communicator.receive_json_from(timeout=3600)
+        trace = message.get('trace')
+        if trace and trace['id'] in sent_at:
+            latencies.append(time.perf_counter() - sent_at[trace['id']])
+
+
+class Writer:
+    """One client sending mutations over REST or its own socket"""
+
+    def __init__(self, app, via, communicator=None):
+        self.app = app
+        self.via = via
+        self.communicator = communicator
+
+    async def send(self, trace_id, command):
+        """Apply a command and wait for its response or ack; returns success"""
+        if self.via == 'socket':
+            await self.communicator.send_json_to({**command, 'request_id': trace_id, 'trace_id': trace_id})
+            while True:
+                message = await self.communicator.receive_json_from(timeout=30)
+                if message['type'] == 'ack' and message['request_id'] == trace_id:
+                    return message['ok']
+
+        headers = [(b'x-trace-id', trace_id.encode())]
+        if command['type'] == 'add':
+            method, path, body = 'POST', '/async/playlist', {'track_id': command['track_id']}
+        elif command['type'] == 'vote':
+            method, path, body = 'POST', f'/async/playlist/{command["id"]}/vote', {'direction': command['direction']}
+        else:
+            method, path, body = 'POST', f'/async/playlist/{command["id"]}/reorder', {'target_index': command['target_index']}
+        status, _, _ = await asgi_request(self.app, method, path, body, headers)
+        return status in (200, 201)
+
+
+async def measure(app, via, listeners, writers, mutations, item_ids, new_tracks, mix, drain_timeout):
+    application = URLRouter(websocket_urlpatterns)
+    rng = random.Random(listeners)
+    operations, weights = parse_mix(mix)
+    sent_at, delivery, errors = {}, [], 0
+
+    sockets = [await open_socket(application) for _ in range(listeners)]
+    tasks = [asyncio.create_task(listen(communicator, sent_at, delivery)) for communicator in sockets]
+    idle = asyncio.Queue()
+    for _ in range(writers):
+        idle.put_nowait(Writer(app, via, await open_socket(application) if via == 'socket' else None))
+
+    def next_command():
+        operation = rng.choices(operations, weights)[0]
+        if operation == 'add':
+            return {'type': 'add', 'track_id': next(new_tracks)}
+        if operation == 'reorder':
+            return {
+                'type': 'reorder',
+                'id': rng.choice(item_ids),
+                'target_index': rng.randrange(len(item_ids)),
+            }
+        return {'type': 'vote', 'id': rng.choice(item_ids), 'direction': rng.choice(['up', 'up', 'down'])}
+
+    async def mutate(i):
+        nonlocal errors
+        trace_id = f'load-{via}-{listeners}-{i}'
+        command = next_command()
+        writer = await idle.get()
+        sent_at[trace_id] = time.perf_counter()
+        ok = await writer.send(trace_id, command)
+        idle.put_nowait(writer)
+        if not ok:
+            errors += 1
+            del sent_at[trace_id]
+
+    elapsed, latencies = await run_load(mutate, mutations, writers)
+
+    # Every listener should receive one event per successful mutation
+    expected = listeners * (mutations - errors)
+    deadline = time.monotonic() + drain_timeout
+    while len(delivery) < expected and time.monotonic() < deadline:
+        await asyncio.sleep(0.01)
+
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    while not idle.empty():
+        writer = idle.get_nowait()
+        if writer.communicator:
+            await writer.communicator.disconnect()
+    for communicator in sockets:
+        await communicator.disconnect()
+
+    return {
+        'via': via,
+        'listeners': listeners,
+        'writers': writers,
+        'mutations': mutations,
+        'errors': errors,
+        'undelivered': max(expected - len(delivery), 0),
+        'mutations_per_sec': mutations / elapsed if elapsed else 0.0,
+        'ack_p50_ms': percentile(latencies, 50) * 1000,
+        'ack_p99_ms': percentile(latencies, 99) * 1000,
+        'delivery_p50_ms': percentile(delivery, 50) * 1000,
+        'delivery_p99_ms': percentile(delivery, 99) * 1000,
+        'peak_rss_mb': peak_rss_mb(),
+    }
+
+
+def create_tracks(count, prefix='load'):
+    """Library tracks that are not in the playlist yet, for adds"""
+    Track.objects.bulk_create(
+        Track(
+            id=f'{prefix}-track-{i}',
+            title=f'Load Track {i}',
+            artist=f'Artist {i % 50}',
+            album=f'Album {i % 200}',
+            duration_seconds=180 + i % 120,
+            genre='Pop',
+        )
+        for i in range(count)
+    )
+    return (f'{prefix}-track-{i}' for i in range(count))
+
+
+def run(listeners, writers, mutations, size, mix, via, drain_timeout, **options):
+    rows = []
+    runs = [(int(count), mode) for count in listeners.split(',') for mode in via.split(',')]
+    with benchmark_database():
+        item_ids = create_playlist(size)
+        # Enough fresh tracks for every run to add only new ones
+        new_tracks = create_tracks(mutations * len(runs))
+        app = get_asgi_application()
+        for count, mode in runs:
+            rows.append(asyncio.run(measure(
+                app, mode, count, writers, mutations, item_ids, new_tracks, mix, drain_timeout,
+            )))
+    return rows
@@ -0,0 +1,122 @@
+"""
+Latency of a mutation sent over REST vs over the client's WebSocket.
+
+Every simulated client holds a socket to the room, as the frontend does,
+and votes either with a POST to the async REST views or with a `vote`
+command on its socket, waiting for the response or the matching `ack`.
+Both paths run the same service and broadcast to every socket in the room.
+The application is driven in-process, so the REST numbers leave out the
+connection setup, TLS and network round-trip a real request also pays;
+what remains is the HTTP stack itself (request parsing, middleware, URL
+resolution, response rendering).
+"""
+
+import asyncio
+import random
+
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.core.asgi import get_asgi_application
+
+from playlist.routing import websocket_urlpatterns
+
+from .harness import asgi_request, benchmark_database, create_playlist, percentile, run_load
+
+
+MODES = ['rest', 'socket']
+
+
+def add_arguments(parser):
+    parser.add_argument(
+        '--requests',
+        type=int,
+        default=2000,
+        help='Votes per mode',
+    )
+    parser.add_argument(
+        '--clients',
+        default='1,20',
+        help='Comma-separated numbers of connected clients voting at once',
+    )
+    parser.add_argument(
+        '--size',
+        type=int,
+        default=100,
+        help='Number of playlist items to vote on',
+    )
+    parser.add_argument(
+        '--modes',
+        default=','.join(MODES),
+        help='Comma-separated mutation paths to compare (rest, socket)',
+    )
+
+
+async def connect_clients(count):
+    application = URLRouter(websocket_urlpatterns)
+    clients = []
+    for _ in range(count):
+        communicator = WebsocketCommunicator(application, '/ws/playlist/')
+        await communicator.connect()
+        await communicator.receive_json_from()
+        clients.append(communicator)
+    return clients
+
+
+async def socket_vote(communicator, request_id, item_id, direction):
+    """Send a vote command and wait for its ack, skipping broadcasts"""
+    await communicator.send_json_to({
+        'type': 'vote', 'request_id': request_id, 'id': item_id, 'direction': direction,
+    })
+    while True:
+        message = await communicator.receive_json_from(timeout=10)
+        if message['type'] == 'ack' and message['request_id'] == request_id:
+            return message['ok']
+
+
+async def measure(app, mode, item_ids, requests, clients):
+    rng = random.Random(0)
+    errors = 0
+    sockets = await connect_clients(clients)
+    idle = asyncio.Queue()
+    for communicator in sockets:
+        idle.put_nowait(communicator)
+
+    async def vote(i):
+        nonlocal errors
+        item_id = rng.choice(item_ids)
+        direction = 'up' if i % 3 else 'down'
+        communicator = await idle.get()
+        if mode == 'socket':
+            ok = await socket_vote(communicator, i, item_id, direction)
+        else:
+            status, _, _ = await asgi_request(
+                app, 'POST', f'/async/playlist/{item_id}/vote', {'direction': direction}
+            )
+            ok = status == 200
+        idle.put_nowait(communicator)
+        if not ok:
+            errors += 1
+
+    elapsed, latencies = await run_load(vote, requests, clients)
+    for communicator in sockets:
+        await communicator.disconnect()
+    return {
+        'mode': mode,
+        'requests': requests,
+        'clients': clients,
+        'errors': errors,
+        'mutations_per_sec': requests / elapsed if elapsed else 0.0,
+        'p50_ms': percentile(latencies, 50) * 1000,
+        'p99_ms': percentile(latencies, 99) * 1000,
+    }
+
+
+def run(requests, clients, size, modes, **options):
+    rows = []
+    with benchmark_database():
+        item_ids = create_playlist(size)
+        app = get_asgi_application()
+        for count in clients.split(','):
+            for mode in modes.split(','):
+                rows.append(asyncio.run(measure(app, mode, item_ids, requests, int(count))))
+    return rows
@@ -0,0 +1,94 @@
+"""
+Timer overhead of the playback scheduler with thousands of rooms.
+
+Gives every room a track end time spread over a window and waits until all
+of them have fired, once with the scheduler's timer wheel
+(playlist.playback.TimerWheel, one task ticking for every room) and once
+with one sleeping asyncio task per room. Reports the CPU spent and how late
+the ends were noticed. The database side of advancing is left out; both
+would pay it alike.
+"""
+
+import asyncio
+import random
+import time
+
+from playlist.playback import TimerWheel
+
+from .harness import percentile
+
+
+MODES = ['wheel', 'tasks']
+
+
+def add_arguments(parser):
+    parser.add_argument(
+        '--rooms',
+        default='1000,10000,50000',
+        help='Comma-separated numbers of rooms to measure',
+    )
+    parser.add_argument(
+        '--window',
+        type=float,
+        default=3.0,
+        help='Seconds over which the rooms\' tracks end',
+    )
+    parser.add_argument(
+        '--tick-ms',
+        type=float,
+        default=250.0,
+        help='Tick of the timer wheel',
+    )
+
+
+async def run_wheel(deadlines, tick):
+    wheel = TimerWheel(tick, start=time.time())
+    for room, when in enumerate(deadlines):
+        wheel.schedule(room, when, room)
+    lateness = []
+    while len(wheel):
+        await asyncio.sleep(tick)
+        now = time.time()
+        lateness.extend(now - deadlines[room] for room, _ in wheel.advance(now))
+    return lateness
+
+
+async def run_tasks(deadlines, tick):
+    lateness = []
+
+    async def room_timer(when):
+        await asyncio.sleep(when - time.time())
+        lateness.append(time.time() - when)
+
+    await asyncio.gather(*(room_timer(when) for when in deadlines))
+    return lateness
+
+
+RUNNERS = {'wheel': run_wheel, 'tasks': run_tasks}
+
+
+def measure(mode, rooms, window, tick):
+    rng = random.Random(rooms)
+    start = time.time() + 0.5
+    deadlines = [start + rng.random() * window for _ in range(rooms)]
+
+    cpu = time.process_time()
+    lateness = asyncio.run(RUNNERS[mode](deadlines, tick))
+    cpu = time.process_time() - cpu
+
+    return {
+        'mode': mode,
+        'rooms': rooms,
+        'cpu_ms': cpu * 1000,
+        'cpu_us_per_room': cpu / rooms * 1e6,
+        'late_p50_ms': percentile(lateness, 50) * 1000,
+        'late_max_ms': max(lateness) * 1000,
+    }
+
+
+def run(rooms, window, tick_ms, **options):
+    return [
+        measure(mode, int(count), window, tick_ms / 1000)
+        for count in rooms.split(',')
+        for mode in MODES
+    ]
@@ -0,0 +1,126 @@
+"""
+Adversarial insert stress test for fractional positions with rebalancing.
+
+Simulates a playlist in memory and repeatedly moves tracks into the same
+spots, which halves the gap there on every insert. Uses the same
+plan_rebalance logic as the database path and checks after every insert
+that positions stay strictly increasing around it, plus a full check of
+the whole playlist at the end.
+"""
+
+import random
+import time
+
+from playlist.utils import calculate_position, gap_is_safe, plan_rebalance
+
+
+PATTERNS = ['same-spot', 'after-last', 'front', 'random']
+
+
+def add_arguments(parser):
+    parser.add_argument(
+        '--inserts',
+        type=int,
+        default=1_000_000,
+        help='Number of adversarial inserts per pattern',
+    )
+    parser.add_argument(
+        '--size',
+        type=int,
+        default=1000,
+        help='Number of tracks in the simulated playlist',
+    )
+    parser.add_argument(
+        '--patterns',
+        default=','.join(PATTERNS),
+        help=f'Comma-separated insert patterns ({", ".join(PATTERNS)})',
+    )
+    parser.add_argument(
+        '--seed',
+        type=int,
+        default=0,
+        help='Random seed',
+    )
+
+
+def target_index(pattern, size, last_index, rng):
+    """Index (among the other size - 1 tracks) to move the next track to"""
+    if pattern == 'same-spot':
+        return size // 2
+    if pattern == 'after-last':
+        return (last_index + 1) % size
+    if pattern == 'front':
+        return 1
+    return rng.randrange(size)
+
+
+def check_increasing(positions, start, end):
+    """Raise if positions[start:end] is not strictly increasing"""
+    start = max(start, 0)
+    end = min(end, len(positions))
+    for i in range(start + 1, end):
+        if not positions[i - 1] < positions[i]:
+            raise AssertionError(
+                f'Ordering broken at index {i}: {positions[i - 1]!r} >= {positions[i]!r}'
+            )
+
+
+def simulate(pattern, inserts, size, rng):
+    positions = [float(i + 1) for i in range(size)]
+    rebalances = 0
+    renumbered = 0
+    largest_window = 0
+    last_index = size // 2
+
+    start = time.perf_counter()
+    for _ in range(inserts):
+        # Take a track out (never the one next to the target spot) ...
+        index = target_index(pattern, size, last_index, rng)
+        source = (index + size // 2) % size
+        positions.pop(source)
+
+        # ... and drop it back in at the target index
+        prev_position = positions[index - 1] if index > 0 else None
+        next_position = positions[index] if index < len(positions) else None
+
+        if gap_is_safe(prev_position, next_position):
+            position = calculate_position(prev_position, next_position)
+            window_start, window_end = index, index
+        else:
+            def fetch_window(k):
+                lo = max(index - k, 0)
+                hi = min(index + k, len(positions))
+                lower = positions[lo - 1] if lo > 0 else None
+                upper = positions[hi] if hi < len(positions) else None
+                return list(range(lo, index)), list(range(index, hi)), lower, upper
+
+            before, after, before_positions, position, after_positions = plan_rebalance(fetch_window)
+            for i, new_position in zip(before + after, before_positions + after_positions):
+                positions[i] = new_position
+            window_start = before[0] if before else index
+            window_end = after[-1] + 1 if after else index
+            rebalances += 1
+            renumbered += len(before) + len(after)
+            largest_window = max(largest_window, len(before) + len(after))
+
+        positions.insert(index, position)
+        last_index = index
+        check_increasing(positions, window_start - 1, window_end + 2)
+    elapsed = time.perf_counter() - start
+
+    check_increasing(positions, 0, len(positions))
+    return {
+        'pattern': pattern,
+        'inserts': inserts,
+        'size': size,
+        'rebalances': rebalances,
+        'avg_renumbered': renumbered / rebalances if rebalances else 0.0,
+        'max_window': largest_window,
+        'inserts_per_sec': inserts / elapsed if elapsed else 0.0,
+        'monotonic': True,
+    }
+
+
+def run(inserts, size, patterns, seed, **options):
+    rng = random.Random(seed)
+    return [simulate(pattern, inserts, size, rng) for pattern in patterns.split(',')]
@@ -0,0 +1,100 @@
+"""
+Keeping a votes-ordered queue sorted under a sustained vote stream.
+
+Sends a stream of up and down votes, skewed towards a few popular items as
+real voting is, to a queue of N items and finds each voted item's new rank,
+once by re-sorting the whole queue after every vote (what clients had to
+do) and once with the incrementally maintained ranking
+(playlist.ranking.RankedQueue). Reports votes/sec, the cost per vote and
+how many other items each vote shifted on average; a vote's event carries
+only the voted item's new rank, the shifts follow from it.
+"""
+
+import random
+import time
+
+from playlist.ranking import RankedQueue
+
+from .harness import percentile
+
+
+MODES = ['resort', 'ranked']
+
+
+def add_arguments(parser):
+    parser.add_argument(
+        '--items',
+        default='1000,10000',
+        help='Comma-separated queue sizes to measure',
+    )
+    parser.add_argument(
+        '--votes',
+        type=int,
+        default=5000,
+        help='Votes in the stream',
+    )
+
+
+def vote_stream(items, votes):
+    """(item index, delta) pairs, most votes going to a few items"""
+    rng = random.Random(items)
+    return [
+        (min(int(rng.paretovariate(1.2)) - 1, items - 1), 1 if rng.random() < 0.8 else -1)
+        for _ in range(votes)
+    ]
+
+
+def run_resort(items, stream):
+    votes = [0] * items
+    order = list(range(items))
+    costs, shifted = [], 0
+    for index, delta in stream:
+        old_rank = order.index(index)
+        start = time.perf_counter()
+        votes[index] += delta
+        order = sorted(range(items), key=lambda i: (-votes[i], i))
+        new_rank = order.index(index)
+        costs.append(time.perf_counter() - start)
+        shifted += abs(new_rank - old_rank)
+    return costs, shifted
+
+
+def run_ranked(items, stream):
+    votes = [0] * items
+    ids = [f'item-{index}' for index in range(items)]
+    queue = RankedQueue((ids[index], 0, float(index)) for index in range(items))
+    costs, shifted = [], 0
+    for index, delta in stream:
+        old_rank = queue.rank(ids[index])
+        start = time.perf_counter()
+        votes[index] += delta
+        new_rank = queue.update(ids[index], votes[index], float(index))
+        costs.append(time.perf_counter() - start)
+        shifted += abs(new_rank - old_rank)
+    return costs, shifted
+
+
+RUNNERS = {'resort': run_resort, 'ranked': run_ranked}
+
+
+def measure(mode, items, votes):
+    stream = vote_stream(items, votes)
+    costs, shifted = RUNNERS[mode](items, stream)
+    elapsed = sum(costs)
+    return {
+        'mode': mode,
+        'items': items,
+        'votes': votes,
+        'votes_per_sec': votes / elapsed if elapsed else 0.0,
+        'p50_us': percentile(costs, 50) * 1e6,
+        'p99_us': percentile(costs, 99) * 1e6,
+        'shifted_avg': shifted / votes,
+    }
+
+
+def run(items, votes, **options):
+    return [
+        measure(mode, int(count), votes)
+        for count in items.split(',')
+        for mode in MODES
+    ]
@@ -0,0 +1,84 @@
+"""
+Requests/sec and latency of the sync (DRF) and async REST views.
+
+Drives one in-process ASGI application with concurrent vote requests,
+once through the DRF views and once through playlist.async_views, and
+reports throughput, p50/p99 latency and the peak number of threads for
+each.
+"""
+
+import asyncio
+import random
+import threading
+
+from django.core.asgi import get_asgi_application
+
+from .harness import asgi_request, benchmark_database, create_playlist, percentile, run_load
+
+
+MODES = ['sync', 'async']
+
+
+def add_arguments(parser):
+    parser.add_argument(
+        '--requests',
+        type=int,
+        default=2000,
+        help='Vote requests per mode',
+    )
+    parser.add_argument(
+        '--concurrency',
+        type=int,
+        default=50,
+        help='Requests in flight at once',
+    )
+    parser.add_argument(
+        '--size',
+        type=int,
+        default=100,
+        help='Number of playlist items to vote on',
+    )
+    parser.add_argument(
+        '--modes',
+        default=','.join(MODES),
+        help='Comma-separated view modes to compare (sync, async)',
+    )
+
+
+async def measure(app, mode, item_ids, requests, concurrency):
+    rng = random.Random(0)
+    errors = 0
+    threads = threading.active_count()
+
+    async def vote(i):
+        nonlocal errors, threads
+        item_id = rng.choice(item_ids)
+        direction = 'up' if i % 3 else 'down'
+        status, _, _ = await asgi_request(
+            app, 'POST', f'/{mode}/playlist/{item_id}/vote', {'direction': direction}
+        )
+        if status != 200:
+            errors += 1
+        threads = max(threads, threading.active_count())
+
+    elapsed, latencies = await run_load(vote, requests, concurrency)
+    return {
+        'mode': mode,
+        'requests': requests,
+        'concurrency': concurrency,
+        'errors': errors,
+        'requests_per_sec': requests / elapsed if elapsed else 0.0,
+        'p50_ms': percentile(latencies, 50) * 1000,
+        'p99_ms': percentile(latencies, 99) * 1000,
+        'peak_threads': threads,
+    }
+
+
+def run(requests, concurrency, size, modes, **options):
+    rows = []
+    with benchmark_database():
+        item_ids = create_playlist(size)
+        app = get_asgi_application()
+        for mode in modes.split(','):
+            rows.append(asyncio.run(measure(app, mode, item_ids, requests, concurrency)))
+    return rows
@@ -0,0 +1,112 @@
+"""
+Broadcast fan-out with many concurrent playlist rooms.
+
+Every room has the same number of listening sockets and publishes the same
+number of events, all rooms at once. With per-room groups
+(playlist.events.group_name) an event reaches only its own room's sockets;
+with the single global group every event reaches every socket in the
+deployment, which then has to drop the events of other rooms. Reports
+deliveries per event and CPU per event for both, through an
+InMemoryChannelLayer with one channel per simulated socket.
+"""
+
+import asyncio
+import time
+
+from channels.layers import InMemoryChannelLayer
+
+from playlist.consumers import PlaylistConsumer, build_group_message
+from playlist.events import GROUP_NAME, group_name
+
+from .broadcast import SAMPLE_EVENT, SinkConsumer
+
+
+MODES = ['rooms', 'global']
+
+
+def add_arguments(parser):
+    parser.add_argument(
+        '--rooms',
+        default='1,10,50,100',
+        help='Comma-separated numbers of concurrent rooms to measure',
+    )
+    parser.add_argument(
+        '--sockets',
+        type=int,
+        default=20,
+        help='Listening sockets per room',
+    )
+    parser.add_argument(
+        '--events',
+        type=int,
+        default=5,
+        help='Events published per room',
+    )
+
+
+async def publish(layer, group, channels, consumer, message, room):
+    """Send one event and deliver it to every socket that receives it"""
+    await layer.group_send(group, message)
+    # Drain the channel queues directly, as the broadcast benchmark does
+    delivered = 0
+    for channel_room, channel in channels:
+        _, received = layer.channels.pop(channel).get_nowait()
+        delivered += 1
+        if channel_room == room:
+            await PlaylistConsumer.track_added(consumer, received)
+    return delivered
+
+
+async def room_publisher(layer, mode, room, channels, consumer, events):
+    """Publish a room's events, yielding to the other rooms in between"""
+    message = build_group_message(SAMPLE_EVENT)
+    if mode == 'rooms':
+        group, receivers = group_name(room), channels[room]
+    else:
+        group, receivers = GROUP_NAME, [pair for pairs in channels.values() for pair in pairs]
+
+    delivered = 0
+    for _ in range(events):
+        delivered += await publish(layer, group, receivers, consumer, message, room)
+        await asyncio.sleep(0)
+    return delivered
+
+
+async def measure(mode, rooms, sockets, events):
+    layer = InMemoryChannelLayer()
+    channels = {}
+    for index in range(rooms):
+        room = f'room-{index}'
+        channels[room] = []
+        for _ in range(sockets):
+            channel = await layer.new_channel()
+            await layer.group_add(group_name(room) if mode == 'rooms' else GROUP_NAME, channel)
+            channels[room].append((room, channel))
+    consumer = SinkConsumer()
+
+    start = time.process_time()
+    delivered = await asyncio.gather(*[
+        room_publisher(layer, mode, room, channels, consumer, events)
+        for room in channels
+    ])
+    elapsed = time.process_time() - start
+
+    published = rooms * events
+    return {
+        'mode': mode,
+        'rooms': rooms,
+        'sockets': rooms * sockets,
+        'events': published,
+        'deliveries_per_event': sum(delivered) / published,
+        'frames_sent': consumer.frames,
+        'ms_per_event': elapsed * 1000 / published,
+        'events_per_sec': published / elapsed if elapsed else 0.0,
+    }
+
+
+def run(rooms, sockets, events, **options):
+    rows = []
+    for count in (int(n) for n in rooms.split(',')):
+        for mode in MODES:
+            rows.append(asyncio.run(measure(mode, count, sockets, events)))
+    return rows
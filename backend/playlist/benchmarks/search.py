@@ -0,0 +1,134 @@
+"""
+Library search latency with the FTS5 index against naive substring search.
+
+Grows a synthetic library through each size in turn and, at every size,
+runs the same random prefix queries through the ranked full-text search
+(playlist.search.ranked_search) and through the icontains filter it
+replaces, reporting p50/p99 latency and queries/sec for each.
+"""
+
+import random
+import time
+
+from django.db.models import Q
+
+from playlist.models import Track
+from playlist.search import ranked_search
+
+from .harness import benchmark_database, percentile
+
+
+METHODS = ['fts', 'substring']
+
+SYLLABLES = [
+    'ka', 'lo', 'mi', 'ra', 'ven', 'tor', 'sa', 'lu', 'ne', 'dor',
+    'fi', 'an', 'bel', 'co', 'ri', 'sto', 'mar', 'el', 'vi', 'ta',
+]
+
+
+def add_arguments(parser):
+    parser.add_argument(
+        '--sizes',
+        default='10000,100000,1000000',
+        help='Comma-separated library sizes to measure at',
+    )
+    parser.add_argument(
+        '--queries',
+        type=int,
+        default=200,
+        help='Search queries per method and size',
+    )
+    parser.add_argument(
+        '--limit',
+        type=int,
+        default=20,
+        help='Results per query',
+    )
+    parser.add_argument(
+        '--methods',
+        default=','.join(METHODS),
+        help='Comma-separated search methods to compare (fts, substring)',
+    )
+    parser.add_argument(
+        '--seed',
+        type=int,
+        default=0,
+        help='Random seed',
+    )
+
+
+def make_vocabulary(rng, size=5000):
+    """Distinct made-up words of two to four syllables"""
+    words = set()
+    while len(words) < size:
+        words.add(''.join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))))
+    return sorted(words)
+
+
+def add_tracks(start, stop, vocabulary, rng, batch_size=10_000):
+    """Insert synthetic tracks numbered start..stop-1"""
+    def phrase(low, high):
+        return ' '.join(rng.choice(vocabulary) for _ in range(rng.randint(low, high))).title()
+
+    for batch_start in range(start, stop, batch_size):
+        Track.objects.bulk_create([
+            Track(
+                id=f'search-track-{i}',
+                title=phrase(1, 4),
+                artist=phrase(1, 2),
+                album=phrase(1, 3),
+                duration_seconds=120 + i % 300,
+            )
+            for i in range(batch_start, min(batch_start + batch_size, stop))
+        ])
+
+
+def make_queries(count, vocabulary, rng):
+    """Search text as typed: one or two word prefixes"""
+    queries = []
+    for _ in range(count):
+        words = rng.sample(vocabulary, rng.choice([1, 1, 2]))
+        queries.append(' '.join(word[:rng.randint(3, len(word))] for word in words))
+    return queries
+
+
+def substring_search(query, limit):
+    """The icontains search the FTS index replaces"""
+    matches = Q()
+    for word in query.split():
+        matches &= Q(title__icontains=word) | Q(artist__icontains=word) | Q(album__icontains=word)
+    return list(Track.objects.filter(matches).order_by('title', 'artist', 'id')[:limit])
+
+
+def measure(method, queries, limit):
+    search = ranked_search if method == 'fts' else substring_search
+    latencies = []
+    start = time.perf_counter()
+    for query in queries:
+        query_start = time.perf_counter()
+        search(query, limit)
+        latencies.append(time.perf_counter() - query_start)
+    elapsed = time.perf_counter() - start
+    return {
+        'method': method,
+        'queries': len(queries),
+        'queries_per_sec': len(queries) / elapsed if elapsed else 0.0,
+        'p50_ms': percentile(latencies, 50) * 1000,
+        'p99_ms': percentile(latencies, 99) * 1000,
+    }
+
+
+def run(sizes, queries, limit, methods, seed, **options):
+    rng = random.Random(seed)
+    vocabulary = make_vocabulary(rng)
+    search_queries = make_queries(queries, vocabulary, rng)
+
+    rows = []
+    with benchmark_database():
+        current = 0
+        for size in sorted(int(size) for size in sizes.split(',')):
+            add_tracks(current, size, vocabulary, rng)
+            current = size
+            for method in methods.split(','):
+                rows.append({'size': size, **measure(method, search_queries, limit)})
+    return rows
@@ -0,0 +1,74 @@
+"""
+Serializing a playlist with the DRF serializers vs the values_list() fast path.
+
+Builds the items of a playlist of N entries, as GET /api/playlist and
+playlist.snapshot do, with PlaylistTrackSerializer(many=True) over a
+select_related('track') queryset and with playlist_track_rows(). Each run
+includes the query. Reports rows/sec and the p50 time to build the list,
+the time to render it to JSON, and whether both paths render the same
+bytes.
+"""
+
+import time
+
+from rest_framework.renderers import JSONRenderer
+
+from playlist.models import PlaylistTrack
+from playlist.serializers import PlaylistTrackSerializer, playlist_track_rows
+
+from .harness import benchmark_database, create_playlist, percentile
+
+
+MODES = ['serializer', 'values']
+
+
+def add_arguments(parser):
+    parser.add_argument(
+        '--sizes',
+        default='500,5000',
+        help='Comma-separated playlist sizes to serialize',
+    )
+    parser.add_argument(
+        '--repeat',
+        type=int,
+        default=10,
+        help='Times each playlist is serialized per mode',
+    )
+
+
+def build(mode):
+    items = PlaylistTrack.objects.order_by('position')
+    if mode == 'serializer':
+        return PlaylistTrackSerializer(items.select_related('track'), many=True).data
+    return playlist_track_rows(items)
+
+
+def measure(mode, size, repeat, expected):
+    renderer = JSONRenderer()
+    build_times, render_times = [], []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        data = build(mode)
+        build_times.append(time.perf_counter() - start)
+        start = time.perf_counter()
+        body = renderer.render(data)
+        render_times.append(time.perf_counter() - start)
+    build_p50 = percentile(build_times, 50)
+    return {
+        'mode': mode,
+        'size': size,
+        'rows_per_sec': size / build_p50 if build_p50 else 0.0,
+        'build_ms': build_p50 * 1000,
+        'render_ms': percentile(render_times, 50) * 1000,
+        'same_json': body == expected,
+    }
+
+
+def run(sizes, repeat, **options):
+    rows = []
+    for size in (int(count) for count in sizes.split(',')):
+        with benchmark_database():
+            create_playlist(size)
+            expected = JSONRenderer().render(build('serializer'))
+            rows.extend(measure(mode, size, repeat, expected) for mode in MODES)
+    return rows
@@ -0,0 +1,11 @@
+"""
+URLconf used by the benchmarks to serve the sync and async REST views
+side by side from one in-process ASGI application.
+"""
+
+from django.urls import include, path
+
+urlpatterns = [
+    path('sync/', include('playlist.urls')),
+    path('async/', include('playlist.async_urls')),
+]
@@ -0,0 +1,66 @@
+"""
+Votes/sec at high concurrency with the vote coalescing buffer on and off.
+
+Sends concurrent votes through the async views for each coalescing window
+(0 disables the buffer) and reports throughput, latency and how many write
+transactions (playlist versions) the votes turned into.
+"""
+
+import asyncio
+
+from django.core.asgi import get_asgi_application
+from django.test.utils import override_settings
+
+from playlist.models import Playlist
+
+from .harness import benchmark_database, create_playlist
+from .rest import measure
+
+
+def add_arguments(parser):
+    parser.add_argument(
+        '--requests',
+        type=int,
+        default=2000,
+        help='Votes per window setting',
+    )
+    parser.add_argument(
+        '--concurrency',
+        type=int,
+        default=200,
+        help='Votes in flight at once',
+    )
+    parser.add_argument(
+        '--size',
+        type=int,
+        default=20,
+        help='Number of playlist items to vote on',
+    )
+    parser.add_argument(
+        '--windows',
+        default='0,5,20',
+        help='Comma-separated coalescing windows in milliseconds (0 = off)',
+    )
+
+
+def run(requests, concurrency, size, windows, **options):
+    rows = []
+    with benchmark_database():
+        item_ids = create_playlist(size)
+        app = get_asgi_application()
+        for window in (int(ms) for ms in windows.split(',')):
+            version_before = Playlist.current_version()
+            with override_settings(PLAYLIST_VOTE_COALESCE_WINDOW_MS=window):
+                result = asyncio.run(measure(app, 'async', item_ids, requests, concurrency))
+            writes = Playlist.current_version() - version_before
+            rows.append({
+                'window_ms': window,
+                'requests': requests,
+                'concurrency': concurrency,
+                'errors': result['errors'],
+                'votes_per_sec': result['requests_per_sec'],
+                'p50_ms': result['p50_ms'],
+                'p99_ms': result['p99_ms'],
+                'writes': writes,
+            })
+    return rows
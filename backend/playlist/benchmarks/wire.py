@@ -0,0 +1,130 @@
+"""
+Bytes and CPU per WebSocket event in each wire encoding, with and without
+permessage-deflate.
+
+Records a stream of real events (votes, moves, adds and playing changes on
+a playlist of N items) and the snapshot of the playlist, then encodes them
+as playlist.json, playlist.compact and playlist.msgpack frames. Deflate is
+simulated as a client that negotiated permessage-deflate with context
+takeover would receive it: one zlib stream per socket, flushed after each
+frame. Reports the bytes per frame, their ratio to plain JSON, the time to
+encode a frame (once per broadcast) and the time to compress it (once per
+socket).
+"""
+
+import json
+import time
+import zlib
+
+from playlist.consumers import encode_event
+from playlist.events import playlist_snapshot
+from playlist.models import Track
+from playlist.services import add_track, reorder_track, update_track, vote_track
+from playlist.wire import convert
+
+from .harness import benchmark_database, create_playlist
+
+
+ENCODINGS = ['json', 'compact', 'msgpack']
+
+
+def add_arguments(parser):
+    parser.add_argument(
+        '--size',
+        type=int,
+        default=200,
+        help='Playlist size the events are recorded on',
+    )
+    parser.add_argument(
+        '--events',
+        type=int,
+        default=400,
+        help='Mutations recorded for the event stream',
+    )
+    parser.add_argument(
+        '--repeat',
+        type=int,
+        default=5,
+        help='Times each stream is encoded per mode',
+    )
+
+
+def record_events(size, count):
+    """Apply `count` mixed mutations; returns their frames and the snapshot's"""
+    item_ids = create_playlist(size)
+    Track.objects.bulk_create(
+        Track(id=f'extra-track-{i}', title=f'Extra {i}', artist='Artist', duration_seconds=200)
+        for i in range(count)
+    )
+    frames = []
+    for i in range(count):
+        item_id = item_ids[i * 7 % size]
+        kind = i % 4
+        if kind == 0:
+            _, events = vote_track(item_id, 'up')
+        elif kind == 1:
+            _, events = reorder_track(item_id, i * 13 % size)
+        elif kind == 2:
+            _, events = add_track(f'extra-track-{i}')
+        else:
+            _, events = update_track(item_id, {'is_playing': True})
+        frames.extend(message['text'] for _, message in events)
+    return {'events': frames, 'snapshot': [encode_event(playlist_snapshot())]}
+
+
+def deflate(payloads):
+    """Compress frames in one stream, as permessage-deflate does per socket"""
+    compressor = zlib.compressobj(wbits=-zlib.MAX_WBITS)
+    # Each frame ends with a sync flush, whose empty block is not sent
+    return [
+        (compressor.compress(payload) + compressor.flush(zlib.Z_SYNC_FLUSH))[:-4]
+        for payload in payloads
+    ]
+
+
+def measure(frames, encoding, compressed, repeat):
+    messages = [json.loads(frame) for frame in frames]
+    encode_seconds = compress_seconds = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        if encoding == 'json':
+            payloads = [encode_event(message).encode() for message in messages]
+        else:
+            payloads = [
+                data.encode() if isinstance(data, str) else data
+                for data in (convert(encode_event(message), encoding) for message in messages)
+            ]
+        encode_seconds = min(encode_seconds, time.perf_counter() - start)
+        if compressed:
+            start = time.perf_counter()
+            payloads = deflate(payloads)
+            compress_seconds = min(compress_seconds, time.perf_counter() - start)
+    return payloads, {
+        'encode_us_per_frame': encode_seconds / len(frames) * 1e6,
+        'compress_us_per_frame': compress_seconds / len(frames) * 1e6 if compressed else 0.0,
+    }
+
+
+def run(size, events, repeat, **options):
+    with benchmark_database():
+        streams = record_events(size, events)
+
+    rows = []
+    for stream, frames in streams.items():
+        json_bytes = None
+        for encoding in ENCODINGS:
+            for compressed in (False, True):
+                payloads, timings = measure(frames, encoding, compressed, repeat)
+                total = sum(len(payload) for payload in payloads)
+                if json_bytes is None:
+                    json_bytes = total
+                rows.append({
+                    'frames': stream,
+                    'encoding': encoding,
+                    'deflate': compressed,
+                    'count': len(frames),
+                    'bytes_per_frame': total / len(frames),
+                    'size_ratio': total / json_bytes,
+                    **timings,
+                })
+    return rows
@@ -0,0 +1,168 @@
+"""
+Write throughput of concurrent votes and adds under each SQLite setup.
+
+Forks worker processes that each send a mix of POST /api/playlist/<id>/vote
+and POST /api/playlist requests through the DRF views, all against one
+database file, as several server workers would. Runs once per
+configuration, each on a fresh database:
+
+- stock: rollback journal, a new connection per request, no PRAGMAs and
+  plain deferred transactions instead of write_transaction
+- wal: settings.SQLITE_PRAGMAS and write_transaction, still a new
+  connection per request
+- tuned: as wal, with connections kept across requests (CONN_MAX_AGE of
+  REUSE_MAX_AGE), as a WSGI deployment may set DB_CONN_MAX_AGE
+
+and reports writes/sec, latency and how many requests failed, e.g. with
+"database is locked".
+"""
+
+import logging
+import multiprocessing
+import random
+import time
+from contextlib import nullcontext
+from unittest import mock
+
+from django.conf import settings
+from django.db import connection, connections, transaction
+from django.test import Client
+from django.test.utils import override_settings
+
+from playlist.models import Track
+
+from .harness import benchmark_database, create_playlist, percentile
+
+
+CONFIGS = ['stock', 'wal', 'tuned']
+
+# Seconds connections are reused for in the tuned configuration. The
+# writers call the views synchronously, one thread each, as WSGI workers do
+REUSE_MAX_AGE = 600
+
+
+def add_arguments(parser):
+    parser.add_argument(
+        '--requests',
+        type=int,
+        default=2000,
+        help='Requests per configuration, split over the processes',
+    )
+    parser.add_argument(
+        '--processes',
+        type=int,
+        default=8,
+        help='Concurrent writer processes',
+    )
+    parser.add_argument(
+        '--adds',
+        type=float,
+        default=0.2,
+        help='Fraction of requests that add a track instead of voting',
+    )
+    parser.add_argument(
+        '--configs',
+        default=','.join(CONFIGS),
+        help='Comma-separated configurations to compare (stock, wal, tuned)',
+    )
+
+
+def config_settings(config):
+    """(SQLITE_PRAGMAS, CONN_MAX_AGE) of a configuration"""
+    if config == 'stock':
+        return {}, 0
+    if config == 'wal':
+        return settings.SQLITE_PRAGMAS, 0
+    return settings.SQLITE_PRAGMAS, REUSE_MAX_AGE
+
+
+def writer(worker, requests, item_ids, add_fraction, conn_max_age, results):
+    """Send this process's share of the requests and report the outcome"""
+    logging.disable(logging.CRITICAL)
+    connection.settings_dict['CONN_MAX_AGE'] = conn_max_age
+    client = Client(raise_request_exception=False, HTTP_HOST='localhost')
+    rng = random.Random(worker)
+    latencies, errors = [], 0
+
+    for i in range(requests):
+        start = time.perf_counter()
+        if rng.random() < add_fraction:
+            response = client.post(
+                '/sync/playlist',
+                {'track_id': f'writes-track-{worker}-{i}'},
+                content_type='application/json',
+            )
+            ok = response.status_code == 201
+        else:
+            response = client.post(
+                f'/sync/playlist/{rng.choice(item_ids)}/vote',
+                {'direction': 'up'},
+                content_type='application/json',
+            )
+            ok = response.status_code == 200
+        latencies.append(time.perf_counter() - start)
+        errors += not ok
+
+    connections.close_all()
+    results.put((latencies, errors))
+
+
+def library_for_adds(processes, per_process):
+    """Library tracks the writers add, distinct for every request"""
+    Track.objects.bulk_create([
+        Track(
+            id=f'writes-track-{worker}-{i}',
+            title=f'Added {worker}-{i}',
+            artist='Writer',
+            duration_seconds=200,
+        )
+        for worker in range(processes)
+        for i in range(per_process)
+    ])
+
+
+def measure(config, requests, processes, add_fraction):
+    pragmas, conn_max_age = config_settings(config)
+    if config == 'stock':
+        deferred = mock.patch('playlist.services.write_transaction', transaction.atomic)
+    else:
+        deferred = nullcontext()
+    with override_settings(SQLITE_PRAGMAS=pragmas), deferred, benchmark_database():
+        item_ids = create_playlist(100)
+        per_process = requests // processes
+        library_for_adds(processes, per_process)
+        # Every writer opens its own connection after the fork
+        connections.close_all()
+
+        results = multiprocessing.Queue()
+        workers = [
+            multiprocessing.Process(
+                target=writer,
+                args=(worker, per_process, item_ids, add_fraction, conn_max_age, results),
+            )
+            for worker in range(processes)
+        ]
+        start = time.perf_counter()
+        for process in workers:
+            process.start()
+        outcomes = [results.get() for _ in workers]
+        elapsed = time.perf_counter() - start
+        for process in workers:
+            process.join()
+
+    latencies = [latency for process_latencies, _ in outcomes for latency in process_latencies]
+    errors = sum(process_errors for _, process_errors in outcomes)
+    sent = per_process * processes
+    return {
+        'config': config,
+        'processes': processes,
+        'requests': sent,
+        'errors': errors,
+        'writes_per_sec': (sent - errors) / elapsed if elapsed else 0.0,
+        'p50_ms': percentile(latencies, 50) * 1000,
+        'p99_ms': percentile(latencies, 99) * 1000,
+    }
+
+
+def run(requests, processes, adds, configs, **options):
+    return [measure(config, requests, processes, adds) for config in configs.split(',')]
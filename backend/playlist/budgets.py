@@ -0,0 +1,280 @@
+"""
+Query-count and serialization budgets of the REST endpoints.
+
+Every endpoint of playlist.urls declares how many SQL statements a request
+may execute and how long serializing its response may take. A request is
+measured by recording every statement run on any connection (an execute
+wrapper installed from the connection_created signal, which does nothing
+while no measurement is active) and the time spent in the outermost
+serializer's to_representation. The tests fail when an endpoint goes over
+budget; with PLAYLIST_BUDGET_CHECKS set, BudgetMiddleware checks live
+requests too and logs each one over budget with its statements. python
+manage.py budgets reports every endpoint with the plans of its queries,
+flagging full table scans.
+"""
+
+import contextvars
+import json
+import logging
+import time
+from collections import namedtuple
+from contextlib import contextmanager
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connection
+
+from .metrics import current_service, observe
+
+
+logger = logging.getLogger(__name__)
+
+Budget = namedtuple('Budget', ['queries', 'serialize_ms'])
+
+# '<method> <URL name>' -> Budget. Query counts are every statement the
+# request runs in the tests, savepoints and the statement that takes the
+# SQLite write lock included, and must not grow with the playlist, so an
+# N+1 query shows up at once. Serialization budgets are for a playlist or
+# page of BUDGET_ITEMS items, with ample room for slow machines.
+BUDGETS = {
+    'GET tracks-list': Budget(5, 25),
+    'GET tracks-search': Budget(1, 25),
+    'GET cache-stats': Budget(0, 5),
+    'GET socket-stats': Budget(0, 5),
+    'GET metrics': Budget(0, 5),
+    'GET metrics-prometheus': Budget(0, 5),
+    'GET playlist-list': Budget(5, 50),
+    'POST playlist-list': Budget(17, 10),
+    'GET playlist-mode': Budget(1, 5),
+    'PUT playlist-mode': Budget(15, 10),
+    'POST playlist-batch': Budget(17, 10),
+    'PATCH playlist-update': Budget(14, 10),
+    'DELETE playlist-update': Budget(16, 5),
+    'POST playlist-vote': Budget(16, 10),
+    'POST playlist-reorder': Budget(17, 10),
+}
+
+BUDGET_ITEMS = 50
+
+
+class Usage:
+    """Statements executed and serialization time of one measured request"""
+
+    def __init__(self):
+        # (sql, params, seconds) per statement
+        self.queries = []
+        self.serialize_seconds = 0.0
+
+    @property
+    def query_count(self):
+        return len(self.queries)
+
+    @property
+    def serialize_ms(self):
+        return self.serialize_seconds * 1000
+
+
+_usage = contextvars.ContextVar('playlist_budget_usage', default=None)
+_serializing = contextvars.ContextVar('playlist_serializing', default=False)
+
+
+def record_query(execute, sql, params, many, context):
+    """Execute wrapper adding each statement to the active measurement"""
+    usage = _usage.get()
+    if usage is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        usage.queries.append((sql, params, time.perf_counter() - start))
+
+
+def install_query_recorder(sender, connection, **kwargs):
+    """Add record_query to a new connection, once"""
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+def timed_serialization(to_representation, instance):
+    """
+    Time a serializer's to_representation unless it is nested in another,
+    in the serialize_seconds histogram and the active measurement if any.
+    """
+    if _serializing.get():
+        return to_representation(instance)
+    token = _serializing.set(True)
+    start = time.perf_counter()
+    try:
+        return to_representation(instance)
+    finally:
+        seconds = time.perf_counter() - start
+        _serializing.reset(token)
+        observe('serialize_seconds', current_service() or 'other', seconds)
+        usage = _usage.get()
+        if usage is not None:
+            usage.serialize_seconds += seconds
+
+
+@contextmanager
+def measure():
+    """Record the statements and serialization time of the block"""
+    # The connection of this thread may predate the signal handler
+    install_query_recorder(None, connection)
+    usage = Usage()
+    token = _usage.set(usage)
+    try:
+        yield usage
+    finally:
+        _usage.reset(token)
+
+
+def over_budget(key, usage):
+    """
+    Compare a measured request to the budget of its endpoint.
+
+    Returns:
+        list: Descriptions of the exceeded limits, empty if within budget
+            or if the endpoint has no budget
+    """
+    budget = BUDGETS.get(key)
+    if budget is None:
+        return []
+    problems = []
+    if usage.query_count > budget.queries:
+        problems.append(f'{usage.query_count} queries (budget {budget.queries})')
+    if usage.serialize_ms > budget.serialize_ms:
+        problems.append(f'{usage.serialize_ms:.1f} ms serializing (budget {budget.serialize_ms} ms)')
+    return problems
+
+
+def query_plans(usage):
+    """
+    Plan of every SELECT of a measured request.
+
+    Returns:
+        list: {'sql', 'ms', 'plan': [lines], 'full_scan': bool} per query
+    """
+    prefix = connection.ops.explain_query_prefix()
+    plans = []
+    for sql, params, seconds in usage.queries:
+        if not sql.lstrip().upper().startswith('SELECT'):
+            continue
+        with connection.cursor() as cursor:
+            cursor.execute(f'{prefix} {sql}', params)
+            # SQLite rows are (id, parent, unused, detail)
+            plan = [str(row[-1]) for row in cursor.fetchall()]
+        plans.append({
+            'sql': sql,
+            'ms': seconds * 1000,
+            'plan': plan,
+            # SQLite reports a table read without an index as "SCAN <table>"
+            'full_scan': any(
+                line.startswith('SCAN ') and ' USING ' not in line and 'VIRTUAL TABLE' not in line
+                for line in plan
+            ),
+        })
+    return plans
+
+
+def endpoint_requests(item_ids, track_id):
+    """
+    One request to every endpoint of playlist.urls, for a playlist of
+    `item_ids` and a library track `track_id` that is not in it yet.
+    Requests that delete come last.
+
+    Returns:
+        list: (method, URL name, URL args, JSON body or None) tuples
+    """
+    first, second, third = item_ids[:3]
+    return [
+        ('GET', 'tracks-list', [], None),
+        ('GET', 'tracks-search', [], None),
+        ('GET', 'cache-stats', [], None),
+        ('GET', 'socket-stats', [], None),
+        ('GET', 'metrics', [], None),
+        ('GET', 'metrics-prometheus', [], None),
+        ('GET', 'playlist-list', [], None),
+        ('POST', 'playlist-list', [], {'track_id': track_id}),
+        ('GET', 'playlist-mode', [], None),
+        ('PUT', 'playlist-mode', [], {'mode': 'votes'}),
+        ('POST', 'playlist-vote', [first], {'direction': 'up'}),
+        ('POST', 'playlist-reorder', [second], {'target_index': 0}),
+        ('PATCH', 'playlist-update', [first], {'is_playing': True}),
+        ('POST', 'playlist-batch', [], {'operations': [
+            {'op': 'vote', 'id': second, 'direction': 'up'},
+            {'op': 'move', 'id': third, 'position': 0.5},
+        ]}),
+        ('DELETE', 'playlist-update', [third], None),
+    ]
+
+
+def measure_endpoints(client, item_ids, track_id):
+    """
+    Send endpoint_requests() through a test client, each measured with an
+    empty response cache.
+
+    Returns:
+        list: ('<method> <URL name>', response, Usage) per request
+    """
+    from django.core.cache import cache
+    from django.urls import reverse
+
+    results = []
+    for method, name, args, body in endpoint_requests(item_ids, track_id):
+        path = reverse(name, args=args)
+        if name == 'tracks-search':
+            path += '?q=track'
+        cache.clear()
+        with measure() as usage:
+            response = client.generic(
+                method, path, json.dumps(body) if body is not None else '',
+                content_type='application/json',
+            )
+        results.append((f'{method} {name}', response, usage))
+    return results
+
+
+def endpoint_key(request):
+    match = request.resolver_match
+    return f'{request.method} {match.url_name}' if match else None
+
+
+class BudgetMiddleware:
+    """Logs requests that go over their endpoint's budget, when enabled"""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        if not settings.PLAYLIST_BUDGET_CHECKS:
+            return self.get_response(request)
+        with measure() as usage:
+            response = self.get_response(request)
+        self.check(request, usage)
+        return response
+
+    async def __acall__(self, request):
+        if not settings.PLAYLIST_BUDGET_CHECKS:
+            return await self.get_response(request)
+        with measure() as usage:
+            response = await self.get_response(request)
+        self.check(request, usage)
+        return response
+
+    def check(self, request, usage):
+        key = endpoint_key(request)
+        problems = over_budget(key, usage)
+        if problems:
+            logger.warning(
+                '%s is over budget: %s\n%s', key, ', '.join(problems),
+                '\n'.join(f'{sql} [{seconds * 1000:.2f} ms]' for sql, _, seconds in usage.queries),
+            )
@@ -0,0 +1,180 @@
+"""
+Response cache for the read-only playlist and library endpoints.
+
+Each room's playlist is cached under the room's version, which every mutation
+bumps when it records its event, so a new version simply misses and old
+entries age out; nothing is ever invalidated explicitly. Edits to library
+tracks bump the version of the rooms that list them too (Track.changed),
+since the items embed their tracks. Each page of the track library is keyed
+by the library's own version, bumped by every write to a track, plus the
+page's query.
+
+Both keys double as strong ETags, so a client that sends the ETag it last
+saw in If-None-Match gets an empty 304 after a single primary key lookup.
+"""
+
+import hashlib
+import json
+import threading
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.http import parse_etags
+
+from . import services
+from .models import Library, Playlist
+
+
+class CacheStats:
+    """Per-process hit/miss counters for one cached resource"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counts = Counter()
+
+    def record(self, outcome):
+        with self.lock:
+            self.counts[outcome] += 1
+
+    def as_dict(self):
+        with self.lock:
+            hits = self.counts['hits']
+            misses = self.counts['misses']
+            not_modified = self.counts['not_modified']
+        total = hits + misses + not_modified
+        return {
+            'hits': hits,
+            'misses': misses,
+            'not_modified': not_modified,
+            'hit_rate': (hits + not_modified) / total if total else 0.0,
+        }
+
+
+stats = {
+    'playlist': CacheStats(),
+    'tracks': CacheStats(),
+}
+
+
+def etag_matches(if_none_match, etag):
+    """Whether an If-None-Match header value matches an ETag"""
+    if not if_none_match:
+        return False
+    # If-None-Match uses the weak comparison
+    candidates = [tag.removeprefix('W/') for tag in parse_etags(if_none_match)]
+    return '*' in candidates or etag in candidates
+
+
+def cached(resource, key, etag, if_none_match, build):
+    """
+    Serve a resource from the cache, building it on a miss.
+
+    Args:
+        resource: Name of the resource in `stats`
+        key: Cache key of the current representation
+        etag: Strong ETag of the current representation
+        if_none_match: The request's If-None-Match header, if any
+        build: Callable returning (data, key, etag) for the representation
+            actually built, which may be newer than `key` by then
+
+    Returns:
+        tuple: (data, etag), with data None if the client's copy is current
+    """
+    if etag_matches(if_none_match, etag):
+        stats[resource].record('not_modified')
+        return None, etag
+
+    data = cache.get(key)
+    if data is not None:
+        stats[resource].record('hits')
+        return data, etag
+
+    stats[resource].record('misses')
+    data, key, etag = build()
+    cache.set(key, data, settings.PLAYLIST_RESPONSE_CACHE_TIMEOUT)
+    return data, etag
+
+
+def playlist_etag(version):
+    """ETag of the playlist at a given version"""
+    return f'"playlist-{version}"'
+
+
+def cached_playlist(if_none_match=None, room=Playlist.DEFAULT_ID):
+    """
+    Get a room's serialized playlist for GET /api/playlist.
+
+    Returns:
+        tuple: (items or None if not modified, response headers)
+    """
+    version = Playlist.current_version(room)
+
+    def build():
+        nonlocal version
+        # The snapshot reads its own version along with the items
+        items, version = services.get_playlist(room)
+        return list(items), f'playlist:{room}:{version}', playlist_etag(version)
+
+    items, etag = cached(
+        'playlist', f'playlist:{room}:{version}', playlist_etag(version), if_none_match, build
+    )
+    return items, {
+        'ETag': etag,
+        'Cache-Control': 'no-cache',
+        'X-Playlist-Version': str(version),
+    }
+
+
+def library_etag(version, query_key):
+    """ETag of one library page at a given library version"""
+    return f'"tracks-{version}-{query_key}"'
+
+
+def cached_tracks(params, if_none_match=None):
+    """
+    Get one serialized page of the track library for GET /api/tracks.
+
+    Each combination of filters and cursor is cached as its own entry.
+
+    Args:
+        params: Request query parameters
+        if_none_match: The request's If-None-Match header, if any
+
+    Returns:
+        tuple: (tracks or None if not modified, response headers)
+
+    Raises:
+        PlaylistError: If the query parameters are invalid
+    """
+    query = services.track_query(params)
+    query_key = hashlib.md5(json.dumps(query, sort_keys=True).encode()).hexdigest()[:16]
+    version = Library.current_version()
+
+    def build():
+        # Read the version again in the same transaction as the tracks
+        with transaction.atomic():
+            built = Library.current_version()
+            tracks, next_cursor = services.list_tracks(**query)
+        page = {'tracks': list(tracks), 'next': next_cursor}
+        return page, f'tracks:{built}:{query_key}', library_etag(built, query_key)
+
+    page, etag = cached(
+        'tracks', f'tracks:{version}:{query_key}', library_etag(version, query_key),
+        if_none_match, build
+    )
+    headers = {
+        'ETag': etag,
+        'Cache-Control': 'no-cache',
+    }
+    if page is None:
+        return None, headers
+    if page['next']:
+        headers['X-Next-Cursor'] = page['next']
+    return page['tracks'], headers
+
+
+def cache_stats():
+    """Hit-rate counters for each cached resource in this process"""
+    return {resource: counters.as_dict() for resource, counters in stats.items()}
@@ -0,0 +1,225 @@
+"""
+Streaming import of track catalogs from CSV or JSON Lines files.
+
+The file is read one record at a time and written in fixed-size batches,
+each upserted with INSERT ... ON CONFLICT in its own transaction, so memory
+stays flat however large the catalog is. Parsing
+can optionally be spread over worker processes while the main process
+keeps writing; the database writes stay in one process either way.
+"""
+
+import csv
+import json
+import os
+import resource
+import sys
+import time
+from collections import deque
+from itertools import islice
+from multiprocessing import Pool
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import Track
+
+
+FORMATS = ['csv', 'jsonl']
+
+REQUIRED_FIELDS = ['id', 'title', 'artist', 'duration_seconds']
+OPTIONAL_FIELDS = ['album', 'genre', 'cover_url']
+
+# Columns refreshed when a track with the same ID already exists
+UPDATE_FIELDS = ['title', 'artist', 'album', 'duration_seconds', 'genre', 'cover_url', 'updated_at']
+
+
+class ImportStats:
+    """Running totals of an import"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.imported = 0
+        self.skipped = 0
+        self.errors = []
+
+    @property
+    def rows_per_sec(self):
+        elapsed = time.perf_counter() - self.started
+        return self.imported / elapsed if elapsed else 0.0
+
+    @property
+    def peak_rss_mb(self):
+        """Peak resident memory of this process and its parser workers"""
+        peak = sum(
+            resource.getrusage(who).ru_maxrss
+            for who in (resource.RUSAGE_SELF, resource.RUSAGE_CHILDREN)
+        )
+        # ru_maxrss is in bytes on macOS and kilobytes elsewhere
+        return peak / (1024 * 1024 if sys.platform == 'darwin' else 1024)
+
+
+def detect_format(path):
+    """Guess the catalog format from the file extension"""
+    extension = os.path.splitext(path)[1].lower()
+    return 'jsonl' if extension in ('.jsonl', '.ndjson') else 'csv'
+
+
+def read_records(path, file_format):
+    """
+    Yield (line number, raw record) pairs from a catalog file.
+
+    CSV records are lists of column values, with the header row yielded
+    first; JSON Lines records are unparsed lines.
+    """
+    with open(path, newline='', encoding='utf-8') as catalog:
+        if file_format == 'csv':
+            reader = csv.reader(catalog)
+            for record in reader:
+                yield reader.line_num, record
+        else:
+            for line_number, line in enumerate(catalog, start=1):
+                if line.strip():
+                    yield line_number, line
+
+
+def parse_record(file_format, header, record):
+    """
+    Turn one raw record into Track field values.
+
+    Raises:
+        ValueError: If the record is malformed or misses a required field
+    """
+    if file_format == 'csv':
+        if len(record) != len(header):
+            raise ValueError(f'expected {len(header)} columns, got {len(record)}')
+        data = dict(zip(header, record))
+    else:
+        data = json.loads(record)
+        if not isinstance(data, dict):
+            raise ValueError('line is not a JSON object')
+
+    missing = [field for field in REQUIRED_FIELDS if data.get(field) in (None, '')]
+    if missing:
+        raise ValueError(f'missing {", ".join(missing)}')
+
+    fields = {field: str(data[field]).strip() for field in ('id', 'title', 'artist')}
+    fields['duration_seconds'] = int(data['duration_seconds'])
+    for field in OPTIONAL_FIELDS:
+        fields[field] = str(data.get(field) or '').strip()
+    fields['cover_url'] = fields['cover_url'] or None
+    return fields
+
+
+def parse_batch(file_format, header, records):
+    """
+    Parse a batch of raw records; runs in parser worker processes.
+
+    Returns:
+        tuple: (list of field dicts, list of (line number, error) pairs)
+    """
+    rows, errors = [], []
+    for line_number, record in records:
+        try:
+            rows.append(parse_record(file_format, header, record))
+        except (ValueError, TypeError) as error:
+            errors.append((line_number, str(error)))
+    return rows, errors
+
+
+def parsed_batches(records, file_format, header, batch_size, workers):
+    """Yield parse_batch results in file order, in parallel if workers > 1"""
+    batches = iter(lambda: list(islice(records, batch_size)), [])
+    if workers <= 1:
+        for batch in batches:
+            yield parse_batch(file_format, header, batch)
+        return
+
+    with Pool(workers) as pool:
+        # Keep a bounded number of batches in flight so memory stays flat
+        pending = deque()
+        for batch in batches:
+            pending.append(pool.apply_async(parse_batch, (file_format, header, batch)))
+            if len(pending) >= workers * 2:
+                yield pending.popleft().get()
+        while pending:
+            yield pending.popleft().get()
+
+
+def upsert_sql():
+    """INSERT ... ON CONFLICT statement upserting one track"""
+    quote = connection.ops.quote_name
+    columns = [Track._meta.get_field(field).column for field in ['id', *UPDATE_FIELDS]]
+    return (
+        f'INSERT INTO {quote(Track._meta.db_table)} ({", ".join(map(quote, columns))}) '
+        f'VALUES ({", ".join(["%s"] * len(columns))}) '
+        f'ON CONFLICT ({quote(columns[0])}) DO UPDATE SET '
+        + ', '.join(f'{quote(column)} = EXCLUDED.{quote(column)}' for column in columns[1:])
+    )
+
+
+def write_batch(rows):
+    """Upsert one batch of tracks in its own transaction"""
+    # A catalog may repeat an ID; the last occurrence wins, as with the upsert
+    rows = {row['id']: row for row in rows}
+    started = timezone.now()
+
+    with transaction.atomic():
+        if connection.vendor not in ('sqlite', 'postgresql'):
+            Track.objects.bulk_create(
+                [Track(**row) for row in rows.values()],
+                update_conflicts=True,
+                unique_fields=['id'],
+                update_fields=UPDATE_FIELDS,
+            )
+        else:
+            # Compiling bulk_create's SQL costs far more than the writes
+            # themselves at this volume, so send prepared rows straight to
+            # the driver instead
+            updated_at = Track._meta.get_field('updated_at').get_db_prep_save(started, connection)
+            with connection.cursor() as cursor:
+                cursor.executemany(upsert_sql(), [
+                    [row[field] for field in ['id', *UPDATE_FIELDS[:-1]]] + [updated_at]
+                    for row in rows.values()
+                ])
+        # Every row of the batch was stamped with `started` or later; a
+        # subquery avoids binding one parameter per track
+        Track.changed(Track.objects.filter(updated_at__gte=started))
+    return len(rows)
+
+
+def import_catalog(path, file_format=None, batch_size=5000, workers=1, progress=None):
+    """
+    Stream a catalog file into the track library.
+
+    Args:
+        path: CSV (with a header row) or JSON Lines file
+        file_format: 'csv' or 'jsonl'; guessed from the extension if omitted
+        batch_size: Tracks per bulk upsert and transaction
+        workers: Parser processes; 1 parses in this process
+        progress: Optional callable receiving the ImportStats after each batch
+
+    Returns:
+        ImportStats: Totals of the finished import
+    """
+    file_format = file_format or detect_format(path)
+    stats = ImportStats()
+    records = read_records(path, file_format)
+
+    header = None
+    if file_format == 'csv':
+        _, header = next(records, (0, None))
+        if header is None:
+            return stats
+        header = [column.strip() for column in header]
+        missing = [field for field in REQUIRED_FIELDS if field not in header]
+        if missing:
+            raise ValueError(f'CSV header is missing {", ".join(missing)}')
+
+    for rows, errors in parsed_batches(records, file_format, header, batch_size, workers):
+        if rows:
+            stats.imported += write_batch(rows)
+        stats.skipped += len(errors)
+        stats.errors.extend(errors[:max(0, 10 - len(stats.errors))])
+        if progress:
+            progress(stats)
+    return stats
@@ -1,128 +1,366 @@
+import asyncio
 import json
+import logging
+import time
+from urllib.parse import parse_qs
+from channels.db import database_sync_to_async
+from channels.exceptions import StopConsumer
 from channels.generic.websocket import AsyncWebsocketConsumer
 from channels.layers import get_channel_layer
-from asgiref.sync import sync_to_async
+from asgiref.sync import async_to_sync
+from django.conf import settings
+
+from .metrics import observe, timed, timed_service, tracing
+from .outbox import RESYNC, Outbox
+from .wire import convert, convert_event, decode_message, negotiate
+
+
+logger = logging.getLogger(__name__)
+
+
+# Map event types to consumer method names
+EVENT_HANDLERS = {
+    'track.added': 'track_added',
+    'track.removed': 'track_removed',
+    'track.moved': 'track_moved',
+    'track.voted': 'track_voted',
+    'track.playing': 'track_playing',
+    'playlist.rebalanced': 'playlist_rebalanced',
+    'playlist.mode': 'playlist_mode',
+    'playlist.batch': 'playlist_batch',
+}
+HANDLER_EVENTS = {handler: event_type for event_type, handler in EVENT_HANDLERS.items()}
+
+# Mutations a client can send over its socket instead of a REST request,
+# with the service each runs. Each is answered with an `ack` carrying the
+# client's request_id and the matching view's response body.
+COMMANDS = {
+    'add': 'add_track',
+    'remove': 'remove_track',
+    'vote': 'vote_track',
+    'reorder': 'reorder_track',
+    'move': 'update_track',
+    'play': 'update_track',
+    'batch': 'apply_batch',
+}
+
+# Close code sent to a client evicted for not reading its frames
+EVICTED_CLOSE_CODE = 4000
 
 
 class PlaylistConsumer(AsyncWebsocketConsumer):
-    """WebSocket consumer for realtime playlist updates"""
-    
+    """
+    WebSocket consumer for realtime playlist updates.
+
+    Everything sent to the client goes through the connection's bounded
+    outbox and is written by its own task, so a slow client never holds
+    up the handlers (see playlist.outbox). Frames are queued in the
+    encoding the client negotiated (see playlist.wire).
+    """
+
+    outbox = None
+    encoding = 'json'
+    # Set when the server reports the socket's send buffer (playlist.server)
+    backpressure = None
+
     async def connect(self):
         """Called when WebSocket connection is established"""
-        self.group_name = 'playlist'
-        
-        # Join playlist group
+        from .events import group_name
+        from .models import Playlist
+
+        # ws/playlist/ is the default room, ws/playlist/<room>/ any other
+        route = self.scope.get('url_route', {}).get('kwargs', {})
+        self.room = route.get('room') or Playlist.DEFAULT_ID
+        self.group_name = group_name(self.room)
+
+        # Join the room's group
         await self.channel_layer.group_add(
             self.group_name,
             self.channel_name
         )
-        
-        await self.accept()
-        
+
+        self.backpressure = self.scope.get('extensions', {}).get('playlist.backpressure')
+        subprotocol, self.encoding = negotiate(self.scope.get('subprotocols'))
+        await self.accept(subprotocol)
+        self.outbox = Outbox(
+            settings.PLAYLIST_SOCKET_QUEUE_SIZE, settings.PLAYLIST_SOCKET_STALL_TIMEOUT
+        )
+        self.writer = asyncio.ensure_future(self.write_outbox())
+
         # Send initial ping
-        await self.send(text_data=json.dumps({
+        await self.queue_message(json.dumps({
             'type': 'ping',
             'ts': self.get_timestamp()
         }))
-    
+
+        # Resuming client - replay what it missed while disconnected
+        since = self.get_since()
+        if since is not None:
+            await self.replay(since)
+
     async def disconnect(self, close_code):
         """Called when WebSocket connection is closed"""
-        # Leave playlist group
+        if self.outbox is not None:
+            self.writer.cancel()
+            self.outbox.close()
+        # Leave the room's group
         await self.channel_layer.group_discard(
             self.group_name,
             self.channel_name
         )
-    
-    async def receive(self, text_data):
+
+    async def receive(self, text_data=None, bytes_data=None):
         """Called when message is received from WebSocket"""
         try:
-            data = json.loads(text_data)
-            message_type = data.get('type')
-            
-            if message_type == 'ping':
-                # Respond to ping
-                await self.send(text_data=json.dumps({
-                    'type': 'pong',
-                    'ts': self.get_timestamp()
-                }))
-        except json.JSONDecodeError:
-            pass
-    
+            data = decode_message(text_data, bytes_data)
+        except ValueError:
+            return
+        message_type = data.get('type')
+
+        if message_type == 'ping':
+            # Respond to ping
+            await self.queue_message(json.dumps({
+                'type': 'pong',
+                'ts': self.get_timestamp()
+            }))
+        elif message_type == 'resync':
+            # Client detected a version gap - send the full playlist
+            await self.queue_message(encode_event(await self.get_snapshot()), 'playlist.snapshot')
+        elif message_type in COMMANDS:
+            await self.queue_message(json.dumps(await self.run_command(message_type, data)))
+
+    async def run_command(self, command, data):
+        """
+        Apply a mutation sent over the socket and build its acknowledgement.
+
+        The change is broadcast to the room, this socket included, before
+        the ack is sent, as the REST views broadcast before responding.
+
+        Returns:
+            dict: `ack` message with `ok` and either the `data` the REST
+            view would return or its `status` and error body
+        """
+        from django.http import Http404
+        from .events import abroadcast_events
+        from .services import PlaylistError, vote_delta
+        from .votes import get_vote_buffer
+
+        ack = {'type': 'ack', 'request_id': data.get('request_id')}
+        try:
+            buffer = get_vote_buffer() if command == 'vote' else None
+            if buffer is not None:
+                # Coalesce with the votes of every other socket and request
+                result = await buffer.add(data.get('id'), vote_delta(data.get('direction', 'up')), self.room)
+            else:
+                with tracing(data.get('trace_id')):
+                    with timed_service(COMMANDS[command]):
+                        result, events = await database_sync_to_async(self.apply_command)(command, data)
+                await abroadcast_events(events)
+        except PlaylistError as error:
+            return {**ack, 'ok': False, 'status': error.status, **error.as_data()}
+        except Http404:
+            return {**ack, 'ok': False, 'status': 404, 'detail': 'Not found.'}
+        return {**ack, 'ok': True, 'data': result}
+
+    def apply_command(self, command, data):
+        """Run a command's playlist service; returns (data, events)"""
+        from . import services
+
+        if command == 'add':
+            return services.add_track(data.get('track_id'), data.get('added_by', 'Anonymous'), self.room)
+        if command == 'remove':
+            return None, services.remove_track(data.get('id'), self.room)
+        if command == 'vote':
+            return services.vote_track(data.get('id'), data.get('direction', 'up'), self.room)
+        if command == 'reorder':
+            return services.reorder_track(data.get('id'), data.get('target_index'), self.room)
+        if command == 'move':
+            return services.update_track(data.get('id'), {'position': data.get('position')}, self.room)
+        if command == 'play':
+            return services.update_track(data.get('id'), {'is_playing': data.get('is_playing', True)}, self.room)
+        return services.apply_batch(data.get('operations'), self.room)
+
+    async def queue_event(self, frame, label='event'):
+        """Queue an event frame, evicting the client if it stopped reading"""
+        if self.encoding != 'json':
+            frame = convert_event(frame, self.encoding)
+        if not self.outbox.put_event(frame, label):
+            await self.evict()
+
+    async def queue_message(self, frame, label='reply'):
+        """Queue a reply to the client, evicting it if it stopped reading"""
+        if self.encoding != 'json':
+            frame = convert(frame, self.encoding)
+        if not self.outbox.put_message(frame, label):
+            await self.evict()
+
+    async def write_outbox(self):
+        """
+        Write queued frames to the client, one at a time.
+
+        A snapshot that fails to build is logged and skipped. A send buffer
+        that does not drain within the stall timeout, or any other failure,
+        stops the writer and has the consumer evict the client.
+        """
+        while True:
+            label, frame, queued_at = await self.outbox.get()
+            if frame is RESYNC:
+                # Stands in for the events dropped on overflow
+                try:
+                    frame = convert(encode_event(await self.get_snapshot()), self.encoding)
+                except Exception:
+                    logger.exception('Failed to build snapshot for playlist socket')
+                    continue
+            observe('outbox_wait_seconds', label, time.perf_counter() - queued_at)
+            self.outbox.sending_since = time.monotonic()
+            try:
+                if self.backpressure is not None:
+                    # The server's send returns at once; hold the frame
+                    # here while the client has not read the ones before
+                    await self.backpressure.drained(self.outbox.stall_timeout)
+                with timed('socket_send_seconds', label):
+                    if isinstance(frame, bytes):
+                        await self.send(bytes_data=frame)
+                    else:
+                        await self.send(text_data=frame)
+            except TimeoutError:
+                break
+            except Exception:
+                logger.exception('Failed to write to playlist socket')
+                break
+            finally:
+                self.outbox.sending_since = None
+        # Evicting raises StopConsumer, which has to happen in the consumer
+        await self.channel_layer.send(self.channel_name, {'type': 'socket.evict'})
+
+    async def socket_evict(self, event):
+        """Sent by the writer when it gave up on the client"""
+        await self.evict()
+
+    async def evict(self):
+        """
+        Close a client whose socket has not taken a frame for the stall
+        timeout, or that the writer failed to send to.
+
+        The close frame waits behind the data the client has not read, so
+        the server drops the connection when the closing handshake times
+        out. The client reconnects with ?since= and catches up from there.
+        """
+        logger.warning('Evicting playlist socket in room %s', self.room)
+        self.outbox.evicted()
+        self.writer.cancel()
+        await self.close(code=EVICTED_CLOSE_CODE)
+        await self.channel_layer.group_discard(self.group_name, self.channel_name)
+        raise StopConsumer()
+
+    # Group event handlers. Broadcasts arrive already encoded by
+    # broadcast_to_group, so every socket gets the same frame verbatim.
+
+    async def send_frame(self, event):
+        """Queue a pre-encoded event frame for the client"""
+        await self.queue_event(event['text'], HANDLER_EVENTS[event['type']])
+
     async def track_added(self, event):
         """Handler for track.added event"""
-        await self.send(text_data=json.dumps({
-            'type': 'track.added',
-            'item': event['item']
-        }))
-    
+        await self.send_frame(event)
+
     async def track_removed(self, event):
         """Handler for track.removed event"""
-        await self.send(text_data=json.dumps({
-            'type': 'track.removed',
-            'id': event['id']
-        }))
-    
+        await self.send_frame(event)
+
     async def track_moved(self, event):
         """Handler for track.moved event"""
-        await self.send(text_data=json.dumps({
-            'type': 'track.moved',
-            'item': event['item']
-        }))
-    
+        await self.send_frame(event)
+
     async def track_voted(self, event):
         """Handler for track.voted event"""
-        await self.send(text_data=json.dumps({
-            'type': 'track.voted',
-            'item': event['item']
-        }))
-    
+        await self.send_frame(event)
+
     async def track_playing(self, event):
         """Handler for track.playing event"""
-        await self.send(text_data=json.dumps({
-            'type': 'track.playing',
-            'id': event['id']
-        }))
-    
-    async def playlist_reordered(self, event):
-        """Handler for playlist.reordered event"""
-        await self.send(text_data=json.dumps({
-            'type': 'playlist.reordered',
-            'items': event['items']
-        }))
-    
+        await self.send_frame(event)
+
+    async def playlist_rebalanced(self, event):
+        """Handler for playlist.rebalanced event"""
+        await self.send_frame(event)
+
+    async def playlist_mode(self, event):
+        """Handler for playlist.mode event"""
+        await self.send_frame(event)
+
+    async def playlist_batch(self, event):
+        """Handler for playlist.batch event"""
+        await self.send_frame(event)
+
+    def get_since(self):
+        """Parse the `since=<version>` query parameter, if any"""
+        query = parse_qs(self.scope.get('query_string', b'').decode())
+        try:
+            return int(query['since'][0])
+        except (KeyError, ValueError):
+            return None
+
+    async def replay(self, since):
+        """Send the events after `since`, or a snapshot if they are gone"""
+        frames = await self.get_events_since(since)
+        if frames is None:
+            await self.queue_message(encode_event(await self.get_snapshot()), 'playlist.snapshot')
+            return
+        # A replay longer than the outbox collapses into a snapshot
+        for frame in frames:
+            await self.queue_event(frame, 'replay')
+
+    @database_sync_to_async
+    def get_events_since(self, since):
+        """Load logged event frames after a version"""
+        from .events import events_since
+        return events_since(since, self.room)
+
+    @database_sync_to_async
+    def get_snapshot(self):
+        """Load the current snapshot of the room's playlist"""
+        from .events import playlist_snapshot
+        with timed_service('playlist_snapshot'):
+            return playlist_snapshot(self.room)
+
     def get_timestamp(self):
         """Get current timestamp in ISO format"""
         from django.utils import timezone
         return timezone.now().isoformat()
 
 
-def broadcast_to_group(group_name, message):
+def encode_event(message):
+    """
+    Encode an event into the text frame delivered to WebSocket clients.
+
+    Called once per broadcast, not once per connected socket.
+    """
+    return json.dumps(message)
+
+
+def build_group_message(message, frame=None):
+    """
+    Build the channel layer message for an event.
+
+    The event is serialized here (unless an already encoded `frame` is
+    given) and carried through the layer as a string, which the consumer
+    handlers send without decoding or re-encoding.
+    """
+    return {
+        'type': EVENT_HANDLERS[message['type']],
+        'text': frame if frame is not None else encode_event(message),
+    }
+
+
+def broadcast_to_group(group_name, message, frame=None):
     """
     Helper function to broadcast messages to a channel group.
     This is used from synchronous views.
     """
-    from channels.layers import get_channel_layer
     channel_layer = get_channel_layer()
-    
+
     if channel_layer:
-        # Map message types to consumer method names
-        type_map = {
-            'track.added': 'track_added',
-            'track.removed': 'track_removed',
-            'track.moved': 'track_moved',
-            'track.voted': 'track_voted',
-            'track.playing': 'track_playing',
-            'playlist.reordered': 'playlist_reordered',
-        }
-        
-        message_type = message.get('type')
-        handler_name = type_map.get(message_type, 'track_added')
-        
-        channel_layer.group_send(
+        async_to_sync(channel_layer.group_send)(
             group_name,
-            {
-                'type': handler_name,
-                **message
-            }
+            build_group_message(message, frame)
         )
-
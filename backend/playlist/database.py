@@ -0,0 +1,77 @@
+"""
+SQLite tuning for concurrent writers.
+
+Django 5.0 has no SQLite option for PRAGMAs, so they are applied from the
+connection_created signal, once per new connection. Mutations run in
+write_transaction so that writers wait for each other instead of failing.
+"""
+
+import threading
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+
+from .models import Playlist
+
+
+# Held by the thread running a SQLite write_transaction; reentrant so that
+# nested write transactions in one thread do not wait for themselves
+_write_lock = threading.RLock()
+
+
+def configure_sqlite(sender, connection, **kwargs):
+    """Apply settings.SQLITE_PRAGMAS to a new SQLite connection"""
+    if connection.vendor != 'sqlite':
+        return
+    pragmas = getattr(settings, 'SQLITE_PRAGMAS', {})
+    if not pragmas:
+        return
+    with connection.cursor() as cursor:
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name} = {value}')
+
+
+def sqlite_settings(connection):
+    """Current values of the tuned PRAGMAs on a connection, for diagnostics"""
+    with connection.cursor() as cursor:
+        values = {}
+        for name in getattr(settings, 'SQLITE_PRAGMAS', {}):
+            cursor.execute(f'PRAGMA {name}')
+            row = cursor.fetchone()
+            # In-memory databases report nothing for some, e.g. mmap_size
+            values[name] = row[0] if row else None
+    return values
+
+
+@contextmanager
+def write_transaction(using=None):
+    """
+    transaction.atomic() that takes the SQLite write lock as it begins.
+
+    SQLite transactions start deferred, so one that reads before it writes
+    has to upgrade its lock later, and if another connection has written in
+    the meantime the upgrade fails at once with "database is locked"; the
+    busy timeout never gets a chance. A no-op UPDATE as the first statement
+    takes the write lock up front, as BEGIN IMMEDIATE would (which Django
+    5.0 cannot issue), so concurrent writers queue on the busy timeout
+    instead.
+
+    The busy timeout alone does not hold up under many writer threads in
+    one process: SQLite retries a locked database with sleeps, not in
+    arrival order, so with dozens of threads waiting some run out of time
+    while others take the lock again and again. Writers in one process
+    therefore also queue on a process-wide lock, taken before the
+    transaction begins, and only one at a time waits on SQLite, for
+    writers in other processes. Other databases get a plain atomic block.
+    """
+    connection = connections[using or DEFAULT_DB_ALIAS]
+    if connection.vendor != 'sqlite':
+        with transaction.atomic(using=using):
+            yield
+        return
+    with _write_lock, transaction.atomic(using=using):
+        table = connection.ops.quote_name(Playlist._meta.db_table)
+        with connection.cursor() as cursor:
+            cursor.execute(f'UPDATE {table} SET version = version WHERE 0')
+        yield
@@ -0,0 +1,153 @@
+"""
+Publishing of playlist change events.
+
+Every mutation is stamped with the playlist version it produced, so clients
+can tell when they missed an event and ask for a snapshot resync. The most
+recent events are kept in a bounded log so reconnecting clients can replay
+what they missed instead of refetching the whole playlist.
+"""
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.db import transaction
+
+from .consumers import HANDLER_EVENTS, build_group_message, encode_event
+from .metrics import current_trace, timed
+from .models import Playlist, PlaylistEvent, PlaylistTrack
+from .serializers import playlist_track_rows
+
+
+GROUP_NAME = 'playlist'
+
+
+def group_name(room=Playlist.DEFAULT_ID):
+    """
+    Channel group of a playlist room.
+
+    Only sockets in the room join it, so a broadcast fans out to that
+    room's listeners rather than to every socket in the deployment.
+    """
+    if room == Playlist.DEFAULT_ID:
+        return GROUP_NAME
+    return f'{GROUP_NAME}.{room}'
+
+
+def record_event(message, room=Playlist.DEFAULT_ID):
+    """
+    Stamp an event with the room's next version and append it to its log.
+
+    Call inside the transaction of the mutation the event describes, then
+    broadcast the returned message once the transaction has committed.
+
+    Args:
+        message: Event dict with at least a 'type' key
+        room: ID of the playlist room the event belongs to
+
+    Returns:
+        tuple: (group name, channel layer message carrying the encoded frame)
+    """
+    trace = current_trace()
+    if trace is not None:
+        message['trace'] = dict(trace)
+    with transaction.atomic():
+        version = Playlist.next_version(room)
+        message['version'] = version
+        with timed('encode_seconds', message['type']):
+            frame = encode_event(message)
+        PlaylistEvent.objects.create(playlist_id=room, version=version, frame=frame)
+        # Keep the log bounded to the retained window
+        PlaylistEvent.objects.filter(
+            playlist_id=room,
+            version__lte=version - settings.PLAYLIST_EVENT_LOG_SIZE
+        ).delete()
+    return group_name(room), build_group_message(message, frame)
+
+
+def broadcast_events(events):
+    """Broadcast recorded events to their room groups from sync code"""
+    channel_layer = get_channel_layer()
+    if channel_layer:
+        for group, group_message in events:
+            with timed('group_send_seconds', HANDLER_EVENTS[group_message['type']]):
+                async_to_sync(channel_layer.group_send)(group, group_message)
+
+
+async def abroadcast_events(events):
+    """Broadcast recorded events to their room groups from async code"""
+    channel_layer = get_channel_layer()
+    if channel_layer:
+        for group, group_message in events:
+            with timed('group_send_seconds', HANDLER_EVENTS[group_message['type']]):
+                await channel_layer.group_send(group, group_message)
+
+
+def publish_event(message, room=Playlist.DEFAULT_ID):
+    """
+    Record an event and broadcast it straight away.
+
+    Args:
+        message: Event dict with at least a 'type' key
+        room: ID of the playlist room the event belongs to
+
+    Returns:
+        dict: The broadcast message, including its 'version'
+    """
+    broadcast_events([record_event(message, room)])
+    return message
+
+
+def events_since(since, room=Playlist.DEFAULT_ID):
+    """
+    Get the encoded events a client missed since a given version.
+
+    Args:
+        since: Last room version the client has applied
+        room: ID of the playlist room
+
+    Returns:
+        list: Encoded frames in version order, or None if the gap is older
+        than the retained log (or otherwise unknown) and the client needs a
+        full snapshot instead
+    """
+    with transaction.atomic():
+        current = Playlist.current_version(room)
+        if since > current:
+            return None
+        if since == current:
+            return []
+
+        events = list(
+            PlaylistEvent.objects.filter(playlist_id=room, version__gt=since)
+            .order_by('version')
+            .values_list('version', 'frame')
+        )
+
+    # The log must still hold the first event after `since`
+    if not events or events[0][0] != since + 1:
+        return None
+    return [frame for _, frame in events]
+
+
+def playlist_snapshot(room=Playlist.DEFAULT_ID):
+    """
+    Build a full snapshot of a room's playlist for clients that need to resync.
+
+    Returns:
+        dict: 'playlist.snapshot' event with the items in the room's queue
+        order, the queue mode and the version they correspond to
+    """
+    with transaction.atomic():
+        state = Playlist.objects.filter(id=room).values_list('version', 'queue_mode').first()
+        version, mode = state or (0, Playlist.QUEUE_POSITION)
+        items = PlaylistTrack.objects.filter(playlist_id=room)
+        if mode == Playlist.QUEUE_VOTES:
+            items = items.order_by('-votes', 'position', 'id')
+        else:
+            items = items.order_by('position')
+        return {
+            'type': 'playlist.snapshot',
+            'version': version,
+            'mode': mode,
+            'items': playlist_track_rows(items),
+        }
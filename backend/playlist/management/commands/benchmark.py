@@ -0,0 +1,94 @@
+"""
+Management command to run the playlist performance benchmarks.
+Run with: python manage.py benchmark <name> [options]
+
+Record a baseline with --save-baseline <file>; a later run with
+--baseline <file> fails if any metric regressed by more than --tolerance.
+"""
+
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from playlist.benchmarks import BENCHMARKS
+from playlist.benchmarks.baseline import BaselineMismatch, compare_rows, load_baseline, save_baseline
+
+
+class Command(BaseCommand):
+    help = 'Runs a playlist performance benchmark and prints the results'
+
+    def add_arguments(self, parser):
+        subparsers = parser.add_subparsers(dest='benchmark', required=True)
+        for name, module in BENCHMARKS.items():
+            subparser = subparsers.add_parser(
+                name,
+                help=module.__doc__.strip().splitlines()[0],
+            )
+            subparser.add_argument(
+                '--json',
+                action='store_true',
+                help='Print results as JSON instead of a table',
+            )
+            subparser.add_argument(
+                '--save-baseline',
+                metavar='FILE',
+                help='Write the results to FILE as a JSON baseline',
+            )
+            subparser.add_argument(
+                '--baseline',
+                metavar='FILE',
+                help='Compare the results to a baseline and fail on regressions',
+            )
+            subparser.add_argument(
+                '--tolerance',
+                type=float,
+                default=0.25,
+                help='Fraction by which a metric may be worse than the baseline (default 0.25)',
+            )
+            module.add_arguments(subparser)
+
+    def handle(self, *args, **options):
+        name = options['benchmark']
+        rows = BENCHMARKS[name].run(**options)
+
+        if options['json']:
+            self.stdout.write(json.dumps(rows, indent=2))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'Benchmark: {name}'))
+            self.write_table(rows)
+
+        if options['save_baseline']:
+            save_baseline(options['save_baseline'], name, rows)
+            self.stderr.write(f'Baseline written to {options["save_baseline"]}')
+        if options['baseline']:
+            self.check_baseline(name, rows, options['baseline'], options['tolerance'])
+
+    def check_baseline(self, name, rows, path, tolerance):
+        try:
+            regressions = compare_rows(load_baseline(path, name), rows, tolerance)
+        except (OSError, ValueError, BaselineMismatch) as error:
+            raise CommandError(f'Cannot compare to {path}: {error}')
+        if regressions:
+            raise CommandError(
+                f'{len(regressions)} regression(s) against {path}:\n' + '\n'.join(regressions)
+            )
+        self.stderr.write(self.style.SUCCESS(f'No regressions against {path}'))
+
+    def write_table(self, rows):
+        if not rows:
+            self.stdout.write('No results')
+            return
+        columns = list(rows[0].keys())
+        cells = [[self.format_cell(row.get(col)) for col in columns] for row in rows]
+        widths = [
+            max(len(col), *(len(line[i]) for line in cells))
+            for i, col in enumerate(columns)
+        ]
+        self.stdout.write('  '.join(col.rjust(w) for col, w in zip(columns, widths)))
+        for line in cells:
+            self.stdout.write('  '.join(cell.rjust(w) for cell, w in zip(line, widths)))
+
+    def format_cell(self, value):
+        if isinstance(value, float):
+            return f'{value:.3f}'
+        return str(value)
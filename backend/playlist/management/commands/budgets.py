@@ -0,0 +1,73 @@
+"""
+Management command to report the query and serialization budget of every
+REST endpoint, with the plan of each query.
+Run with: python manage.py budgets [--plans] [--json]
+"""
+
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+
+from playlist.benchmarks.harness import benchmark_database, create_playlist
+from playlist.budgets import BUDGET_ITEMS, BUDGETS, measure_endpoints, over_budget, query_plans
+from playlist.models import Track
+
+
+class Command(BaseCommand):
+    help = 'Measures every endpoint against its query and serialization budget'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--plans',
+            action='store_true',
+            help='Print the plan of every query, not only of full table scans',
+        )
+        parser.add_argument(
+            '--json',
+            action='store_true',
+            help='Print the report as JSON',
+        )
+
+    def handle(self, *args, **options):
+        with benchmark_database():
+            item_ids = create_playlist(BUDGET_ITEMS)
+            track = Track.objects.create(id='budget-track', title='Budget', artist='Artist', duration_seconds=180)
+            client = Client(raise_request_exception=False, HTTP_HOST='localhost')
+            report = [
+                {
+                    'endpoint': key,
+                    'status': response.status_code,
+                    'queries': usage.query_count,
+                    'query_budget': BUDGETS[key].queries,
+                    'serialize_ms': usage.serialize_ms,
+                    'serialize_budget_ms': BUDGETS[key].serialize_ms,
+                    'over_budget': over_budget(key, usage),
+                    'plans': query_plans(usage),
+                }
+                for key, response, usage in measure_endpoints(client, item_ids, track.id)
+            ]
+
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2))
+        else:
+            for row in report:
+                self.write_endpoint(row, options['plans'])
+
+        failed = [row['endpoint'] for row in report if row['over_budget']]
+        if failed:
+            raise CommandError(f'Over budget: {", ".join(failed)}')
+
+    def write_endpoint(self, row, all_plans):
+        style = self.style.ERROR if row['over_budget'] else self.style.SUCCESS
+        self.stdout.write(style(
+            f'{row["endpoint"]}: {row["queries"]}/{row["query_budget"]} queries, '
+            f'{row["serialize_ms"]:.2f}/{row["serialize_budget_ms"]} ms serializing'
+        ))
+        for plan in row['plans']:
+            if not (all_plans or plan['full_scan']):
+                continue
+            label = 'FULL SCAN ' if plan['full_scan'] else ''
+            self.stdout.write(f'  {label}{plan["ms"]:.2f} ms  {plan["sql"]}')
+            for line in plan['plan']:
+                self.stdout.write(f'    {line}')
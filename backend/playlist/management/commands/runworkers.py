@@ -0,0 +1,67 @@
+"""
+Management command to serve the ASGI application from several worker processes.
+Run with: python manage.py runworkers --workers 4 --port 4000
+"""
+
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from playlist.workers import DEFAULT_APPLICATION, WorkerSupervisor, layer_is_shared
+
+
+class Command(BaseCommand):
+    help = 'Runs N Daphne workers sharing one listening socket, restarting any that exit'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=os.cpu_count() or 1,
+            help='Number of worker processes (default: one per CPU)',
+        )
+        parser.add_argument(
+            '--bind',
+            default='0.0.0.0',
+            help='Address to listen on',
+        )
+        parser.add_argument(
+            '--port',
+            type=int,
+            default=4000,
+            help='Port to listen on',
+        )
+        parser.add_argument(
+            '--application',
+            default=DEFAULT_APPLICATION,
+            help='ASGI application as module:attribute',
+        )
+        parser.add_argument(
+            '--deflate',
+            action='store_true',
+            help='Compress WebSocket frames with permessage-deflate',
+        )
+        parser.add_argument(
+            'daphne_args',
+            nargs='*',
+            help='Extra Daphne options for every worker, after --',
+        )
+
+    def handle(self, *args, **options):
+        if options['workers'] < 1:
+            raise CommandError('--workers must be at least 1')
+        if options['workers'] > 1 and not layer_is_shared():
+            raise CommandError(
+                'The in-memory channel layer cannot broadcast between workers; '
+                'set CHANNEL_LAYERS_BACKEND to a Redis layer or use --workers 1'
+            )
+
+        WorkerSupervisor(
+            options['workers'],
+            host=options['bind'],
+            port=options['port'],
+            application=options['application'],
+            daphne_args=options['daphne_args'],
+            deflate=options['deflate'],
+            log=self.stdout.write,
+        ).run()
@@ -1,12 +1,16 @@
 """
 Management command to seed the database with tracks and initial playlist.
 Run with: python manage.py seed_data
+Import a catalog with: python manage.py seed_data --file catalog.csv
 """
 
-from django.core.management.base import BaseCommand
-from playlist.models import Track, PlaylistTrack
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from playlist.catalog import FORMATS, import_catalog
+from playlist.models import Playlist, Track, PlaylistTrack
 from django.utils import timezone
 import random
+import time
 
 
 TRACKS_DATA = [
@@ -77,12 +81,42 @@ class Command(BaseCommand):
             action='store_true',
             help='Clear existing data before seeding',
         )
+        parser.add_argument(
+            '--file',
+            help='Import the track library from a CSV or JSON Lines catalog '
+                 'instead of the built-in tracks (the playlist is left alone)',
+        )
+        parser.add_argument(
+            '--format',
+            choices=FORMATS,
+            help='Catalog format (default: from the file extension)',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=5000,
+            help='Tracks per bulk upsert and transaction',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=1,
+            help='Parser processes (1 parses in the importing process)',
+        )
 
     def handle(self, *args, **options):
         if options['clear']:
             self.stdout.write(self.style.WARNING('Clearing existing data...'))
-            PlaylistTrack.objects.all().delete()
-            Track.objects.all().delete()
+            with transaction.atomic():
+                # Queryset deletes skip Track.delete(); bump the library and
+                # every room with items while they still list the tracks
+                Track.changed(Track.objects.all())
+                PlaylistTrack.objects.all().delete()
+                Track.objects.all().delete()
+
+        if options['file']:
+            self.import_file(options)
+            return
 
         # Create tracks
         self.stdout.write('Creating tracks...')
@@ -101,7 +135,8 @@ class Command(BaseCommand):
 
         # Create initial playlist (8-10 tracks with variety)
         self.stdout.write('Creating initial playlist...')
-        PlaylistTrack.objects.all().delete()  # Clear existing playlist
+        # Clear the default room's playlist; other rooms keep theirs
+        PlaylistTrack.objects.filter(playlist_id=Playlist.DEFAULT_ID).delete()
         
         initial_track_ids = [
             "track-11",  # Midnight Dreams (Electronic)
@@ -131,10 +166,14 @@ class Command(BaseCommand):
                 added_by=random.choice(users),
                 added_at=timezone.now(),
                 is_playing=(idx == 0),  # First track is playing
+                played_at=timezone.now() if idx == 0 else None,
             )
             playlist_items.append(playlist_item)
             position += 1.0
 
+        # Move clients and cached responses off the pre-seed playlist
+        Playlist.next_version()
+
         self.stdout.write(
             self.style.SUCCESS(
                 f'Successfully created playlist with {len(playlist_items)} tracks'
@@ -144,3 +183,41 @@ class Command(BaseCommand):
             self.style.SUCCESS('Database seeding completed!')
         )
 
+    def import_file(self, options):
+        """Stream a catalog file into the library, reporting progress"""
+        self.stdout.write(f'Importing tracks from {options["file"]}...')
+        last_report = time.perf_counter()
+
+        def report(stats):
+            nonlocal last_report
+            if time.perf_counter() - last_report >= 1:
+                last_report = time.perf_counter()
+                self.write_progress(stats)
+
+        try:
+            stats = import_catalog(
+                options['file'],
+                file_format=options['format'],
+                batch_size=options['batch_size'],
+                workers=options['workers'],
+                progress=report,
+            )
+        except (OSError, ValueError) as error:
+            raise CommandError(f'Could not import {options["file"]}: {error}')
+
+        self.write_progress(stats)
+        for line_number, error in stats.errors:
+            self.stdout.write(self.style.WARNING(f'Skipped line {line_number}: {error}'))
+        if stats.skipped > len(stats.errors):
+            self.stdout.write(self.style.WARNING(
+                f'... and {stats.skipped - len(stats.errors)} more invalid lines'
+            ))
+        self.stdout.write(
+            self.style.SUCCESS(f'Successfully imported {stats.imported} tracks')
+        )
+
+    def write_progress(self, stats):
+        self.stdout.write(
+            f'  {stats.imported} tracks, {stats.skipped} skipped, '
+            f'{stats.rows_per_sec:,.0f} rows/sec, peak RSS {stats.peak_rss_mb:.1f} MB'
+        )
@@ -0,0 +1,219 @@
+"""
+Latency histograms for the realtime pipeline, per process.
+
+A mutation's time is split into the stages it passes on its way to the
+clients, each recorded under a label:
+
+- db_seconds: the service call of a view or socket command (its database
+  work and serialization), by service
+- serialize_seconds: building a response's data with the serializers, by
+  the service it ran in ('other' outside one)
+- encode_seconds: encoding an event into its frame, by event type
+- group_send_seconds: handing the frame to the channel layer, by event type
+- outbox_wait_seconds: a frame's time in a socket's outbox, by event type
+- socket_send_seconds: writing a frame to a socket, by event type
+
+Histograms use fixed buckets, so recording is a bisect and a counter
+increment. GET /api/metrics serves them as JSON and GET
+/api/metrics/prometheus in the Prometheus text format.
+
+A client that sends an X-Trace-Id header (or a trace_id with a socket
+command) gets the events of that mutation stamped with
+{'id': ..., 'ts': server time the mutation started}, so it can time the
+whole round trip to its own socket and other clients can time delivery.
+"""
+
+import bisect
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+
+
+# Upper bounds in seconds, 100 µs to 10 s
+BUCKETS = (
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+    0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+
+# Histogram name -> name of its label
+HISTOGRAMS = {
+    'db_seconds': 'service',
+    'serialize_seconds': 'service',
+    'encode_seconds': 'event',
+    'group_send_seconds': 'event',
+    'outbox_wait_seconds': 'event',
+    'socket_send_seconds': 'event',
+}
+
+
+class Histogram:
+    """Counts of observed durations per bucket, plus their count and sum"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        # One count per bucket, the last for anything slower than BUCKETS
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, seconds):
+        index = bisect.bisect_left(BUCKETS, seconds)
+        with self.lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.sum += seconds
+
+    def quantile(self, counts, count, q):
+        """Upper bound of the bucket holding quantile `q`"""
+        rank = q * count
+        seen = 0
+        for bound, bucket_count in zip(BUCKETS, counts):
+            seen += bucket_count
+            if seen >= rank:
+                return bound
+        return float('inf')
+
+    def as_dict(self):
+        with self.lock:
+            counts, count, total = list(self.counts), self.count, self.sum
+        cumulative, buckets = 0, {}
+        for bound, bucket_count in zip(BUCKETS, counts):
+            cumulative += bucket_count
+            buckets[str(bound)] = cumulative
+        buckets['+Inf'] = count
+        return {
+            'count': count,
+            'sum': total,
+            'p50': self.quantile(counts, count, 0.5) if count else 0.0,
+            'p99': self.quantile(counts, count, 0.99) if count else 0.0,
+            'buckets': buckets,
+        }
+
+
+_histograms = {name: {} for name in HISTOGRAMS}
+_lock = threading.Lock()
+
+
+def observe(name, label, seconds):
+    """Record a duration in the histogram `name` under `label`"""
+    family = _histograms[name]
+    histogram = family.get(label)
+    if histogram is None:
+        with _lock:
+            histogram = family.setdefault(label, Histogram())
+    histogram.observe(seconds)
+
+
+@contextmanager
+def timed(name, label):
+    """Record the time spent in the block, including awaits in async code"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, label, time.perf_counter() - start)
+
+
+_service = contextvars.ContextVar('playlist_service', default=None)
+
+
+@contextmanager
+def timed_service(service):
+    """Time a service call in db_seconds, labelling its serialization by it"""
+    token = _service.set(service)
+    try:
+        with timed('db_seconds', service):
+            yield
+    finally:
+        _service.reset(token)
+
+
+def current_service():
+    """Name of the service call being timed, None outside one"""
+    return _service.get()
+
+
+def reset_metrics():
+    with _lock:
+        for family in _histograms.values():
+            family.clear()
+
+
+def metrics():
+    """Every histogram by name and label, plus the connected socket count"""
+    from .outbox import outbox_stats
+    with _lock:
+        families = {name: dict(family) for name, family in _histograms.items()}
+    return {
+        'histograms': {
+            name: {label: histogram.as_dict() for label, histogram in sorted(family.items())}
+            for name, family in families.items()
+        },
+        'sockets': outbox_stats()['connections'],
+    }
+
+
+def prometheus_metrics():
+    """metrics() in the Prometheus text exposition format"""
+    data = metrics()
+    lines = []
+    for name, family in data['histograms'].items():
+        metric = f'playlist_{name}'
+        label_name = HISTOGRAMS[name]
+        lines.append(f'# TYPE {metric} histogram')
+        for label, histogram in family.items():
+            for bound, count in histogram['buckets'].items():
+                lines.append(f'{metric}_bucket{{{label_name}="{label}",le="{bound}"}} {count}')
+            lines.append(f'{metric}_sum{{{label_name}="{label}"}} {histogram["sum"]}')
+            lines.append(f'{metric}_count{{{label_name}="{label}"}} {histogram["count"]}')
+    lines.append('# TYPE playlist_sockets gauge')
+    lines.append(f'playlist_sockets {data["sockets"]}')
+    return '\n'.join(lines) + '\n'
+
+
+_trace = contextvars.ContextVar('playlist_trace', default=None)
+
+
+@contextmanager
+def tracing(trace_id):
+    """Stamp the events recorded in the block with a client's trace ID"""
+    if not trace_id:
+        yield
+        return
+    token = _trace.set({'id': str(trace_id)[:64], 'ts': time.time()})
+    try:
+        yield
+    finally:
+        _trace.reset(token)
+
+
+def current_trace():
+    """Trace of the mutation being handled, None if the client sent none"""
+    return _trace.get()
+
+
+class TraceMiddleware:
+    """Carries the X-Trace-Id request header into the events a request records"""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        with tracing(request.headers.get('X-Trace-Id')):
+            return self.get_response(request)
+
+    async def __acall__(self, request):
+        with tracing(request.headers.get('X-Trace-Id')):
+            return await self.get_response(request)
+
@@ -0,0 +1,20 @@
+# Generated by Django 5.0.1 on 2026-10-18 02:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('playlist', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Playlist',
+            fields=[
+                ('id', models.CharField(default='default', max_length=100, primary_key=True, serialize=False)),
+                ('version', models.BigIntegerField(default=0, help_text='Incremented on every mutation')),
+            ],
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.0.1 on 2026-10-18 02:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('playlist', '0002_playlist'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PlaylistEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.BigIntegerField(help_text='Playlist version produced by the event', unique=True)),
+                ('frame', models.TextField(help_text='Encoded event exactly as broadcast to clients')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['version'],
+            },
+        ),
+    ]
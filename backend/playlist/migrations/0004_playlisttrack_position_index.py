@@ -0,0 +1,21 @@
+# Generated by Django 5.0.1 on 2026-10-18 02:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('playlist', '0003_playlistevent'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='playlisttrack',
+            index=models.Index(fields=['position', 'id'], name='playlist_position_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='playlisttrack',
+            constraint=models.UniqueConstraint(fields=('track',), name='playlist_unique_track'),
+        ),
+    ]
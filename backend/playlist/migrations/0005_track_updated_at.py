@@ -0,0 +1,27 @@
+# Generated by Django 5.0.1 on 2026-10-18 02:40
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('playlist', '0004_playlisttrack_position_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='track',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.CreateModel(
+            name='Library',
+            fields=[
+                ('id', models.PositiveSmallIntegerField(default=1, primary_key=True, serialize=False)),
+                ('version', models.BigIntegerField(default=0, help_text='Incremented on every change to a track')),
+            ],
+        ),
+    ]
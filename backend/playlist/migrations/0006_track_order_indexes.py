@@ -0,0 +1,29 @@
+# Generated by Django 5.0.1 on 2026-10-18 02:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('playlist', '0005_track_updated_at'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='track',
+            options={'ordering': ['title', 'artist', 'id']},
+        ),
+        migrations.AddIndex(
+            model_name='track',
+            index=models.Index(fields=['title', 'artist', 'id'], name='track_order_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='track',
+            index=models.Index(fields=['genre', 'title', 'artist', 'id'], name='track_genre_order_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='track',
+            index=models.Index(fields=['artist', 'title', 'id'], name='track_artist_order_idx'),
+        ),
+    ]
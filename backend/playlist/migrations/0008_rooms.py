@@ -0,0 +1,60 @@
+# Generated by Django 5.0.1 on 2026-10-18 02:52
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def create_default_room(apps, schema_editor):
+    # Existing items and events move into the default room
+    Playlist = apps.get_model('playlist', 'Playlist')
+    Playlist.objects.get_or_create(id='default')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('playlist', '0007_track_search_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_default_room, migrations.RunPython.noop),
+        migrations.AlterModelOptions(
+            name='playlistevent',
+            options={'ordering': ['playlist', 'version']},
+        ),
+        migrations.RemoveConstraint(
+            model_name='playlisttrack',
+            name='playlist_unique_track',
+        ),
+        migrations.RemoveIndex(
+            model_name='playlisttrack',
+            name='playlist_position_idx',
+        ),
+        migrations.AddField(
+            model_name='playlistevent',
+            name='playlist',
+            field=models.ForeignKey(default='default', on_delete=django.db.models.deletion.CASCADE, related_name='events', to='playlist.playlist'),
+        ),
+        migrations.AddField(
+            model_name='playlisttrack',
+            name='playlist',
+            field=models.ForeignKey(default='default', on_delete=django.db.models.deletion.CASCADE, related_name='items', to='playlist.playlist'),
+        ),
+        migrations.AlterField(
+            model_name='playlistevent',
+            name='version',
+            field=models.BigIntegerField(help_text='Playlist version produced by the event'),
+        ),
+        migrations.AddIndex(
+            model_name='playlisttrack',
+            index=models.Index(fields=['playlist', 'position', 'id'], name='playlist_position_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='playlistevent',
+            constraint=models.UniqueConstraint(fields=('playlist', 'version'), name='playlist_event_version'),
+        ),
+        migrations.AddConstraint(
+            model_name='playlisttrack',
+            constraint=models.UniqueConstraint(fields=('playlist', 'track'), name='playlist_unique_track'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.0.1 on 2026-10-18 03:11
+
+from django.db import migrations, models
+
+
+def stop_extra_playing(apps, schema_editor):
+    # Keep only the most recently started playing item of each room
+    PlaylistTrack = apps.get_model('playlist', 'PlaylistTrack')
+    seen = set()
+    playing = PlaylistTrack.objects.filter(is_playing=True).order_by('playlist_id', '-played_at', '-added_at')
+    for item in playing:
+        if item.playlist_id in seen:
+            PlaylistTrack.objects.filter(id=item.id).update(is_playing=False)
+        seen.add(item.playlist_id)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('playlist', '0008_rooms'),
+    ]
+
+    operations = [
+        migrations.RunPython(stop_extra_playing, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='playlisttrack',
+            constraint=models.UniqueConstraint(condition=models.Q(('is_playing', True)), fields=('playlist',), name='playlist_one_playing'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.0.1 on 2026-10-18 03:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('playlist', '0009_one_playing'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='playlist',
+            name='queue_mode',
+            field=models.CharField(choices=[('position', 'By position'), ('votes', 'By votes, ties by position')], default='position', help_text="Order the room's items are listed and played in", max_length=16),
+        ),
+    ]
@@ -1,7 +1,77 @@
-from django.db import models
+from datetime import timedelta
+
+from django.db import models, transaction
+from django.db.models import F, Q
 from django.utils import timezone
 
 
+class Playlist(models.Model):
+    """
+    A playlist room. Each room has its own tracks, event log and version
+    counter, and its own channel group; rooms are created on first use.
+    """
+    DEFAULT_ID = 'default'
+
+    QUEUE_POSITION = 'position'
+    QUEUE_VOTES = 'votes'
+    QUEUE_MODES = [
+        (QUEUE_POSITION, 'By position'),
+        (QUEUE_VOTES, 'By votes, ties by position'),
+    ]
+
+    id = models.CharField(max_length=100, primary_key=True, default=DEFAULT_ID)
+    version = models.BigIntegerField(default=0, help_text="Incremented on every mutation")
+    queue_mode = models.CharField(
+        max_length=16, choices=QUEUE_MODES, default=QUEUE_POSITION,
+        help_text="Order the room's items are listed and played in"
+    )
+
+    def __str__(self):
+        return f"{self.id} (version: {self.version})"
+
+    @classmethod
+    def current_version(cls, playlist_id=DEFAULT_ID):
+        """Return the latest version of the playlist, 0 if never mutated"""
+        version = cls.objects.filter(id=playlist_id).values_list('version', flat=True).first()
+        return version or 0
+
+    @classmethod
+    def next_version(cls, playlist_id=DEFAULT_ID):
+        """Atomically increment and return the playlist version"""
+        with transaction.atomic():
+            if not cls.objects.filter(id=playlist_id).update(version=F('version') + 1):
+                cls.objects.create(id=playlist_id, version=1)
+            return cls.objects.values_list('version', flat=True).get(id=playlist_id)
+
+
+class Library(models.Model):
+    """
+    Version counter of the track library, incremented by every write to a
+    track so cached library pages can be keyed on it. A single row.
+    """
+    DEFAULT_ID = 1
+
+    id = models.PositiveSmallIntegerField(primary_key=True, default=DEFAULT_ID)
+    version = models.BigIntegerField(default=0, help_text="Incremented on every change to a track")
+
+    def __str__(self):
+        return f"library (version: {self.version})"
+
+    @classmethod
+    def current_version(cls):
+        """Return the latest version of the library, 0 if never changed"""
+        version = cls.objects.filter(id=cls.DEFAULT_ID).values_list('version', flat=True).first()
+        return version or 0
+
+    @classmethod
+    def next_version(cls):
+        """Atomically increment and return the library version"""
+        with transaction.atomic():
+            if not cls.objects.filter(id=cls.DEFAULT_ID).update(version=F('version') + 1):
+                cls.objects.create(id=cls.DEFAULT_ID, version=1)
+            return cls.objects.values_list('version', flat=True).get(id=cls.DEFAULT_ID)
+
+
 class Track(models.Model):
     """Track library - available tracks that can be added to playlist"""
     id = models.CharField(max_length=100, primary_key=True)
@@ -11,17 +81,52 @@ class Track(models.Model):
     duration_seconds = models.IntegerField()
     genre = models.CharField(max_length=100, blank=True, default='')
     cover_url = models.URLField(blank=True, null=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
 
     class Meta:
-        ordering = ['title', 'artist']
+        ordering = ['title', 'artist', 'id']
+        indexes = [
+            # Keyset pagination of the library, unfiltered and filtered
+            models.Index(fields=['title', 'artist', 'id'], name='track_order_idx'),
+            models.Index(fields=['genre', 'title', 'artist', 'id'], name='track_genre_order_idx'),
+            models.Index(fields=['artist', 'title', 'id'], name='track_artist_order_idx'),
+        ]
 
     def __str__(self):
         return f"{self.title} - {self.artist}"
 
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            Track.changed([self.id])
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            # Before the cascade removes the rooms' items
+            Track.changed([self.id])
+            return super().delete(*args, **kwargs)
+
+    @staticmethod
+    def changed(tracks):
+        """
+        Expire the cached responses that include `tracks` (IDs or a Track
+        queryset): bump the library version and the version of every room
+        listing one of them. Rooms get no event, so their clients see a
+        version gap on the next one and resync.
+
+        save() and delete() call this; bulk writes and queryset deletes,
+        which skip them, must call it themselves in the same transaction.
+        """
+        Library.next_version()
+        Playlist.objects.filter(items__track__in=tracks).update(version=F('version') + 1)
+
 
 class PlaylistTrack(models.Model):
     """Tracks in the collaborative playlist"""
     id = models.CharField(max_length=100, primary_key=True)
+    playlist = models.ForeignKey(
+        Playlist, on_delete=models.CASCADE, related_name='items', default=Playlist.DEFAULT_ID
+    )
     track = models.ForeignKey(Track, on_delete=models.CASCADE, related_name='playlist_items')
     position = models.FloatField(help_text="Fractional position for ordering")
     votes = models.IntegerField(default=0)
@@ -32,18 +137,62 @@ class PlaylistTrack(models.Model):
 
     class Meta:
         ordering = ['position']
+        indexes = [
+            models.Index(fields=['playlist', 'position', 'id'], name='playlist_position_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['playlist', 'track'], name='playlist_unique_track'),
+            # At most one item per room is playing; also indexes the lookup
+            # of the current one
+            models.UniqueConstraint(
+                fields=['playlist'],
+                condition=Q(is_playing=True),
+                name='playlist_one_playing',
+            ),
+        ]
 
     def __str__(self):
         return f"{self.track.title} (position: {self.position})"
 
-    def save(self, *args, **kwargs):
-        # Ensure only one track is playing at a time
-        if self.is_playing:
-            PlaylistTrack.objects.filter(is_playing=True).exclude(id=self.id).update(
-                is_playing=False,
-                played_at=timezone.now()
-            )
-            if not self.played_at:
-                self.played_at = timezone.now()
-        super().save(*args, **kwargs)
+    def start_playing(self, at=None):
+        """
+        Make this the room's now-playing item, starting at `at` (default now).
 
+        Stops the item playing before it with one UPDATE and sets
+        is_playing and played_at on this instance without saving it. Call
+        inside a transaction and save those two fields in the same one, so
+        the room is never seen with two playing items. While an item plays,
+        played_at is when it started; the playback clock runs from there.
+        """
+        at = at or timezone.now()
+        PlaylistTrack.objects.filter(
+            playlist_id=self.playlist_id, is_playing=True
+        ).exclude(id=self.id).update(
+            is_playing=False,
+            played_at=at
+        )
+        self.is_playing = True
+        self.played_at = at
+
+    def ends_at(self):
+        """When the track finishes if it plays through from played_at"""
+        return self.played_at + timedelta(seconds=self.track.duration_seconds)
+
+
+class PlaylistEvent(models.Model):
+    """Bounded log of broadcast events, replayed to clients that reconnect"""
+    playlist = models.ForeignKey(
+        Playlist, on_delete=models.CASCADE, related_name='events', default=Playlist.DEFAULT_ID
+    )
+    version = models.BigIntegerField(help_text="Playlist version produced by the event")
+    frame = models.TextField(help_text="Encoded event exactly as broadcast to clients")
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['playlist', 'version']
+        constraints = [
+            models.UniqueConstraint(fields=['playlist', 'version'], name='playlist_event_version'),
+        ]
+
+    def __str__(self):
+        return f"{self.playlist_id} event {self.version}"
@@ -0,0 +1,128 @@
+"""
+Bounded outbound queue of one WebSocket connection.
+
+Group events are queued rather than written by the consumer's handler, so
+a client that reads slowly cannot stall the consumer or make the channel
+layer drop its messages. A queue that reaches its limit drops its pending
+events for a single resync marker: the writer replaces it with a snapshot
+built when it gets to it, which carries every change the dropped events
+did. Replies to the client's own messages (pongs, acks) are kept. A
+connection whose writer has been stuck on one frame for longer than the
+stall timeout is evicted. Under playlist.server the writer waits while
+the server's send buffer for the socket is full; other servers only
+block the writer if their send does.
+"""
+
+import asyncio
+import threading
+import time
+import weakref
+from collections import Counter, deque
+
+
+# Placeholder for the snapshot that replaces dropped events
+RESYNC = object()
+
+_outboxes = weakref.WeakSet()
+_counts = Counter()
+_lock = threading.Lock()
+
+
+class Outbox:
+    """Frames waiting to be written to one socket, at most `limit` of them"""
+
+    def __init__(self, limit, stall_timeout):
+        self.limit = limit
+        self.stall_timeout = stall_timeout
+        # (is_event, label, frame, queued at) entries; frame is RESYNC for
+        # the snapshot marker
+        self.frames = deque()
+        self.resync_pending = False
+        # When the writer started on the frame it is sending, None if idle
+        self.sending_since = None
+        self.ready = asyncio.Event()
+        _outboxes.add(self)
+
+    def __len__(self):
+        return len(self.frames)
+
+    def put_event(self, frame, label='event'):
+        """
+        Queue a broadcast event; `label` names its type in the metrics.
+
+        Returns:
+            bool: False if the connection is stalled and should be evicted
+        """
+        if self.stalled():
+            return False
+        if self.resync_pending:
+            # The snapshot that is on its way will include this change
+            return True
+        if len(self.frames) >= self.limit:
+            self.collapse()
+        else:
+            self.frames.append((True, label, frame, time.perf_counter()))
+        self.ready.set()
+        return True
+
+    def put_message(self, frame, label='reply'):
+        """Queue a reply to the client; returns False if stalled, as put_event"""
+        if self.stalled() or len(self.frames) >= 2 * self.limit:
+            return False
+        self.frames.append((False, label, frame, time.perf_counter()))
+        self.ready.set()
+        return True
+
+    def collapse(self):
+        """Replace every queued event with one resync marker"""
+        self.frames = deque(item for item in self.frames if not item[0])
+        self.frames.append((True, 'playlist.snapshot', RESYNC, time.perf_counter()))
+        self.resync_pending = True
+        with _lock:
+            _counts['resyncs'] += 1
+
+    def stalled(self):
+        return (
+            self.sending_since is not None
+            and time.monotonic() - self.sending_since > self.stall_timeout
+        )
+
+    async def get(self):
+        """
+        Next frame to write.
+
+        Returns:
+            tuple: (label, frame or RESYNC for a snapshot, perf_counter
+            time it was queued at)
+        """
+        while not self.frames:
+            self.ready.clear()
+            await self.ready.wait()
+        _, label, frame, queued_at = self.frames.popleft()
+        if frame is RESYNC:
+            self.resync_pending = False
+        return label, frame, queued_at
+
+    def close(self):
+        """Stop counting a closed connection in the stats"""
+        self.frames.clear()
+        _outboxes.discard(self)
+
+    def evicted(self):
+        self.close()
+        with _lock:
+            _counts['evictions'] += 1
+
+
+def outbox_stats():
+    """Queue depths of this process's connections and how often they overflowed"""
+    depths = [len(outbox) for outbox in list(_outboxes)]
+    with _lock:
+        counts = dict(_counts)
+    return {
+        'connections': len(depths),
+        'queued': sum(depths),
+        'max_queued': max(depths, default=0),
+        'resyncs': counts.get('resyncs', 0),
+        'evictions': counts.get('evictions', 0),
+    }
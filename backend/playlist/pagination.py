@@ -0,0 +1,60 @@
+"""
+Keyset (cursor) pagination for the track library.
+
+A cursor holds the sort key of the last track on a page. The next page is
+the tracks that sort after it, which the (title, artist, id) indexes answer
+with a range scan, so any page costs the same however deep it is and
+however large the library grows. Unlike OFFSET, this also cannot skip or
+repeat rows when tracks are added between requests.
+"""
+
+import base64
+import binascii
+import json
+
+from django.db.models import Q
+
+
+TRACKS_PAGE_SIZE = 100
+TRACKS_MAX_PAGE_SIZE = 500
+
+# Sort key of the library; matches Track.Meta.ordering and its indexes
+TRACK_ORDERING = ('title', 'artist', 'id')
+
+
+class InvalidCursor(ValueError):
+    """A cursor could not be decoded"""
+
+
+def encode_cursor(track):
+    """Opaque cursor for the page that follows `track`, a serialized track"""
+    key = [track[field] for field in TRACK_ORDERING]
+    return base64.urlsafe_b64encode(json.dumps(key).encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Sort key stored in a cursor, raising InvalidCursor if it is malformed"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        key = json.loads(base64.urlsafe_b64decode(padded))
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise InvalidCursor(cursor)
+    if not (isinstance(key, list) and len(key) == len(TRACK_ORDERING)
+            and all(isinstance(value, str) for value in key)):
+        raise InvalidCursor(cursor)
+    return key
+
+
+def after_cursor(key):
+    """
+    Filter for tracks sorting strictly after a (title, artist, id) key.
+
+    Written as a range on the leading column plus the tie-breakers, so the
+    database can seek into the index instead of scanning from the start.
+    """
+    title, artist, track_id = key
+    return Q(title__gte=title) & (
+        Q(title__gt=title)
+        | Q(artist__gt=artist)
+        | Q(artist=artist, id__gt=track_id)
+    )
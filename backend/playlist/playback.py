@@ -0,0 +1,229 @@
+"""
+Server-side playback clock.
+
+A room's now-playing item ends at its played_at plus its track's duration.
+The scheduler keeps one deadline per room in a hashed timer wheel ticked
+by a single task, so thousands of rooms cost one wakeup per tick rather
+than one sleeping task each. When deadlines fall due it advances those
+rooms (services.advance_playback) in one database hop and broadcasts their
+track.playing events, stamped with the server's clock so clients can line
+up their progress.
+
+Every ASGI process runs a scheduler. Advancing checks under the write lock
+that the room still plays the item that ended, so when several workers
+wake for the same room only one moves it on. Changes made in this process
+reach the scheduler through notify_playback(); every RESYNC_INTERVAL it
+also reloads all rooms, picking up what other processes started.
+"""
+
+import asyncio
+import logging
+import math
+import time
+from datetime import datetime, timezone
+
+from channels.db import database_sync_to_async
+from django.conf import settings
+
+from .events import abroadcast_events
+
+
+logger = logging.getLogger(__name__)
+
+RESYNC_INTERVAL = 60.0
+
+
+class TimerWheel:
+    """
+    Hashed timer wheel with at most one timer per key.
+
+    Deadlines are rounded up to whole ticks and hashed into `slots`
+    buckets, so scheduling and cancelling are O(1) and each tick looks at
+    one bucket. A deadline more than a revolution ahead stays in its bucket
+    until the round it is due in.
+    """
+
+    def __init__(self, tick, slots=512, start=0.0):
+        self.tick = tick
+        self.slots = [{} for _ in range(slots)]
+        self.timers = {}
+        # Last tick number processed
+        self.current = math.floor(start / tick)
+
+    def __len__(self):
+        return len(self.timers)
+
+    def __contains__(self, key):
+        return key in self.timers
+
+    def schedule(self, key, when, value=None):
+        """Set the timer for `key` to `when`, replacing any earlier one"""
+        self.cancel(key)
+        number = max(math.ceil(when / self.tick), self.current + 1)
+        self.timers[key] = (number, value)
+        self.slots[number % len(self.slots)][key] = number
+
+    def cancel(self, key):
+        timer = self.timers.pop(key, None)
+        if timer is not None:
+            del self.slots[timer[0] % len(self.slots)][key]
+
+    def advance(self, now):
+        """
+        Expire every timer due by `now`.
+
+        Returns:
+            list: (key, value) of the expired timers
+        """
+        target = math.floor(now / self.tick)
+        due = []
+        # After a stall longer than a revolution, one pass over every
+        # bucket finds all that is due
+        first = max(self.current + 1, target - len(self.slots) + 1)
+        for number in range(first, target + 1):
+            bucket = self.slots[number % len(self.slots)]
+            for key, deadline in list(bucket.items()):
+                if deadline <= target:
+                    del bucket[key]
+                    due.append((key, self.timers.pop(key)[1]))
+        self.current = max(self.current, target)
+        return due
+
+
+class PlaybackScheduler:
+    """Advances every room's playback as its tracks finish"""
+
+    def __init__(self, tick, slots=512, clock=time.time):
+        self.clock = clock
+        self.wheel = TimerWheel(tick, slots, start=clock())
+        self.stale = set()
+        self.next_resync = 0.0
+        self.loop = None
+        self.task = None
+
+    def start(self):
+        """Start ticking on the running event loop, unless already running"""
+        loop = asyncio.get_running_loop()
+        if self.task is None or self.task.done() or self.loop is not loop:
+            self.loop = loop
+            self.task = self.loop.create_task(self.run())
+
+    async def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            await asyncio.gather(self.task, return_exceptions=True)
+            self.task = None
+
+    def notify(self, room):
+        """Reload a room's now-playing item at the next tick; thread-safe"""
+        loop = self.loop
+        if loop is not None and not loop.is_closed():
+            loop.call_soon_threadsafe(self.stale.add, room)
+
+    async def run(self):
+        while True:
+            await asyncio.sleep(self.wheel.tick)
+            try:
+                await self.tick()
+            except Exception:
+                logger.exception('Playback scheduler tick failed')
+
+    async def tick(self):
+        """Pick up changed rooms, then advance the rooms whose track ended"""
+        now = self.clock()
+        if now >= self.next_resync:
+            self.next_resync = now + RESYNC_INTERVAL
+            self.stale.clear()
+            self.reschedule(None, await database_sync_to_async(load_rooms)(None))
+        elif self.stale:
+            rooms, self.stale = self.stale, set()
+            self.reschedule(rooms, await database_sync_to_async(load_rooms)(rooms))
+
+        due = self.wheel.advance(now)
+        if due:
+            playing, events = await database_sync_to_async(advance_rooms)(due, now)
+            await abroadcast_events(events)
+            self.reschedule([room for room, _ in due], playing)
+
+    def reschedule(self, rooms, playing):
+        """
+        Set the timers of `rooms` (None for all) from their playing items.
+
+        Args:
+            rooms: Room IDs that were looked up, or None for every room
+            playing: Dict of room ID to (item ID, end timestamp)
+        """
+        for room in list(self.wheel.timers) if rooms is None else rooms:
+            if room not in playing:
+                self.wheel.cancel(room)
+        for room, (playlist_id, ends_at) in playing.items():
+            self.wheel.schedule(room, ends_at, playlist_id)
+
+
+def deadline(playlist_item):
+    """(item ID, end timestamp) timer entry of a playing item"""
+    return playlist_item.id, playlist_item.ends_at().timestamp()
+
+
+def load_rooms(rooms):
+    """Timer entries of the rooms' playing items, by room"""
+    from . import services
+    return {room: deadline(item) for room, item in services.now_playing(rooms).items()}
+
+
+def advance_rooms(due, now):
+    """
+    Advance every room whose timer expired in one database hop.
+
+    Args:
+        due: List of (room ID, ID of the item expected to have finished)
+        now: Timestamp the scheduler's clock expired them at
+
+    Returns:
+        tuple: (timer entries of the rooms still playing, events to broadcast)
+    """
+    from . import services
+    now = datetime.fromtimestamp(now, tz=timezone.utc)
+    playing, events = {}, []
+    for room, playlist_id in due:
+        item, room_events = services.advance_playback(room, playlist_id, now)
+        if item is not None:
+            playing[room] = deadline(item)
+        events.extend(room_events)
+    return playing, events
+
+
+_scheduler = None
+
+
+def start_playback_scheduler():
+    """Start this process's scheduler on the running loop if enabled"""
+    global _scheduler
+    if not settings.PLAYLIST_PLAYBACK_SCHEDULER:
+        return None
+    if _scheduler is None:
+        _scheduler = PlaybackScheduler(settings.PLAYLIST_PLAYBACK_TICK_MS / 1000)
+    _scheduler.start()
+    return _scheduler
+
+
+def notify_playback(room):
+    """Tell this process's scheduler that a room's now-playing item changed"""
+    if _scheduler is not None:
+        _scheduler.notify(room)
+
+
+class PlaybackSchedulerMiddleware:
+    """
+    ASGI middleware starting the playback scheduler with the first connection.
+
+    Daphne sends no lifespan events, so the scheduler starts on the first
+    HTTP request or WebSocket connection the process handles.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        start_playback_scheduler()
+        return await self.app(scope, receive, send)
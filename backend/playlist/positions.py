@@ -0,0 +1,105 @@
+"""
+Database-backed position management for playlist items.
+
+Wraps the fractional position algorithm in utils with local rebalancing:
+when the gap at an insertion point gets too small for another midpoint,
+only the surrounding window of items is renumbered, in one bulk update.
+"""
+
+from django.db.models import Max, Q
+
+from .models import Playlist, PlaylistTrack
+from .utils import calculate_position, gap_is_safe, plan_rebalance
+
+
+def get_neighbours(index, exclude_id=None, room=Playlist.DEFAULT_ID):
+    """
+    Get the items on either side of a specific index in the playlist.
+
+    Fetches at most two rows with OFFSET/LIMIT on the (playlist, position,
+    id) index instead of loading the whole playlist.
+
+    Args:
+        index: The index where to insert
+        exclude_id: ID of the item being moved, not counted in the indexing
+        room: ID of the playlist room
+
+    Returns:
+        tuple: (prev_item, next_item) - either can be None
+    """
+    items = PlaylistTrack.objects.filter(playlist_id=room).order_by('position', 'id')
+    if exclude_id is not None:
+        items = items.exclude(id=exclude_id)
+
+    if index <= 0:
+        return None, items.first()
+
+    rows = list(items[index - 1:index + 1])
+    prev_item = rows[0] if rows else None
+    next_item = rows[1] if len(rows) > 1 else None
+    if prev_item is None:
+        # Index past the end - append after the last item
+        prev_item = items.last()
+    return prev_item, next_item
+
+
+def last_position(room=Playlist.DEFAULT_ID):
+    """Get the position of the last item in a room, None if it is empty"""
+    return PlaylistTrack.objects.filter(playlist_id=room).aggregate(last=Max('position'))['last']
+
+
+def allocate_position(prev_item, next_item, exclude_id=None):
+    """
+    Get a position for inserting a track between two playlist items,
+    renumbering the local window first if the gap has run out.
+
+    Should be called inside a transaction together with the save of the
+    inserted item.
+
+    Args:
+        prev_item: PlaylistTrack before the insertion point (None at start)
+        next_item: PlaylistTrack after the insertion point (None at end)
+        exclude_id: ID of the item being moved, left out of the window
+
+    Returns:
+        tuple: (position, rebalanced) - the new position and the list of
+        PlaylistTrack items whose positions were renumbered (empty if none)
+    """
+    prev_position = prev_item.position if prev_item else None
+    next_position = next_item.position if next_item else None
+
+    if gap_is_safe(prev_position, next_position):
+        return calculate_position(prev_position, next_position), []
+
+    # The window stays within the room the neighbours belong to
+    room = (prev_item or next_item).playlist_id
+    items = PlaylistTrack.objects.filter(playlist_id=room)
+    if exclude_id is not None:
+        items = items.exclude(id=exclude_id)
+
+    def fetch_window(k):
+        # One extra row on each side gives the bound outside the window
+        before = list(
+            items.filter(
+                Q(position__lt=prev_item.position)
+                | Q(position=prev_item.position, id__lte=prev_item.id)
+            ).order_by('-position', '-id')[:k + 1]
+        )
+        after = list(
+            items.filter(
+                Q(position__gt=next_item.position)
+                | Q(position=next_item.position, id__gte=next_item.id)
+            ).order_by('position', 'id')[:k + 1]
+        )
+        lower = before[k].position if len(before) > k else None
+        upper = after[k].position if len(after) > k else None
+        return before[:k][::-1], after[:k], lower, upper
+
+    before, after, before_positions, position, after_positions = plan_rebalance(fetch_window)
+
+    rebalanced = before + after
+    for item, new_position in zip(rebalanced, before_positions + after_positions):
+        item.position = new_position
+    PlaylistTrack.objects.bulk_update(rebalanced, ['position'])
+
+    return position, rebalanced
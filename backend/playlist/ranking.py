@@ -0,0 +1,194 @@
+"""
+Vote ranking of playlist rooms in votes queue mode.
+
+A room in votes mode plays and lists its items by votes, highest first,
+ties broken by position. Re-sorting the whole room on every vote costs
+O(N log N); the ranking here is an indexable skip list, which moves an
+item and reports its new rank in O(log N), so a vote's event only has to
+carry the ranks of the items it moved.
+
+Each process caches the rankings of the rooms it mutates, tagged with the
+room version they reflect. A mutation takes its room's ranking out of the
+cache and puts it back at the new version once its transaction commits; a
+ranking that is missing or out of date (another process wrote in the
+meantime) is rebuilt from the database.
+"""
+
+import random
+import threading
+
+
+MAX_LEVELS = 24
+
+
+class _Node:
+    __slots__ = ('key', 'next', 'width')
+
+    def __init__(self, key, levels):
+        self.key = key
+        self.next = [None] * levels
+        # Number of items each link skips over, counting the one it lands on
+        self.width = [1] * levels
+
+
+class IndexableSkipList:
+    """
+    Sorted collection of unique keys with O(log N) insert, remove and rank.
+
+    Every link records how many items it skips, so the rank of a key is
+    the sum of the widths followed on the way down to it.
+    """
+
+    def __init__(self, keys=()):
+        self.size = 0
+        self.head = _Node(None, MAX_LEVELS)
+        self.head.width = [1] * MAX_LEVELS
+        for key in keys:
+            self.insert(key)
+
+    def __len__(self):
+        return self.size
+
+    def __iter__(self):
+        node = self.head.next[0]
+        while node is not None:
+            yield node.key
+            node = node.next[0]
+
+    def descend(self, key):
+        """
+        Last node before `key` on every level.
+
+        Returns:
+            tuple: (chain of nodes by level, steps taken on each level)
+        """
+        chain = [None] * MAX_LEVELS
+        steps = [0] * MAX_LEVELS
+        node = self.head
+        for level in reversed(range(MAX_LEVELS)):
+            while node.next[level] is not None and node.next[level].key < key:
+                steps[level] += node.width[level]
+                node = node.next[level]
+            chain[level] = node
+        return chain, steps
+
+    def insert(self, key):
+        """Add a key; returns its rank"""
+        chain, steps = self.descend(key)
+        levels = 1
+        while levels < MAX_LEVELS and random.random() < 0.5:
+            levels += 1
+
+        node = _Node(key, levels)
+        skipped = 0
+        for level in range(levels):
+            previous = chain[level]
+            node.next[level] = previous.next[level]
+            previous.next[level] = node
+            node.width[level] = previous.width[level] - skipped
+            previous.width[level] = skipped + 1
+            skipped += steps[level]
+        for level in range(levels, MAX_LEVELS):
+            chain[level].width[level] += 1
+        self.size += 1
+        return sum(steps)
+
+    def remove(self, key):
+        """Remove a key; returns the rank it had"""
+        chain, steps = self.descend(key)
+        node = chain[0].next[0]
+        if node is None or node.key != key:
+            raise KeyError(key)
+
+        for level in range(len(node.next)):
+            previous = chain[level]
+            previous.width[level] += node.width[level] - 1
+            previous.next[level] = node.next[level]
+        for level in range(len(node.next), MAX_LEVELS):
+            chain[level].width[level] -= 1
+        self.size -= 1
+        return sum(steps)
+
+    def rank(self, key):
+        """Number of keys before `key`"""
+        return sum(self.descend(key)[1])
+
+
+class RankedQueue:
+    """Playlist items ordered by votes (highest first), then position"""
+
+    def __init__(self, items=()):
+        self.keys = {}
+        self.order = IndexableSkipList()
+        for playlist_id, votes, position in items:
+            self.update(playlist_id, votes, position)
+
+    def __len__(self):
+        return len(self.keys)
+
+    def __contains__(self, playlist_id):
+        return playlist_id in self.keys
+
+    @staticmethod
+    def key(playlist_id, votes, position):
+        return -votes, position, playlist_id
+
+    def update(self, playlist_id, votes, position):
+        """Insert an item or move it to its new votes and position; returns its rank"""
+        key = self.key(playlist_id, votes, position)
+        previous = self.keys.get(playlist_id)
+        if previous == key:
+            return self.order.rank(key)
+        if previous is not None:
+            self.order.remove(previous)
+        self.keys[playlist_id] = key
+        return self.order.insert(key)
+
+    def remove(self, playlist_id):
+        """Drop an item; returns the rank it had, None if it was not ranked"""
+        key = self.keys.pop(playlist_id, None)
+        if key is None:
+            return None
+        return self.order.remove(key)
+
+    def rank(self, playlist_id):
+        return self.order.rank(self.keys[playlist_id])
+
+    def ids(self):
+        """Item IDs in queue order"""
+        return [key[2] for key in self.order]
+
+
+_rankings = {}
+_lock = threading.Lock()
+
+
+def checkout_ranking(room, version, load):
+    """
+    Take a room's ranking out of the cache for a mutation.
+
+    Args:
+        room: ID of the playlist room
+        version: Room version the mutation starts from
+        load: Callable returning (id, votes, position) rows, used to
+            rebuild the ranking if the cached one is missing or stale
+
+    Returns:
+        RankedQueue: Ranking reflecting `version`
+    """
+    with _lock:
+        cached = _rankings.pop(room, None)
+    if cached is not None and cached[0] == version:
+        return cached[1]
+    return RankedQueue(load())
+
+
+def checkin_ranking(room, version, ranking):
+    """Put a room's ranking back in the cache as reflecting `version`"""
+    with _lock:
+        _rankings[room] = (version, ranking)
+
+
+def clear_rankings():
+    with _lock:
+        _rankings.clear()
@@ -0,0 +1,173 @@
+"""
+Minimal Redis-protocol (RESP2 and RESP3) server for running the Redis channel layer
+without a Redis installation.
+
+Implements just the pub/sub commands that channels_redis'
+RedisPubSubChannelLayer uses (SUBSCRIBE, UNSUBSCRIBE, PUBLISH) plus the
+connection handshake (HELLO). It serves from a background thread, so tests and
+benchmarks can point several channel layer instances - or several worker
+processes - at it, exactly as they would at a real Redis. Nothing is
+persisted and there is no authentication; it is not meant for production.
+"""
+
+import asyncio
+import threading
+from collections import defaultdict
+
+
+class Client:
+    """State of one client connection"""
+
+    def __init__(self, writer):
+        self.writer = writer
+        self.protocol = 2
+        self.subscriptions = set()
+
+    def push(self, values):
+        """Encode a pub/sub message: an array in RESP2, a push in RESP3"""
+        frame = encode_array(values)
+        return b'>' + frame[1:] if self.protocol == 3 else frame
+
+
+class RespServer:
+    """Redis pub/sub stand-in listening on a local TCP port"""
+
+    def __init__(self, host='127.0.0.1', port=0):
+        self.host = host
+        self.port = port
+        self.subscribers = defaultdict(set)
+        self.loop = None
+        self.server = None
+        self.thread = None
+
+    @property
+    def url(self):
+        return f'redis://{self.host}:{self.port}/0'
+
+    def start(self):
+        """Start serving from a background thread; returns once listening"""
+        ready = threading.Event()
+
+        def serve():
+            self.loop = asyncio.new_event_loop()
+            self.server = self.loop.run_until_complete(
+                asyncio.start_server(self.handle, self.host, self.port)
+            )
+            self.port = self.server.sockets[0].getsockname()[1]
+            ready.set()
+            self.loop.run_forever()
+            self.server.close()
+            self.loop.run_until_complete(self.server.wait_closed())
+            self.loop.close()
+
+        self.thread = threading.Thread(target=serve, name='resp-server', daemon=True)
+        self.thread.start()
+        ready.wait()
+        return self
+
+    def stop(self):
+        """Stop serving and drop every connection"""
+        if self.loop is not None:
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self.thread.join()
+            self.loop = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def subscriber_count(self, channel):
+        """Number of connections subscribed to a pub/sub channel"""
+        return len(self.subscribers.get(channel, ()))
+
+    async def handle(self, reader, writer):
+        """Serve one client connection until it closes"""
+        client = Client(writer)
+        try:
+            while True:
+                command = await read_command(reader)
+                if command is None:
+                    break
+                name, args = command[0].upper(), command[1:]
+                if name == b'QUIT':
+                    writer.write(b'+OK\r\n')
+                    break
+                writer.write(self.execute(name, args, client))
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            for channel in client.subscriptions:
+                self.subscribers[channel].discard(client)
+            writer.close()
+
+    def execute(self, name, args, client):
+        """Run one command and return its encoded reply"""
+        if name == b'HELLO':
+            if args:
+                client.protocol = int(args[0])
+            info = [b'server', b'redis', b'version', b'7.0.0', b'proto', client.protocol]
+            if client.protocol == 3:
+                return b'%' + encode_array(info)[1:].replace(b'%d' % len(info), b'%d' % (len(info) // 2), 1)
+            return encode_array(info)
+        if name == b'PING':
+            return encode_bulk(args[0]) if args else b'+PONG\r\n'
+        if name == b'ECHO':
+            return encode_bulk(args[0])
+        if name in (b'SELECT', b'AUTH', b'CLIENT', b'FLUSHDB', b'FLUSHALL'):
+            return b'+OK\r\n'
+        if name == b'PUBLISH':
+            channel, payload = args
+            receivers = list(self.subscribers.get(channel, ()))
+            for receiver in receivers:
+                receiver.writer.write(receiver.push([b'message', channel, payload]))
+            return encode_int(len(receivers))
+        if name == b'SUBSCRIBE':
+            reply = b''
+            for channel in args:
+                client.subscriptions.add(channel)
+                self.subscribers[channel].add(client)
+                reply += client.push([b'subscribe', channel, len(client.subscriptions)])
+            return reply
+        if name == b'UNSUBSCRIBE':
+            reply = b''
+            for channel in args or sorted(client.subscriptions):
+                client.subscriptions.discard(channel)
+                self.subscribers[channel].discard(client)
+                reply += client.push([b'unsubscribe', channel, len(client.subscriptions)])
+            return reply or client.push([b'unsubscribe', None, 0])
+        return f'-ERR unknown command \'{name.decode(errors="replace")}\'\r\n'.encode()
+
+
+async def read_command(reader):
+    """Read one command, an array of bulk strings; None at end of stream"""
+    line = await reader.readline()
+    if not line:
+        return None
+    if not line.startswith(b'*'):
+        # Inline command, as typed into telnet
+        return line.split()
+    command = []
+    for _ in range(int(line[1:])):
+        length = int((await reader.readline())[1:])
+        command.append((await reader.readexactly(length + 2))[:-2])
+    return command
+
+
+def encode_bulk(value):
+    if value is None:
+        return b'$-1\r\n'
+    return b'$%d\r\n%s\r\n' % (len(value), value)
+
+
+def encode_int(value):
+    return b':%d\r\n' % value
+
+
+def encode_array(values):
+    parts = [b'*%d\r\n' % len(values)]
+    for value in values:
+        parts.append(encode_int(value) if isinstance(value, int) else encode_bulk(value))
+    return b''.join(parts)
@@ -1,7 +1,9 @@
 from django.urls import re_path
 from . import consumers
+from .utils import ROOM_ID_PATTERN
 
 websocket_urlpatterns = [
     re_path(r'ws/playlist/$', consumers.PlaylistConsumer.as_asgi()),
+    re_path(rf'ws/playlist/(?P<room>{ROOM_ID_PATTERN})/$', consumers.PlaylistConsumer.as_asgi()),
 ]
 
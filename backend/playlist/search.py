@@ -0,0 +1,162 @@
+"""
+Full-text search over the track library.
+
+On SQLite the library is indexed by an FTS5 table over title, artist and
+album. It uses the track table as external content, so only the index is
+stored, and triggers keep it in step with every insert, update and delete.
+Searches are ranked prefix matches: each word of the query must match the
+start of a word in the track, and title matches outrank artist matches,
+which outrank album matches.
+
+Other databases fall back to unranked substring matching.
+"""
+
+import re
+
+from django.db import connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+from .models import Track
+
+
+FTS_TABLE = 'playlist_track_fts'
+
+# bm25 column weights for title, artist and album
+RANK_WEIGHTS = (10.0, 5.0, 1.0)
+
+FTS_TRIGGERS = {
+    f'{FTS_TABLE}_insert': f"""
+        CREATE TRIGGER {{name}} AFTER INSERT ON playlist_track BEGIN
+            INSERT INTO {FTS_TABLE}(rowid, title, artist, album)
+            VALUES (new.rowid, new.title, new.artist, new.album);
+        END
+    """,
+    f'{FTS_TABLE}_delete': f"""
+        CREATE TRIGGER {{name}} AFTER DELETE ON playlist_track BEGIN
+            INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, artist, album)
+            VALUES ('delete', old.rowid, old.title, old.artist, old.album);
+        END
+    """,
+    f'{FTS_TABLE}_update': f"""
+        CREATE TRIGGER {{name}} AFTER UPDATE OF title, artist, album ON playlist_track BEGIN
+            INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, artist, album)
+            VALUES ('delete', old.rowid, old.title, old.artist, old.album);
+            INSERT INTO {FTS_TABLE}(rowid, title, artist, album)
+            VALUES (new.rowid, new.title, new.artist, new.album);
+        END
+    """,
+}
+
+
+def search_available(conn=connection):
+    """Whether the database has the FTS5 index"""
+    return conn.vendor == 'sqlite'
+
+
+def ensure_search_index(conn=connection):
+    """
+    Create the FTS5 index and its triggers if they are missing.
+
+    Migrations that rebuild the track table drop its triggers and renumber
+    its rowids, so this runs after every migrate and rebuilds the index
+    from the track table whenever it had to recreate anything.
+    """
+    if not search_available(conn):
+        return
+
+    with conn.cursor() as cursor:
+        cursor.execute(
+            "SELECT name FROM sqlite_master WHERE type IN ('table', 'trigger') AND name LIKE %s",
+            [f'{FTS_TABLE}%']
+        )
+        existing = {name for name, in cursor.fetchall()}
+        missing = [name for name in [FTS_TABLE, *FTS_TRIGGERS] if name not in existing]
+        if not missing:
+            return
+
+        if FTS_TABLE in missing:
+            cursor.execute(
+                f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5("
+                "title, artist, album, "
+                "content='playlist_track', content_rowid='rowid', "
+                "tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+            )
+        for name, sql in FTS_TRIGGERS.items():
+            if name in missing:
+                cursor.execute(sql.format(name=name))
+        cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+
+
+def drop_search_index(conn=connection):
+    """Remove the FTS5 index and its triggers"""
+    if not search_available(conn):
+        return
+    with conn.cursor() as cursor:
+        for name in FTS_TRIGGERS:
+            cursor.execute(f'DROP TRIGGER IF EXISTS {name}')
+        cursor.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+
+
+def match_expression(query):
+    """
+    FTS5 query matching every word of `query` as a prefix.
+
+    Returns:
+        str: The MATCH expression, or '' if the query has no words
+    """
+    words = re.findall(r'\w+', query)
+    return ' '.join(f'"{word}"*' for word in words)
+
+
+def matching_tracks(query):
+    """
+    Filter the library to tracks matching a search, unranked.
+
+    Args:
+        query: Search text
+
+    Returns:
+        QuerySet: Matching tracks, for further filtering and ordering
+    """
+    if not search_available():
+        return Track.objects.filter(
+            Q(title__icontains=query) | Q(artist__icontains=query) | Q(album__icontains=query)
+        )
+
+    expression = match_expression(query)
+    if not expression:
+        return Track.objects.none()
+    return Track.objects.filter(id__in=RawSQL(
+        f'SELECT id FROM playlist_track WHERE rowid IN '
+        f'(SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s)',
+        [expression]
+    ))
+
+
+def ranked_search(query, limit):
+    """
+    Best-matching tracks for a search, best first.
+
+    Args:
+        query: Search text
+        limit: Maximum number of tracks
+
+    Returns:
+        list: Track instances
+    """
+    if not search_available():
+        return list(matching_tracks(query).order_by('title', 'artist', 'id')[:limit])
+
+    expression = match_expression(query)
+    if not expression:
+        return []
+    weights = ', '.join(str(weight) for weight in RANK_WEIGHTS)
+    return list(Track.objects.raw(
+        f'SELECT track.* FROM {FTS_TABLE} '
+        f'JOIN playlist_track AS track ON track.rowid = {FTS_TABLE}.rowid '
+        f'WHERE {FTS_TABLE} MATCH %s '
+        f'ORDER BY bm25({FTS_TABLE}, {weights}), track.title, track.id '
+        f'LIMIT %s',
+        [expression, limit]
+    ))
@@ -1,15 +1,29 @@
+from django.utils import timezone
 from rest_framework import serializers
+from .budgets import timed_serialization
 from .models import Track, PlaylistTrack
 
 
-class TrackSerializer(serializers.ModelSerializer):
+class TimedSerializerMixin:
+    """Counts serialization time towards the endpoint budget being measured"""
+
+    def to_representation(self, instance):
+        return timed_serialization(super().to_representation, instance)
+
+
+class TimedListSerializer(TimedSerializerMixin, serializers.ListSerializer):
+    """Times many=True as one serialization rather than one per item"""
+
+
+class TrackSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """Serializer for Track model"""
     class Meta:
         model = Track
         fields = ['id', 'title', 'artist', 'album', 'duration_seconds', 'genre', 'cover_url']
+        list_serializer_class = TimedListSerializer
 
 
-class PlaylistTrackSerializer(serializers.ModelSerializer):
+class PlaylistTrackSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """Serializer for PlaylistTrack with nested track information"""
     track = TrackSerializer(read_only=True)
     track_id = serializers.CharField(write_only=True, required=False)
@@ -21,4 +35,59 @@ class PlaylistTrackSerializer(serializers.ModelSerializer):
             'added_by', 'added_at', 'is_playing', 'played_at'
         ]
         read_only_fields = ['id', 'added_at', 'played_at']
+        list_serializer_class = TimedListSerializer
+
+
+# Fields of TrackSerializer, read with values_list() by the fast path
+TRACK_FIELDS = TrackSerializer.Meta.fields
+
+# PlaylistTrack columns of PlaylistTrackSerializer's output, in its order
+# after the nested track
+PLAYLIST_TRACK_COLUMNS = ['id', 'position', 'votes', 'added_by', 'added_at', 'is_playing', 'played_at']
+
+
+def iso_datetime(value, tz):
+    """A datetime as DateTimeField outputs it: ISO 8601 in `tz`, UTC as Z"""
+    if value is None:
+        return None
+    value = value.astimezone(tz).isoformat()
+    return value[:-6] + 'Z' if value.endswith('+00:00') else value
+
+
+def track_rows(queryset):
+    """
+    TrackSerializer(queryset, many=True).data, built from values_list()
+    tuples without the serializer's per-field dispatch.
+    """
+    rows = queryset.values_list(*TRACK_FIELDS)
+    return timed_serialization(
+        lambda rows: [dict(zip(TRACK_FIELDS, row)) for row in rows], list(rows)
+    )
+
+
+def playlist_track_rows(queryset):
+    """
+    PlaylistTrackSerializer(queryset, many=True).data, built from the
+    values_list() tuples of one query joined with the track table. The
+    output is the same, key order included; SerializerFastPathTests keeps
+    the two in step.
+    """
+    rows = queryset.values_list(*PLAYLIST_TRACK_COLUMNS, *(f'track__{field}' for field in TRACK_FIELDS))
+    return timed_serialization(build_playlist_track_rows, list(rows))
+
 
+def build_playlist_track_rows(rows):
+    tz = timezone.get_current_timezone()
+    return [
+        {
+            'id': item_id,
+            'track': dict(zip(TRACK_FIELDS, track)),
+            'position': position,
+            'votes': votes,
+            'added_by': added_by,
+            'added_at': iso_datetime(added_at, tz),
+            'is_playing': is_playing,
+            'played_at': iso_datetime(played_at, tz),
+        }
+        for item_id, position, votes, added_by, added_at, is_playing, played_at, *track in rows
+    ]
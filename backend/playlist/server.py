@@ -0,0 +1,141 @@
+"""
+Daphne with WebSocket backpressure and optional permessage-deflate.
+
+    python -m playlist.server -b 0.0.0.0 -p 4000 [--deflate] playlist_project.asgi:application
+
+takes the same options as daphne; runworkers runs every worker with it.
+
+Daphne's websocket.send returns as soon as the frame is copied into
+Twisted's transport buffer, so an application cannot tell a client that
+stopped reading from one that keeps up, and the buffer of a stalled
+client grows with every event. This server registers a Backpressure
+producer on each WebSocket's transport and hands it to the application
+as the playlist.backpressure scope extension. Twisted pauses it while
+more than the transport's bufferSize (64 KiB) waits to be written, and
+the consumer holds further frames in its bounded outbox until it resumes
+(see PlaylistConsumer.write_outbox).
+
+With --deflate, the WebSocket factory also accepts the permessage-deflate
+offer browsers send, so every frame is compressed with a per-connection
+zlib context. Repeated keys across a socket's events then cost little
+even in the JSON encoding, at the price of the zlib state kept for each
+connection (about 300 KB at zlib's defaults).
+"""
+
+import asyncio
+from functools import partial
+
+from autobahn.websocket.compress import PerMessageDeflateOffer, PerMessageDeflateOfferAccept
+from daphne.cli import CommandLineInterface
+from daphne.server import Server
+from daphne.ws_protocol import WebSocketFactory
+from twisted.internet.interfaces import IPushProducer
+from zope.interface import implementer
+
+
+BACKPRESSURE_EXTENSION = 'playlist.backpressure'
+
+
+@implementer(IPushProducer)
+class Backpressure:
+    """Whether a WebSocket's transport can take more frames"""
+
+    def __init__(self):
+        self.writable = asyncio.Event()
+        self.writable.set()
+
+    def pauseProducing(self):
+        self.writable.clear()
+
+    def resumeProducing(self):
+        self.writable.set()
+
+    def stopProducing(self):
+        # The connection is gone; let a waiting writer run into the close
+        self.writable.set()
+
+    async def drained(self, timeout=None):
+        """
+        Wait until the transport has written out its buffer.
+
+        Raises:
+            TimeoutError: If it has not after `timeout` seconds
+        """
+        if not self.writable.is_set():
+            await asyncio.wait_for(self.writable.wait(), timeout)
+
+
+def accept_deflate(offers):
+    """Accept the client's first permessage-deflate offer, if it made one"""
+    for offer in offers:
+        if isinstance(offer, PerMessageDeflateOffer):
+            return PerMessageDeflateOfferAccept(offer)
+    return None
+
+
+class DeflateWebSocketFactory(WebSocketFactory):
+    """Daphne's WebSocket factory, negotiating permessage-deflate"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.setProtocolOptions(perMessageCompressionAccept=accept_deflate)
+
+
+class BackpressureServer(Server):
+    """
+    Daphne server that gives every WebSocket application a Backpressure,
+    and with deflate set negotiates permessage-deflate on its sockets.
+    """
+
+    def __init__(self, *args, deflate=False, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.deflate = deflate
+
+    @property
+    def ws_factory(self):
+        return self._ws_factory
+
+    @ws_factory.setter
+    def ws_factory(self, factory):
+        # Server.run builds Daphne's factory and configures it through this
+        # attribute afterwards, so a replacement gets the same options
+        if self.deflate and not isinstance(factory, DeflateWebSocketFactory):
+            factory = DeflateWebSocketFactory(self, server=self.server_name)
+        self._ws_factory = factory
+
+    def create_application(self, protocol, scope):
+        if scope['type'] == 'websocket':
+            backpressure = Backpressure()
+            transport = protocol.transport
+            # The HTTP channel the socket was upgraded from is still
+            # registered; it no longer produces anything
+            if getattr(transport, 'producer', None) is not None:
+                transport.unregisterProducer()
+            transport.registerProducer(backpressure, True)
+            scope.setdefault('extensions', {})[BACKPRESSURE_EXTENSION] = backpressure
+        return super().create_application(protocol, scope)
+
+
+class PlaylistCommandLineInterface(CommandLineInterface):
+    server_class = BackpressureServer
+
+    def __init__(self):
+        super().__init__()
+        self.parser.add_argument(
+            '--deflate',
+            action='store_true',
+            help='Compress WebSocket frames with permessage-deflate',
+        )
+
+    def run(self, args):
+        if self.parser.parse_args(args).deflate:
+            self.server_class = partial(BackpressureServer, deflate=True)
+        super().run(args)
+
+
+def main():
+    PlaylistCommandLineInterface.entrypoint()
+
+
+if __name__ == '__main__':
+    main()
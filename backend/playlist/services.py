@@ -0,0 +1,792 @@
+"""
+Playlist operations shared by the REST views (sync and async).
+
+Each mutation runs in a single write transaction, records its change
+events in the event log of the playlist room it touched and returns them
+for the caller to broadcast once the transaction has committed. Validation
+failures raise PlaylistError and missing items raise Http404.
+"""
+
+import math
+import uuid
+from datetime import timedelta
+from functools import partial
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Case, F, Value, When
+from django.http import Http404
+from django.shortcuts import get_object_or_404
+from django.utils import timezone
+
+from .database import write_transaction
+from .events import playlist_snapshot, record_event
+from .models import Playlist, Track, PlaylistTrack
+from .pagination import (
+    TRACK_ORDERING, TRACKS_MAX_PAGE_SIZE, TRACKS_PAGE_SIZE, InvalidCursor,
+    after_cursor, decode_cursor, encode_cursor,
+)
+from .playback import notify_playback
+from .ranking import RankedQueue, checkin_ranking, checkout_ranking
+from .positions import allocate_position, get_neighbours, last_position
+from .search import matching_tracks, ranked_search
+from .serializers import TrackSerializer, PlaylistTrackSerializer, playlist_track_rows, track_rows
+from .utils import calculate_position
+
+
+class PlaylistError(Exception):
+    """A playlist operation was rejected"""
+
+    def __init__(self, code, message, details=None, status=400):
+        super().__init__(message)
+        self.code = code
+        self.message = message
+        self.details = details
+        self.status = status
+
+    def as_data(self):
+        """Error body in the API's error format"""
+        error = {'code': self.code, 'message': self.message}
+        if self.details is not None:
+            error['details'] = self.details
+        return {'error': error}
+
+
+SEARCH_LIMIT = 20
+SEARCH_MAX_LIMIT = 100
+
+BATCH_MAX_OPERATIONS = 500
+
+
+def duplicate_track_error(track_id):
+    """Error for adding a track that is already in the playlist"""
+    return PlaylistError(
+        'DUPLICATE_TRACK',
+        'This track is already in the playlist',
+        details={'track_id': track_id}
+    )
+
+
+def parse_position(value):
+    """Validate a playlist position sent by a client"""
+    try:
+        position = float(value)
+    except (TypeError, ValueError):
+        position = math.nan
+    if not math.isfinite(position):
+        raise PlaylistError('INVALID_POSITION', 'position must be a number')
+    return position
+
+
+def track_query(params):
+    """
+    Validate the query parameters of GET /api/tracks.
+
+    Args:
+        params: Mapping of request query parameters
+
+    Returns:
+        dict: The recognised, non-empty parameters, with `limit` as an int
+    """
+    query = {
+        name: params[name]
+        for name in ('q', 'genre', 'artist', 'cursor', 'limit')
+        if params.get(name)
+    }
+
+    if 'cursor' in query:
+        try:
+            decode_cursor(query['cursor'])
+        except InvalidCursor:
+            raise PlaylistError('INVALID_CURSOR', 'cursor is not a valid page cursor')
+
+    if 'limit' in query:
+        try:
+            query['limit'] = int(query['limit'])
+        except ValueError:
+            query['limit'] = 0
+        if not 1 <= query['limit'] <= TRACKS_MAX_PAGE_SIZE:
+            raise PlaylistError(
+                'INVALID_LIMIT',
+                f'limit must be an integer between 1 and {TRACKS_MAX_PAGE_SIZE}'
+            )
+    return query
+
+
+def list_tracks(q=None, genre=None, artist=None, cursor=None, limit=TRACKS_PAGE_SIZE):
+    """
+    One page of the serialized track library.
+
+    Args:
+        q: Words that must each start a word of the title, artist or album
+        genre: Exact genre
+        artist: Exact artist
+        cursor: Cursor returned with the previous page
+        limit: Page size
+
+    Returns:
+        tuple: (track data, cursor of the next page or None on the last page)
+    """
+    tracks = (matching_tracks(q) if q else Track.objects.all()).order_by(*TRACK_ORDERING)
+    if genre:
+        tracks = tracks.filter(genre=genre)
+    if artist:
+        tracks = tracks.filter(artist=artist)
+    if cursor:
+        tracks = tracks.filter(after_cursor(decode_cursor(cursor)))
+
+    # One extra row tells whether another page follows
+    page = track_rows(tracks[:limit + 1])
+    next_cursor = encode_cursor(page[limit - 1]) if len(page) > limit else None
+    return page[:limit], next_cursor
+
+
+def search_tracks(q, limit=SEARCH_LIMIT):
+    """
+    Best-matching library tracks for a search, best first.
+
+    Returns:
+        list: Serialized tracks
+    """
+    if not q:
+        raise PlaylistError('MISSING_QUERY', 'q is required')
+    try:
+        limit = int(limit)
+    except (TypeError, ValueError):
+        limit = 0
+    if not 1 <= limit <= SEARCH_MAX_LIMIT:
+        raise PlaylistError(
+            'INVALID_LIMIT',
+            f'limit must be an integer between 1 and {SEARCH_MAX_LIMIT}'
+        )
+    return TrackSerializer(ranked_search(q, limit), many=True).data
+
+
+def room_ranking(room):
+    """
+    Take the vote ranking of a room in votes mode for the running mutation.
+
+    Call inside the mutation's write transaction before changing anything,
+    so the ranking reflects the room as it was, and hand it back with
+    release_ranking once the change is recorded.
+
+    Returns:
+        RankedQueue: The room's ranking, or None in position mode
+    """
+    state = Playlist.objects.filter(id=room).values_list('queue_mode', 'version').first()
+    if state is None or state[0] != Playlist.QUEUE_VOTES:
+        return None
+    return checkout_ranking(room, state[1], partial(ranking_rows, room))
+
+
+def ranking_rows(room):
+    """(id, votes, position) of every item in a room"""
+    return PlaylistTrack.objects.filter(playlist_id=room).values_list('id', 'votes', 'position')
+
+
+def release_ranking(room, queue):
+    """
+    Cache a room's ranking at its new version once the mutation commits.
+
+    A rolled back mutation never caches it, so the next one rebuilds it.
+    """
+    if queue is not None:
+        transaction.on_commit(partial(checkin_ranking, room, Playlist.current_version(room), queue))
+
+
+def get_queue_mode(room=Playlist.DEFAULT_ID):
+    """Queue mode of a room, position for rooms that do not exist yet"""
+    mode = Playlist.objects.filter(id=room).values_list('queue_mode', flat=True).first()
+    return {'mode': mode or Playlist.QUEUE_POSITION}
+
+
+def set_queue_mode(mode, room=Playlist.DEFAULT_ID):
+    """
+    Switch a room between position and votes order.
+
+    Switching to votes order broadcasts the full ranked order once; after
+    that, events carry only the ranks of the items they move.
+
+    Returns:
+        tuple: (mode data, events to broadcast)
+    """
+    if mode not in dict(Playlist.QUEUE_MODES):
+        raise PlaylistError(
+            'INVALID_MODE',
+            'mode must be one of: ' + ', '.join(dict(Playlist.QUEUE_MODES)),
+        )
+
+    with write_transaction():
+        playlist, _ = Playlist.objects.get_or_create(id=room)
+        if playlist.queue_mode == mode:
+            return {'mode': mode}, []
+        Playlist.objects.filter(id=room).update(queue_mode=mode)
+
+        message = {'type': 'playlist.mode', 'mode': mode}
+        queue = None
+        if mode == Playlist.QUEUE_VOTES:
+            queue = RankedQueue(ranking_rows(room))
+            message['order'] = queue.ids()
+        event = record_event(message, room)
+        release_ranking(room, queue)
+    return {'mode': mode}, [event]
+
+
+def get_playlist(room=Playlist.DEFAULT_ID):
+    """Serialized playlist of a room and the version it corresponds to"""
+    snapshot = playlist_snapshot(room)
+    return snapshot['items'], snapshot['version']
+
+
+def add_track(track_id, added_by='Anonymous', room=Playlist.DEFAULT_ID):
+    """
+    Append a library track to a room's playlist, creating the room if new.
+
+    Returns:
+        tuple: (item data, events to broadcast)
+    """
+    if not track_id:
+        raise PlaylistError('MISSING_TRACK_ID', 'track_id is required')
+
+    # Check if track exists
+    track = get_object_or_404(Track, id=track_id)
+
+    # Check if track is already in playlist
+    if PlaylistTrack.objects.filter(playlist_id=room, track_id=track_id).exists():
+        raise duplicate_track_error(track_id)
+
+    try:
+        with write_transaction():
+            Playlist.objects.get_or_create(id=room)
+            queue = room_ranking(room)
+
+            # Calculate position (append to end)
+            position = calculate_position(last_position(room), None)
+
+            # Create playlist item
+            playlist_item = PlaylistTrack.objects.create(
+                id=f'playlist-item-{uuid.uuid4().hex[:12]}',
+                playlist_id=room,
+                track=track,
+                position=position,
+                added_by=added_by,
+                votes=0,
+                is_playing=False
+            )
+            data = PlaylistTrackSerializer(playlist_item).data
+            message = {
+                'type': 'track.added',
+                'item': data
+            }
+            if queue is not None:
+                message['rank'] = queue.update(playlist_item.id, 0, position)
+            event = record_event(message, room)
+            release_ranking(room, queue)
+    except IntegrityError:
+        # Lost a race with a concurrent add of the same track
+        raise duplicate_track_error(track_id)
+
+    return data, [event]
+
+
+def remove_track(playlist_id, room=Playlist.DEFAULT_ID):
+    """
+    Remove an item from a room's playlist.
+
+    Returns:
+        list: Events to broadcast
+    """
+    with write_transaction():
+        playlist_item = get_object_or_404(PlaylistTrack, id=playlist_id, playlist_id=room)
+        queue = room_ranking(room)
+        playlist_item.delete()
+        if queue is not None:
+            queue.remove(playlist_id)
+        event = record_event({
+            'type': 'track.removed',
+            'id': playlist_id
+        }, room)
+        release_ranking(room, queue)
+    return [event]
+
+
+def update_track(playlist_id, changes, room=Playlist.DEFAULT_ID):
+    """
+    Update the position and/or playing status of a playlist item.
+
+    Both changes are written with one UPDATE of the item's changed
+    columns; starting an item adds one more to stop the item that was
+    playing before it.
+
+    Args:
+        playlist_id: ID of the playlist item
+        changes: Dict with optional 'position' and 'is_playing' keys
+        room: ID of the playlist room the item belongs to
+
+    Returns:
+        tuple: (item data, events to broadcast)
+    """
+    events = []
+    update_fields = []
+    with write_transaction():
+        playlist_item = get_object_or_404(
+            PlaylistTrack.objects.select_related('track'), id=playlist_id, playlist_id=room
+        )
+
+        # Update position if provided
+        if 'position' in changes:
+            queue = room_ranking(room)
+            playlist_item.position = parse_position(changes['position'])
+            update_fields.append('position')
+            moved = {
+                'id': playlist_item.id,
+                'position': playlist_item.position
+            }
+            if queue is not None:
+                moved['rank'] = queue.update(playlist_item.id, playlist_item.votes, playlist_item.position)
+            events.append(record_event({
+                'type': 'track.moved',
+                'item': moved
+            }, room))
+            release_ranking(room, queue)
+
+        # Update playing status if provided
+        if 'is_playing' in changes:
+            if changes['is_playing'] and not playlist_item.is_playing:
+                playlist_item.start_playing()
+                update_fields.extend(['is_playing', 'played_at'])
+            elif not changes['is_playing'] and playlist_item.is_playing:
+                playlist_item.is_playing = False
+                update_fields.append('is_playing')
+            events.append(record_event(playing_event(playlist_item), room))
+            transaction.on_commit(partial(notify_playback, room))
+
+        if update_fields:
+            playlist_item.save(update_fields=update_fields)
+        data = PlaylistTrackSerializer(playlist_item).data
+    return data, events
+
+
+def playing_event(playlist_item, now=None):
+    """
+    track.playing event for an item that started or stopped playing.
+
+    Carries when the item started and the server's clock, so clients can
+    place the playback position without trusting their own clocks.
+    """
+    return {
+        'type': 'track.playing',
+        'id': playlist_item.id,
+        'is_playing': playlist_item.is_playing,
+        'played_at': playlist_item.played_at.isoformat() if playlist_item.played_at else None,
+        'server_time': (now or timezone.now()).isoformat(),
+    }
+
+
+def now_playing(rooms=None):
+    """
+    Now-playing item of each room that has one.
+
+    Args:
+        rooms: Room IDs to look up, or None for every room
+
+    Returns:
+        dict: Room ID to its playing PlaylistTrack, with the track loaded
+    """
+    items = PlaylistTrack.objects.filter(is_playing=True).select_related('track', 'playlist')
+    if rooms is not None:
+        items = items.filter(playlist_id__in=rooms)
+    return {item.playlist_id: item for item in items}
+
+
+def next_to_play(current):
+    """
+    Item that follows `current` in its room, None at the end of the queue.
+
+    In position order that is the next item down the list. In a room in
+    votes mode, or everywhere with PLAYLIST_ADVANCE_BY = 'votes', it is the
+    highest voted item that has not been played yet.
+    """
+    items = PlaylistTrack.objects.filter(
+        playlist_id=current.playlist_id
+    ).exclude(id=current.id).select_related('track')
+    by_votes = (
+        settings.PLAYLIST_ADVANCE_BY == 'votes'
+        or current.playlist.queue_mode == Playlist.QUEUE_VOTES
+    )
+    if by_votes:
+        return items.filter(played_at__isnull=True).order_by('-votes', 'position', 'id').first()
+    return items.filter(position__gt=current.position).order_by('position', 'id').first()
+
+
+# An advance this late (nobody was serving the room) starts the next track
+# now rather than where the previous one ended
+MAX_CATCH_UP = timedelta(seconds=5)
+
+
+def advance_playback(room, playlist_id, now=None):
+    """
+    Move a room on once its now-playing item has finished.
+
+    Called by the playback scheduler when the item's end is due. Nothing
+    changes if the room is playing something else by then or the item has
+    not finished, e.g. because it was restarted; the caller gets the item
+    that is playing to reschedule instead. The next item starts where the
+    finished one ended, so the room keeps time however late the scheduler
+    wakes up. At the end of the queue playback stops.
+
+    Args:
+        room: ID of the playlist room
+        playlist_id: ID of the item the scheduler expects to have finished
+        now: Current time, by the scheduler's clock
+
+    Returns:
+        tuple: (now-playing item or None, events to broadcast)
+    """
+    now = now or timezone.now()
+    with write_transaction():
+        current = now_playing([room]).get(room)
+        if current is None or current.id != playlist_id or current.ends_at() > now:
+            return current, []
+
+        ended = current.ends_at()
+        started = ended if now - ended <= MAX_CATCH_UP else now
+        next_item = next_to_play(current)
+        if next_item is None:
+            current.is_playing = False
+            current.played_at = started
+            current.save(update_fields=['is_playing', 'played_at'])
+            changed = current
+        else:
+            next_item.start_playing(at=started)
+            next_item.save(update_fields=['is_playing', 'played_at'])
+            changed = next_item
+        event = record_event(playing_event(changed, now), room)
+    return next_item, [event]
+
+
+def vote_delta(direction):
+    """Vote count change for a vote direction"""
+    if direction == 'up':
+        return 1
+    if direction == 'down':
+        return -1
+    raise PlaylistError('INVALID_DIRECTION', 'direction must be "up" or "down"')
+
+
+def vote_track(playlist_id, direction, room=Playlist.DEFAULT_ID):
+    """
+    Apply an up or down vote to a playlist item.
+
+    The count is incremented in the database with an F expression, so
+    concurrent votes never overwrite each other.
+
+    Returns:
+        tuple: (item data, events to broadcast)
+    """
+    try:
+        delta = vote_delta(direction)
+    except PlaylistError:
+        # A missing item takes precedence over a bad direction
+        get_object_or_404(PlaylistTrack, id=playlist_id, playlist_id=room)
+        raise
+
+    with write_transaction():
+        queue = room_ranking(room)
+        items = PlaylistTrack.objects.filter(id=playlist_id, playlist_id=room)
+        if not items.update(votes=F('votes') + delta):
+            raise Http404('No PlaylistTrack matches the given query.')
+        playlist_item = items.select_related('track').get()
+
+        voted = {
+            'id': playlist_item.id,
+            'votes': playlist_item.votes
+        }
+        if queue is not None:
+            voted['rank'] = queue.update(playlist_item.id, playlist_item.votes, playlist_item.position)
+        event = record_event({
+            'type': 'track.voted',
+            'item': voted
+        }, room)
+        release_ranking(room, queue)
+        data = PlaylistTrackSerializer(playlist_item).data
+    return data, [event]
+
+
+def apply_votes(deltas, room=Playlist.DEFAULT_ID):
+    """
+    Apply net vote changes for several items of a room in one UPDATE.
+
+    Used by the vote coalescing buffer to fold a window of votes into a
+    single write and a single track.voted event.
+
+    Args:
+        deltas: Dict mapping playlist item ID to net vote change
+        room: ID of the playlist room the items belong to
+
+    Returns:
+        tuple: (dict of item data by ID for the items that exist in the
+        room, events to broadcast)
+    """
+    with write_transaction():
+        queue = room_ranking(room)
+        items = PlaylistTrack.objects.filter(id__in=deltas, playlist_id=room)
+        items.update(
+            votes=F('votes') + Case(
+                *[When(id=playlist_id, then=Value(delta)) for playlist_id, delta in deltas.items()],
+                default=Value(0)
+            )
+        )
+        data = {item['id']: item for item in playlist_track_rows(items)}
+        if not data:
+            return data, []
+
+        voted = [{'id': item['id'], 'votes': item['votes']} for item in data.values()]
+        if queue is not None:
+            # Every voted item carries its final rank, so clients can drop
+            # them all and reinsert them in rank order
+            for item in data.values():
+                queue.update(item['id'], item['votes'], item['position'])
+            for entry in voted:
+                entry['rank'] = queue.rank(entry['id'])
+        event = record_event({
+            'type': 'track.voted',
+            'items': voted
+        }, room)
+        release_ranking(room, queue)
+    return data, [event]
+
+
+def reorder_track(playlist_id, target_index, room=Playlist.DEFAULT_ID):
+    """
+    Move a playlist item to a new index.
+
+    Only the moved item's new position is broadcast, plus one batched
+    playlist.rebalanced event if neighbouring items had to be renumbered.
+
+    Returns:
+        tuple: (item data, events to broadcast)
+    """
+    events = []
+    with write_transaction():
+        playlist_item = get_object_or_404(
+            PlaylistTrack.objects.select_related('track'), id=playlist_id, playlist_id=room
+        )
+
+        if target_index is None:
+            raise PlaylistError('MISSING_TARGET_INDEX', 'target_index is required')
+        try:
+            target_index = int(target_index)
+        except (TypeError, ValueError):
+            raise PlaylistError('INVALID_TARGET_INDEX', 'target_index must be an integer')
+
+        queue = room_ranking(room)
+
+        # Calculate new position, renumbering nearby items if the gap ran out
+        prev_item, next_item = get_neighbours(target_index, exclude_id=playlist_id, room=room)
+        new_position, rebalanced = allocate_position(prev_item, next_item, exclude_id=playlist_id)
+
+        playlist_item.position = new_position
+        playlist_item.save(update_fields=['position'])
+
+        moved = {
+            'id': playlist_item.id,
+            'position': playlist_item.position
+        }
+        if queue is not None:
+            # Renumbering keeps the order of positions, so no rank changes
+            for item in rebalanced:
+                queue.update(item.id, item.votes, item.position)
+            moved['rank'] = queue.update(playlist_item.id, playlist_item.votes, playlist_item.position)
+
+        if rebalanced:
+            # One batched event for every renumbered item
+            events.append(record_event({
+                'type': 'playlist.rebalanced',
+                'items': [{'id': item.id, 'position': item.position} for item in rebalanced]
+            }, room))
+        events.append(record_event({
+            'type': 'track.moved',
+            'item': moved
+        }, room))
+        release_ranking(room, queue)
+        data = PlaylistTrackSerializer(playlist_item).data
+    return data, events
+
+
+def batch_error(index, error):
+    """Error of the batch operation at `index`, naming it in the details"""
+    details = dict(error.details or {}, index=index)
+    return PlaylistError(error.code, error.message, details=details, status=error.status)
+
+
+def parse_batch(operations):
+    """
+    Validate the operations of a batch before touching the database.
+
+    Returns:
+        list: (op, target ID, argument) per operation, where the target is
+        the track ID for 'add' and the item ID otherwise, and the argument
+        is added_by, the vote delta or the new position
+    """
+    if not isinstance(operations, list) or not 1 <= len(operations) <= BATCH_MAX_OPERATIONS:
+        raise PlaylistError(
+            'INVALID_OPERATIONS',
+            f'operations must be a list of 1 to {BATCH_MAX_OPERATIONS} operations'
+        )
+
+    parsed = []
+    for index, operation in enumerate(operations):
+        try:
+            if not isinstance(operation, dict):
+                raise PlaylistError('INVALID_OPERATION', 'operation must be an object')
+            op = operation.get('op')
+            if op == 'add':
+                if not operation.get('track_id'):
+                    raise PlaylistError('MISSING_TRACK_ID', 'track_id is required')
+                parsed.append((op, operation['track_id'], operation.get('added_by', 'Anonymous')))
+                continue
+            if op not in ('remove', 'vote', 'move'):
+                raise PlaylistError('INVALID_OPERATION', 'op must be one of: add, remove, vote, move')
+            if not operation.get('id'):
+                raise PlaylistError('MISSING_ID', 'id is required')
+
+            argument = None
+            if op == 'vote':
+                argument = vote_delta(operation.get('direction', 'up'))
+            elif op == 'move':
+                argument = parse_position(operation.get('position'))
+            parsed.append((op, operation['id'], argument))
+        except PlaylistError as error:
+            raise batch_error(index, error)
+    return parsed
+
+
+def apply_batch(operations, room=Playlist.DEFAULT_ID):
+    """
+    Apply an ordered list of playlist operations atomically.
+
+    The operations are replayed in order against the items they touch,
+    loaded with one query, and the net result is written with bulk SQL:
+    a DELETE, an UPDATE and an INSERT however many operations. If any
+    operation is rejected nothing is written, and the error names its
+    index. The whole batch is one playlist.batch event and one version.
+
+    Args:
+        operations: List of dicts with an 'op' of 'add' (track_id, optional
+            added_by), 'remove' (id), 'vote' (id, direction) or 'move' (id,
+            position)
+        room: ID of the playlist room
+
+    Returns:
+        tuple: (dict with the per-operation 'results', events to broadcast)
+    """
+    parsed = parse_batch(operations)
+    track_ids = {target for op, target, _ in parsed if op == 'add'}
+    item_ids = {target for op, target, _ in parsed if op != 'add'}
+
+    try:
+        with write_transaction():
+            if track_ids:
+                Playlist.objects.get_or_create(id=room)
+            queue = room_ranking(room)
+
+            items = PlaylistTrack.objects.select_related('track').filter(playlist_id=room).in_bulk(item_ids)
+            tracks = Track.objects.in_bulk(track_ids)
+            in_room = set(
+                PlaylistTrack.objects.filter(playlist_id=room, track_id__in=track_ids)
+                .values_list('track_id', flat=True)
+            )
+            position = last_position(room)
+
+            created, removed, changed = {}, set(), {}
+            results = []
+            for index, (op, target, argument) in enumerate(parsed):
+                if op == 'add':
+                    if target not in tracks:
+                        raise batch_error(index, PlaylistError(
+                            'TRACK_NOT_FOUND', 'No track with this id',
+                            details={'track_id': target}, status=404
+                        ))
+                    if target in in_room:
+                        raise batch_error(index, duplicate_track_error(target))
+                    position = calculate_position(position, None)
+                    item = PlaylistTrack(
+                        id=f'playlist-item-{uuid.uuid4().hex[:12]}',
+                        playlist_id=room,
+                        track=tracks[target],
+                        position=position,
+                        added_by=argument,
+                        votes=0,
+                        is_playing=False
+                    )
+                    items[item.id] = created[item.id] = item
+                    in_room.add(target)
+                    # Serialized once written, see below
+                    result = {'op': op, 'item': item}
+                    if queue is not None:
+                        result['rank'] = queue.update(item.id, 0, position)
+                    results.append(result)
+                    continue
+
+                item = items.get(target)
+                if item is None:
+                    raise batch_error(index, PlaylistError(
+                        'ITEM_NOT_FOUND', 'No playlist item with this id',
+                        details={'id': target}, status=404
+                    ))
+
+                if op == 'remove':
+                    del items[target]
+                    in_room.discard(item.track_id)
+                    if created.pop(target, None) is None:
+                        removed.add(target)
+                        changed.pop(target, None)
+                    if queue is not None:
+                        queue.remove(target)
+                    results.append({'op': op, 'id': target})
+                    continue
+
+                if op == 'vote':
+                    item.votes += argument
+                    result = {'op': op, 'id': target, 'votes': item.votes}
+                    field = 'votes'
+                else:
+                    item.position = argument
+                    result = {'op': op, 'id': target, 'position': item.position}
+                    field = 'position'
+                if target not in created:
+                    changed.setdefault(target, set()).add(field)
+                if queue is not None:
+                    result['rank'] = queue.update(target, item.votes, item.position)
+                results.append(result)
+
+            # Deletes first, so a track removed and re-added in the same
+            # batch does not trip the unique constraint. The write lock is
+            # held since before the items were read, so writing the
+            # replayed vote counts loses no concurrent votes.
+            if removed:
+                PlaylistTrack.objects.filter(id__in=removed).delete()
+            if changed:
+                PlaylistTrack.objects.bulk_update(
+                    [items[playlist_id] for playlist_id in changed],
+                    sorted(set().union(*changed.values()))
+                )
+            if created:
+                PlaylistTrack.objects.bulk_create(created.values())
+
+            for result in results:
+                if 'item' in result:
+                    # As the batch left it (an item removed again is unsaved)
+                    result['item'] = PlaylistTrackSerializer(result['item']).data
+            message = {
+                'type': 'playlist.batch',
+                'operations': results
+            }
+            event = record_event(message, room)
+            release_ranking(room, queue)
+    except IntegrityError:
+        # Lost a race with a concurrent add of one of the tracks
+        raise PlaylistError('DUPLICATE_TRACK', 'A track is already in the playlist')
+
+    return {'results': results, 'version': message['version']}, [event]
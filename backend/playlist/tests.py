@@ -1,9 +1,56 @@
-from django.test import TestCase
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+import msgpack
+from asgiref.sync import sync_to_async
+from channels.layers import get_channel_layer
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.core.cache import cache
+from django.conf import settings
+from django.contrib.admin import AdminSite
+from django.core.management import call_command
+from django.http import Http404
+from django.db import IntegrityError, connection, transaction
+from django.test import AsyncClient, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
 from rest_framework.test import APIClient
 from rest_framework import status
-from .models import Track, PlaylistTrack
-from .utils import calculate_position
+from . import caching, database
+from .admin import TrackAdmin
+from .benchmarks import BENCHMARKS
+from .benchmarks.baseline import BaselineMismatch, compare_rows
+from .budgets import BUDGET_ITEMS, BUDGETS, Budget, measure, measure_endpoints, over_budget, query_plans
+from .caching import cache_stats
+from .consumers import EVICTED_CLOSE_CODE, PlaylistConsumer, build_group_message
+from .database import sqlite_settings, write_transaction
+from .events import events_since, publish_event
+from .metrics import Histogram, reset_metrics
+from .playback import PlaybackScheduler, TimerWheel
+from .services import advance_playback, apply_votes
+from .positions import get_neighbours
+from .ranking import RankedQueue, checkout_ranking, clear_rankings
+from .respserver import RespServer
+from .wire import COMPACT_KEYS, compact, expand
+from .serializers import PlaylistTrackSerializer, TrackSerializer, playlist_track_rows, track_rows
+from .routing import websocket_urlpatterns
+from .models import Library, Playlist, PlaylistEvent, Track, PlaylistTrack
+from .outbox import outbox_stats
+from .utils import REBALANCE_HEADROOM, calculate_position, gap_is_safe, plan_rebalance, spread_positions
+from .votes import VoteBuffer
 
 
 class PositionAlgorithmTests(TestCase):
@@ -43,11 +90,54 @@ class PositionAlgorithmTests(TestCase):
         result3 = calculate_position(1.25, 1.5)
         self.assertEqual(result3, 1.375)
 
+    def test_gap_is_safe(self):
+        """Test gaps are unsafe once they shrink below the relative epsilon"""
+        self.assertTrue(gap_is_safe(None, 1.0))
+        self.assertTrue(gap_is_safe(1.0, 1.5))
+        self.assertTrue(gap_is_safe(1.0, 1.0 + 1e-9))
+        self.assertFalse(gap_is_safe(1.0, 1.0 + 1e-14))
+        self.assertFalse(gap_is_safe(1e6, 1e6 + 1e-7))
+
+    def test_spread_positions(self):
+        """Test positions are spread evenly inside the window bounds"""
+        self.assertEqual(spread_positions(3), [1.0, 2.0, 3.0])
+        self.assertEqual(spread_positions(3, lower=1.0, upper=5.0), [2.0, 3.0, 4.0])
+        self.assertEqual(spread_positions(2, lower=4.0), [5.0, 6.0])
+        self.assertEqual(spread_positions(2, upper=1.0), [-1.0, 0.0])
+
+    def test_plan_rebalance_grows_window(self):
+        """Test the window doubles until the renumbered gaps are safe"""
+        positions = [1.0, 2.0, 2.0 + 1e-12, 2.0 + 2e-12, 2.0 + 3e-12, 2.0 + 4e-12, 3.0]
+        index = 3
+
+        def fetch_window(k):
+            lo, hi = max(index - k, 0), min(index + k, len(positions))
+            lower = positions[lo - 1] if lo > 0 else None
+            upper = positions[hi] if hi < len(positions) else None
+            return list(range(lo, index)), list(range(index, hi)), lower, upper
+
+        before, after, before_positions, position, after_positions = plan_rebalance(fetch_window)
+        new_positions = list(positions)
+        for i, new_position in zip(before + after, before_positions + after_positions):
+            new_positions[i] = new_position
+        new_positions.insert(index, position)
+
+        self.assertEqual((before, after), ([1, 2], [3, 4]))
+        self.assertEqual(new_positions, sorted(set(new_positions)))
+        self.assertTrue(all(gap_is_safe(a, b) for a, b in zip(new_positions, new_positions[1:])))
+
+        # The renumbered gaps take REBALANCE_HEADROOM halvings before the next
+        lower, upper = new_positions[index], new_positions[index + 1]
+        for _ in range(REBALANCE_HEADROOM):
+            self.assertTrue(gap_is_safe(lower, upper))
+            upper = calculate_position(lower, upper)
+
 
 class TrackAPITests(TestCase):
     """Tests for Track API endpoints"""
     
     def setUp(self):
+        cache.clear()
         self.client = APIClient()
         Track.objects.create(
             id='track-1',
@@ -66,11 +156,89 @@ class TrackAPITests(TestCase):
         self.assertEqual(len(response.data), 1)
         self.assertEqual(response.data[0]['title'], 'Test Track')
 
+    def test_tracks_paginate_by_cursor(self):
+        """Test following X-Next-Cursor walks the library once, in order"""
+        for index in range(5):
+            Track.objects.create(
+                id=f'page-track-{index}',
+                title='Same Title' if index < 3 else f'Title {index}',
+                artist='Artist',
+                duration_seconds=200
+            )
+        expected = list(Track.objects.values_list('id', flat=True))
+
+        seen = []
+        params = {'limit': 2}
+        while True:
+            response = self.client.get(reverse('tracks-list'), params)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertLessEqual(len(response.data), 2)
+            seen += [track['id'] for track in response.data]
+            if 'X-Next-Cursor' not in response:
+                break
+            params['cursor'] = response['X-Next-Cursor']
+        self.assertEqual(seen, expected)
+
+    def test_tracks_filters(self):
+        """Test q, genre and artist filtering of GET /api/tracks"""
+        Track.objects.create(id='track-2', title='Other', artist='Someone', album='Test Sessions',
+                             duration_seconds=200, genre='Jazz')
+        url = reverse('tracks-list')
+
+        def ids(params):
+            return [track['id'] for track in self.client.get(url, params).data]
+
+        self.assertEqual(ids({'q': 'sessions'}), ['track-2'])
+        self.assertEqual(ids({'q': 'test'}), ['track-2', 'track-1'])
+        self.assertEqual(ids({'genre': 'Rock'}), ['track-1'])
+        self.assertEqual(ids({'artist': 'Someone', 'genre': 'Rock'}), [])
+
+    def test_search_ranks_prefix_matches(self):
+        """Test GET /api/tracks/search ranks title over artist over album"""
+        Track.objects.create(id='track-2', title='Other', artist='Someone', album='Testing Ground',
+                             duration_seconds=200)
+        Track.objects.create(id='track-3', title='Another', artist='Tester', duration_seconds=200)
+        url = reverse('tracks-search')
+
+        response = self.client.get(url, {'q': 'tes'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([track['id'] for track in response.data], ['track-1', 'track-3', 'track-2'])
+
+        # Every word must match
+        response = self.client.get(url, {'q': 'test art'})
+        self.assertEqual([track['id'] for track in response.data], ['track-1'])
+
+        response = self.client.get(url, {'q': '  '})
+        self.assertEqual(response.data['error']['code'], 'MISSING_QUERY')
+
+    def test_search_index_follows_edits(self):
+        """Test the search index is kept in sync on update and delete"""
+        url = reverse('tracks-search')
+        track = Track.objects.get(id='track-1')
+        track.title = 'Renamed'
+        track.save()
+        self.assertEqual(len(self.client.get(url, {'q': 'test track'}).data), 0)
+        self.assertEqual(len(self.client.get(url, {'q': 'renamed'}).data), 1)
+
+        track.delete()
+        self.assertEqual(len(self.client.get(url, {'q': 'renamed'}).data), 0)
+
+    def test_tracks_invalid_page_params(self):
+        """Test malformed cursors and limits are rejected"""
+        url = reverse('tracks-list')
+        response = self.client.get(url, {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['error']['code'], 'INVALID_CURSOR')
+
+        response = self.client.get(url, {'limit': 100000})
+        self.assertEqual(response.data['error']['code'], 'INVALID_LIMIT')
+
 
 class PlaylistAPITests(TestCase):
     """Tests for Playlist API endpoints"""
     
     def setUp(self):
+        cache.clear()
         self.client = APIClient()
         self.track = Track.objects.create(
             id='track-1',
@@ -141,6 +309,52 @@ class PlaylistAPITests(TestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(response.data['votes'], 5)
     
+    def test_apply_votes(self):
+        """Test net vote deltas for several items are applied together"""
+        track2 = Track.objects.create(id='track-2', title='Track 2', artist='Artist 2', duration_seconds=180)
+        PlaylistTrack.objects.create(id='playlist-item-1', track=self.track, position=1.0, votes=5)
+        PlaylistTrack.objects.create(id='playlist-item-2', track=track2, position=2.0)
+
+        items, events = apply_votes({'playlist-item-1': -2, 'playlist-item-2': 3, 'missing': 1})
+
+        self.assertEqual(items['playlist-item-1']['votes'], 3)
+        self.assertEqual(items['playlist-item-2']['votes'], 3)
+        self.assertNotIn('missing', items)
+        self.assertEqual(len(events), 1)
+        group, message = events[0]
+        self.assertEqual(group, 'playlist')
+        frame = json.loads(message['text'])
+        self.assertEqual(frame['type'], 'track.voted')
+        self.assertEqual(len(frame['items']), 2)
+
+    def test_rooms_are_isolated(self):
+        """Test each room has its own items, duplicates check and version"""
+        room_url = reverse('room:playlist-list', kwargs={'room': 'party'})
+        response = self.client.post(room_url, {'track_id': 'track-1'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        room_item = response.data['id']
+
+        # The same track can still be added to the default room
+        response = self.client.post(reverse('playlist-list'), {'track_id': 'track-1'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        response = self.client.post(room_url, {'track_id': 'track-1'}, format='json')
+        self.assertEqual(response.data['error']['code'], 'DUPLICATE_TRACK')
+
+        response = self.client.get(room_url)
+        self.assertEqual([item['id'] for item in response.data], [room_item])
+        self.assertEqual(response['X-Playlist-Version'], '1')
+
+        # Items are only reachable through their own room
+        response = self.client.post(reverse('playlist-vote', args=[room_item]), {'direction': 'up'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        response = self.client.post(
+            reverse('room:playlist-vote', kwargs={'room': 'party', 'playlist_id': room_item}),
+            {'direction': 'up'}, format='json'
+        )
+        self.assertEqual(response.data['votes'], 1)
+        self.assertEqual(Playlist.current_version('party'), 2)
+        self.assertEqual(Playlist.current_version(), 1)
+
     def test_delete_track_from_playlist(self):
         """Test DELETE /api/playlist/{id}"""
         playlist_item = PlaylistTrack.objects.create(
@@ -194,6 +408,1391 @@ class PlaylistAPITests(TestCase):
         
         # Refresh first item - should no longer be playing
         playlist_item.refresh_from_db()
+        playlist_item2.refresh_from_db()
         self.assertFalse(playlist_item.is_playing)
         self.assertTrue(playlist_item2.is_playing)
 
+    def test_update_writes_item_once(self):
+        """Test a PATCH of position and playing status writes the item in one UPDATE"""
+        PlaylistTrack.objects.create(id='playlist-item-1', track=self.track, position=1.0, is_playing=True)
+        track2 = Track.objects.create(id='track-2', title='Track 2', artist='Artist 2', duration_seconds=180)
+        PlaylistTrack.objects.create(id='playlist-item-2', track=track2, position=2.0)
+
+        url = reverse('playlist-update', args=['playlist-item-2'])
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.patch(url, {'position': 0.5, 'is_playing': True}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        item_queries = [query['sql'] for query in queries if '"playlist_playlisttrack"' in query['sql']]
+        updates = [sql for sql in item_queries if sql.startswith('UPDATE')]
+        # One lookup joined with its track, one UPDATE stopping the previous
+        # item and one writing only the changed columns of this one
+        self.assertEqual(len(item_queries), 3)
+        self.assertEqual(len(updates), 2)
+        self.assertNotIn('"position"', updates[0])
+        self.assertIn('"position"', updates[1])
+        self.assertNotIn('"votes"', updates[1])
+
+        self.assertEqual(
+            list(PlaylistTrack.objects.filter(is_playing=True).values_list('id', flat=True)),
+            ['playlist-item-2']
+        )
+
+    def test_one_playing_item_per_room(self):
+        """Test the database rejects a second playing item in a room"""
+        PlaylistTrack.objects.create(id='playlist-item-1', track=self.track, position=1.0, is_playing=True)
+        track2 = Track.objects.create(id='track-2', title='Track 2', artist='Artist 2', duration_seconds=180)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            PlaylistTrack.objects.create(id='playlist-item-2', track=track2, position=2.0, is_playing=True)
+
+    def test_mutations_bump_playlist_version(self):
+        """Test every mutation increments the playlist version"""
+        self.assertEqual(Playlist.current_version(), 0)
+
+        response = self.client.post(reverse('playlist-list'), {'track_id': 'track-1'}, format='json')
+        playlist_id = response.data['id']
+        self.client.post(reverse('playlist-vote', args=[playlist_id]), {'direction': 'up'}, format='json')
+        self.assertEqual(Playlist.current_version(), 2)
+
+        response = self.client.get(reverse('playlist-list'))
+        self.assertEqual(response['X-Playlist-Version'], '2')
+
+
+class PlaylistReorderTests(TestCase):
+    """Tests for POST /api/playlist/{id}/reorder"""
+
+    def setUp(self):
+        self.client = APIClient()
+        for index in range(3):
+            track = Track.objects.create(
+                id=f'track-{index}',
+                title=f'Track {index}',
+                artist='Artist',
+                duration_seconds=200
+            )
+            PlaylistTrack.objects.create(
+                id=f'playlist-item-{index}',
+                track=track,
+                position=float(index + 1)
+            )
+
+    def test_reorder_returns_only_moved_item(self):
+        """Test reorder responds with the moved item, not the whole playlist"""
+        url = reverse('playlist-reorder', args=['playlist-item-2'])
+        response = self.client.post(url, {'target_index': 0}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['id'], 'playlist-item-2')
+        self.assertEqual(response.data['position'], 0.0)
+        ordered = list(PlaylistTrack.objects.values_list('id', flat=True))
+        self.assertEqual(ordered, ['playlist-item-2', 'playlist-item-0', 'playlist-item-1'])
+
+    def test_repeated_reorder_to_same_spot_rebalances(self):
+        """Test repeated inserts at one spot renumber locally and keep order"""
+        for index in range(3, 6):
+            track = Track.objects.create(id=f'track-{index}', title='T', artist='A', duration_seconds=200)
+            PlaylistTrack.objects.create(id=f'playlist-item-{index}', track=track, position=float(index + 1))
+
+        expected = None
+        for move in range(80):
+            moved = f'playlist-item-{4 + move % 2}'
+            url = reverse('playlist-reorder', args=[moved])
+            self.client.post(url, {'target_index': 1}, format='json')
+            expected = ['playlist-item-0', moved]
+
+        positions = list(PlaylistTrack.objects.values_list('id', 'position'))
+        ids = [item_id for item_id, _ in positions]
+        values = [position for _, position in positions]
+        self.assertEqual(ids[:2], expected)
+        self.assertEqual(values, sorted(set(values)))
+        self.assertTrue(PlaylistEvent.objects.filter(frame__contains='playlist.rebalanced').exists())
+        # The far end of the playlist was never renumbered
+        self.assertEqual(PlaylistTrack.objects.get(id='playlist-item-3').position, 4.0)
+
+    def test_get_neighbours(self):
+        """Test neighbour lookup at the start, middle and past the end"""
+        def ids(pair):
+            return tuple(item.id if item else None for item in pair)
+
+        self.assertEqual(ids(get_neighbours(0)), (None, 'playlist-item-0'))
+        self.assertEqual(ids(get_neighbours(1)), ('playlist-item-0', 'playlist-item-1'))
+        self.assertEqual(ids(get_neighbours(3)), ('playlist-item-2', None))
+        self.assertEqual(ids(get_neighbours(10)), ('playlist-item-2', None))
+        self.assertEqual(
+            ids(get_neighbours(1, exclude_id='playlist-item-0')),
+            ('playlist-item-1', 'playlist-item-2')
+        )
+
+    def test_reorder_query_count_independent_of_size(self):
+        """Test reorder cost does not grow with the playlist length"""
+        url = reverse('playlist-reorder', args=['playlist-item-2'])
+        Playlist.objects.get_or_create(id=Playlist.DEFAULT_ID)
+
+        with CaptureQueriesContext(connection) as small:
+            self.client.post(url, {'target_index': 1}, format='json')
+
+        for index in range(3, 53):
+            track = Track.objects.create(id=f'track-{index}', title='T', artist='A', duration_seconds=200)
+            PlaylistTrack.objects.create(id=f'playlist-item-{index}', track=track, position=float(index + 1))
+
+        with CaptureQueriesContext(connection) as large:
+            self.client.post(url, {'target_index': 1}, format='json')
+
+        self.assertEqual(len(small), len(large))
+
+    def test_reorder_missing_target_index(self):
+        """Test reorder without target_index is rejected"""
+        url = reverse('playlist-reorder', args=['playlist-item-2'])
+        response = self.client.post(url, {}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class ResponseCacheTests(TestCase):
+    """Tests for the cached, ETag-validated GET endpoints"""
+
+    def setUp(self):
+        cache.clear()
+        for counters in caching.stats.values():
+            counters.counts.clear()
+        self.client = APIClient()
+        self.track = Track.objects.create(
+            id='track-1',
+            title='Test Track',
+            artist='Test Artist',
+            duration_seconds=200
+        )
+
+    def test_playlist_not_modified_until_mutation(self):
+        """Test If-None-Match gets a 304 until the playlist version moves"""
+        url = reverse('playlist-list')
+        response = self.client.get(url)
+        etag = response['ETag']
+        self.assertEqual(etag, '"playlist-0"')
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response.content, b'')
+
+        self.client.post(url, {'track_id': 'track-1'}, format='json')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data), 1)
+        self.assertEqual(response['ETag'], '"playlist-1"')
+
+        self.assertEqual(cache_stats()['playlist'], {
+            'hits': 0, 'misses': 2, 'not_modified': 1, 'hit_rate': 1 / 3
+        })
+
+    def test_cached_playlist_skips_serialization(self):
+        """Test a cache hit costs only the version lookup"""
+        PlaylistTrack.objects.create(id='playlist-item-1', track=self.track, position=1.0)
+        first = self.client.get(reverse('playlist-list'))
+
+        with self.assertNumQueries(1):
+            second = self.client.get(reverse('playlist-list'))
+        self.assertEqual(second.content, first.content)
+        self.assertEqual(cache_stats()['playlist']['hits'], 1)
+
+    def test_tracks_follow_library_changes(self):
+        """Test the library is cached separately and expires on edits"""
+        url = reverse('tracks-list')
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        # Playlist mutations leave the library cache alone
+        self.client.post(reverse('playlist-list'), {'track_id': 'track-1'}, format='json')
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        self.track.title = 'Renamed'
+        self.track.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data[0]['title'], 'Renamed')
+
+    def test_playlist_follows_track_edits(self):
+        """Test editing a track expires the playlists that list it, and only those"""
+        PlaylistTrack.objects.create(id='playlist-item-1', track=self.track, position=1.0)
+        Playlist.objects.create(id='other')
+        url = reverse('playlist-list')
+        etag = self.client.get(url)['ETag']
+        other = Playlist.current_version('other')
+
+        self.track.title = 'Renamed'
+        self.track.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data[0]['track']['title'], 'Renamed')
+        self.assertEqual(Playlist.current_version('other'), other)
+
+        # Queryset deletes (the admin's bulk delete, seed_data --clear) skip
+        # Track.delete() and bump the versions themselves
+        library = Library.current_version()
+        etag = response['ETag']
+        TrackAdmin(Track, AdminSite()).delete_queryset(None, Track.objects.filter(id='track-1'))
+        self.assertEqual(Library.current_version(), library + 1)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual((response.status_code, response.data), (status.HTTP_200_OK, []))
+
+
+class QueueModeTests(TestCase):
+    """Tests for the vote-ordered queue mode"""
+
+    def setUp(self):
+        cache.clear()
+        clear_rankings()
+        self.client = APIClient()
+        for number in range(1, 5):
+            track = Track.objects.create(
+                id=f'track-{number}', title=f'Track {number}', artist='Artist', duration_seconds=200
+            )
+            PlaylistTrack.objects.create(
+                id=f'playlist-item-{number}', track=track, position=float(number)
+            )
+
+    def vote(self, playlist_id, direction='up'):
+        url = reverse('playlist-vote', args=[playlist_id])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(url, {'direction': direction}, format='json')
+        return json.loads(PlaylistEvent.objects.order_by('-version').first().frame)
+
+    def ranked_ids(self):
+        return [item['id'] for item in self.client.get(reverse('playlist-list')).data]
+
+    def test_ranked_queue_matches_sort(self):
+        """Test incremental updates agree with sorting by votes, then position"""
+        rng = random.Random(7)
+        queue = RankedQueue()
+        items = {}
+        for _ in range(500):
+            playlist_id = f'item-{rng.randrange(40)}'
+            if items and rng.random() < 0.1:
+                playlist_id = rng.choice(list(items))
+                expected = sorted(items, key=lambda i: (-items[i][0], items[i][1], i))
+                self.assertEqual(queue.remove(playlist_id), expected.index(playlist_id))
+                del items[playlist_id]
+                continue
+            items[playlist_id] = (rng.randrange(-3, 10), rng.random())
+            rank = queue.update(playlist_id, *items[playlist_id])
+            expected = sorted(items, key=lambda i: (-items[i][0], items[i][1], i))
+            self.assertEqual(rank, expected.index(playlist_id))
+        self.assertEqual(queue.ids(), expected)
+
+    def test_switch_to_votes_mode(self):
+        """Test switching modes broadcasts the ranked order once"""
+        PlaylistTrack.objects.filter(id='playlist-item-3').update(votes=2)
+        url = reverse('playlist-mode')
+        self.assertEqual(self.client.get(url).data, {'mode': 'position'})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.put(url, {'mode': 'votes'}, format='json')
+        self.assertEqual(response.data, {'mode': 'votes'})
+        event = json.loads(PlaylistEvent.objects.get().frame)
+        self.assertEqual(event['type'], 'playlist.mode')
+        self.assertEqual(event['order'][0], 'playlist-item-3')
+        self.assertEqual(self.ranked_ids(), event['order'])
+
+        response = self.client.put(url, {'mode': 'random'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['error']['code'], 'INVALID_MODE')
+
+    def test_votes_carry_new_rank(self):
+        """Test each vote reports the rank it moved its item to"""
+        Playlist.objects.filter(id='default').update(queue_mode=Playlist.QUEUE_VOTES)
+
+        event = self.vote('playlist-item-4')
+        self.assertEqual(event['item'], {'id': 'playlist-item-4', 'votes': 1, 'rank': 0})
+        # Ties go to the earlier position
+        self.assertEqual(self.vote('playlist-item-2')['item']['rank'], 0)
+        self.assertEqual(self.vote('playlist-item-4', 'down')['item']['rank'], 3)
+        self.assertEqual(self.vote('playlist-item-1', 'down')['item']['rank'], 3)
+
+        # The cached ranking agrees with the database after every vote
+        self.assertEqual(self.ranked_ids(), [
+            'playlist-item-2', 'playlist-item-3', 'playlist-item-4', 'playlist-item-1'
+        ])
+        version = Playlist.current_version()
+        with self.assertNumQueries(0):
+            queue = checkout_ranking('default', version, list)
+        self.assertEqual(queue.ids(), self.ranked_ids())
+
+    def test_position_mode_events_have_no_rank(self):
+        """Test rooms in position mode are not ranked"""
+        event = self.vote('playlist-item-4')
+        self.assertNotIn('rank', event['item'])
+
+
+class BatchTests(TestCase):
+    """Tests for POST /api/playlist/batch"""
+
+    def setUp(self):
+        cache.clear()
+        clear_rankings()
+        self.client = APIClient()
+        for number in range(1, 41):
+            Track.objects.create(
+                id=f'track-{number}', title=f'Track {number}', artist='Artist', duration_seconds=200
+            )
+        for number in range(1, 3):
+            PlaylistTrack.objects.create(
+                id=f'playlist-item-{number}', track_id=f'track-{number}', position=float(number)
+            )
+
+    def batch(self, operations):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(reverse('playlist-batch'), {'operations': operations}, format='json')
+
+    def test_operations_apply_in_order(self):
+        """Test a batch replays its operations and broadcasts one event"""
+        response = self.batch([
+            {'op': 'add', 'track_id': 'track-3', 'added_by': 'TestUser'},
+            {'op': 'vote', 'id': 'playlist-item-1', 'direction': 'up'},
+            {'op': 'vote', 'id': 'playlist-item-1', 'direction': 'up'},
+            {'op': 'move', 'id': 'playlist-item-2', 'position': 0.5},
+            {'op': 'remove', 'id': 'playlist-item-1'},
+            # The removed item's track can come straight back
+            {'op': 'add', 'track_id': 'track-1'},
+        ])
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        results = response.data['results']
+        self.assertEqual([result['op'] for result in results], ['add', 'vote', 'vote', 'move', 'remove', 'add'])
+        self.assertEqual(results[0]['item']['added_by'], 'TestUser')
+        self.assertEqual(results[0]['item']['position'], 3.0)
+        self.assertEqual([result['votes'] for result in results[1:3]], [1, 2])
+        self.assertEqual(results[5]['item']['position'], 4.0)
+
+        self.assertEqual(
+            list(PlaylistTrack.objects.order_by('position').values_list('track_id', 'votes')),
+            [('track-2', 0), ('track-3', 0), ('track-1', 0)]
+        )
+        event = json.loads(PlaylistEvent.objects.get().frame)
+        self.assertEqual(event['type'], 'playlist.batch')
+        self.assertEqual(event['version'], response.data['version'])
+        self.assertEqual(event['operations'], json.loads(json.dumps(results)))
+
+    def test_batch_is_atomic(self):
+        """Test one rejected operation rejects the whole batch"""
+        response = self.batch([
+            {'op': 'add', 'track_id': 'track-3'},
+            {'op': 'vote', 'id': 'playlist-item-1', 'direction': 'up'},
+            {'op': 'remove', 'id': 'missing'},
+        ])
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(response.data['error']['details'], {'id': 'missing', 'index': 2})
+
+        response = self.batch([
+            {'op': 'remove', 'id': 'playlist-item-1'},
+            {'op': 'add', 'track_id': 'track-2'},
+        ])
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['error']['code'], 'DUPLICATE_TRACK')
+        self.assertEqual(response.data['error']['details']['index'], 1)
+
+        response = self.batch([{'op': 'move', 'id': 'playlist-item-1', 'position': 'top'}])
+        self.assertEqual(response.data['error']['code'], 'INVALID_POSITION')
+        response = self.batch([])
+        self.assertEqual(response.data['error']['code'], 'INVALID_OPERATIONS')
+
+        self.assertEqual(PlaylistTrack.objects.count(), 2)
+        self.assertEqual(PlaylistTrack.objects.get(id='playlist-item-1').votes, 0)
+        self.assertEqual(Playlist.current_version(), 0)
+
+    def test_query_count_independent_of_size(self):
+        """Test a batch writes with bulk statements"""
+        def queries(numbers):
+            operations = [{'op': 'add', 'track_id': f'track-{number}'} for number in numbers]
+            operations += [{'op': 'vote', 'id': 'playlist-item-1'}] * len(numbers)
+            with CaptureQueriesContext(connection) as context:
+                self.assertEqual(self.batch(operations).status_code, status.HTTP_200_OK)
+            return len(context.captured_queries)
+
+        self.assertEqual(queries(range(3, 6)), queries(range(6, 41)))
+
+    def test_votes_mode_results_carry_rank(self):
+        """Test operations in a votes-mode room report each new rank"""
+        Playlist.objects.filter(id='default').update(queue_mode=Playlist.QUEUE_VOTES)
+        response = self.batch([
+            {'op': 'add', 'track_id': 'track-3'},
+            {'op': 'vote', 'id': 'playlist-item-2', 'direction': 'up'},
+            {'op': 'move', 'id': 'playlist-item-1', 'position': 5.0},
+        ])
+        self.assertEqual([result['rank'] for result in response.data['results']], [2, 0, 2])
+
+
+@override_settings(ROOT_URLCONF='playlist.async_urls')
+class AsyncPlaylistAPITests(TestCase):
+    """Tests for the async REST views"""
+
+    def setUp(self):
+        cache.clear()
+        self.client = AsyncClient()
+        self.track = Track.objects.create(
+            id='track-1',
+            title='Test Track',
+            artist='Test Artist',
+            duration_seconds=200
+        )
+
+    async def test_add_vote_and_reorder(self):
+        """Test the async mutation endpoints"""
+        response = await self.client.post(
+            reverse('playlist-list'), {'track_id': 'track-1', 'added_by': 'TestUser'},
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        item = response.json()
+        self.assertEqual(item['track']['title'], 'Test Track')
+
+        response = await self.client.post(
+            reverse('playlist-vote', args=[item['id']]), {'direction': 'up'},
+            content_type='application/json'
+        )
+        self.assertEqual(response.json()['votes'], 1)
+
+        response = await self.client.post(
+            reverse('playlist-reorder', args=[item['id']]), {'target_index': 0},
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        response = await self.client.delete(reverse('playlist-update', args=[item['id']]))
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(await sync_to_async(Playlist.current_version)(), 4)
+
+    @override_settings(PLAYLIST_VOTE_COALESCE_WINDOW_MS=20)
+    async def test_coalesced_votes(self):
+        """Test concurrent votes are folded into one write and one event"""
+        await PlaylistTrack.objects.acreate(id='playlist-item-1', track=self.track, position=1.0)
+        url = reverse('playlist-vote', args=['playlist-item-1'])
+
+        responses = await asyncio.gather(*[
+            self.client.post(url, {'direction': direction}, content_type='application/json')
+            for direction in ['up', 'up', 'up', 'down', 'up']
+        ])
+
+        self.assertEqual([response.status_code for response in responses], [200] * 5)
+        self.assertEqual({response.json()['votes'] for response in responses}, {3})
+        self.assertEqual(await PlaylistEvent.objects.acount(), 1)
+
+        response = await self.client.post(
+            reverse('playlist-vote', args=['missing']), {'direction': 'up'},
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    async def test_cancelled_vote_does_not_stall_window(self):
+        """Test a voter cancelled mid-window does not block the others"""
+        await PlaylistTrack.objects.acreate(id='playlist-item-1', track=self.track, position=1.0)
+        buffer = VoteBuffer(0.02)
+        voters = [asyncio.ensure_future(buffer.add('playlist-item-1', 1, Playlist.DEFAULT_ID)) for _ in range(3)]
+        missing = asyncio.ensure_future(buffer.add('missing', 1, Playlist.DEFAULT_ID))
+        await asyncio.sleep(0)
+        voters[0].cancel()
+
+        results = await asyncio.wait_for(asyncio.gather(*voters[1:]), timeout=5)
+        self.assertEqual([item['votes'] for item in results], [3, 3])
+        with self.assertRaises(Http404):
+            await asyncio.wait_for(missing, timeout=5)
+
+    async def test_errors(self):
+        """Test async views return the same errors as the DRF views"""
+        response = await self.client.post(
+            reverse('playlist-vote', args=['missing']), {'direction': 'up'},
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+        await PlaylistTrack.objects.acreate(id='playlist-item-1', track=self.track, position=1.0)
+        response = await self.client.post(
+            reverse('playlist-vote', args=['playlist-item-1']), {'direction': 'sideways'},
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.json()['error']['code'], 'INVALID_DIRECTION')
+
+        response = await self.client.post(
+            reverse('playlist-list'), 'not json', content_type='application/json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    async def test_get_matches_sync_views(self):
+        """Test async GET responses are byte-identical to the DRF views"""
+        await PlaylistTrack.objects.acreate(id='playlist-item-1', track=self.track, position=1.0)
+
+        for name in ['tracks-list', 'playlist-list']:
+            async_response = await self.client.get(reverse(name))
+            with override_settings(ROOT_URLCONF='playlist.urls'):
+                sync_response = await sync_to_async(APIClient().get)(reverse(name))
+            self.assertEqual(async_response.content, sync_response.content)
+            self.assertEqual(async_response['ETag'], sync_response['ETag'])
+
+        response = await self.client.get(
+            reverse('playlist-list'), headers={'If-None-Match': async_response['ETag']}
+        )
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+
+class PlaylistConsumerTests(TestCase):
+    """Tests for the WebSocket consumer"""
+
+    async def test_broadcast_frame_sent_verbatim(self):
+        """Test group events reach every socket as the same pre-encoded frame"""
+        communicators = [
+            WebsocketCommunicator(PlaylistConsumer.as_asgi(), '/ws/playlist/')
+            for _ in range(2)
+        ]
+        for communicator in communicators:
+            connected, _ = await communicator.connect()
+            self.assertTrue(connected)
+            ping = await communicator.receive_json_from()
+            self.assertEqual(ping['type'], 'ping')
+
+        message = build_group_message({
+            'type': 'track.voted',
+            'item': {'id': 'playlist-item-1', 'votes': 3}
+        })
+        await get_channel_layer().group_send('playlist', message)
+
+        for communicator in communicators:
+            frame = await communicator.receive_from()
+            self.assertEqual(frame, message['text'])
+            self.assertEqual(json.loads(frame)['item']['votes'], 3)
+            await communicator.disconnect()
+
+    async def test_room_sockets_get_only_their_room(self):
+        """Test events are broadcast to the sockets of their own room only"""
+        application = URLRouter(websocket_urlpatterns)
+        sockets = {
+            room: WebsocketCommunicator(application, path)
+            for room, path in [('default', '/ws/playlist/'), ('party', '/ws/playlist/party/')]
+        }
+        for communicator in sockets.values():
+            await communicator.connect()
+            await communicator.receive_json_from()
+
+        await sync_to_async(publish_event)(
+            {'type': 'track.voted', 'item': {'id': 'playlist-item-1', 'votes': 1}}, 'party'
+        )
+
+        event = await sockets['party'].receive_json_from()
+        self.assertEqual(event['version'], 1)
+        self.assertTrue(await sockets['default'].receive_nothing())
+
+        await sockets['party'].send_json_to({'type': 'resync'})
+        snapshot = await sockets['party'].receive_json_from()
+        self.assertEqual(snapshot['version'], 1)
+        for communicator in sockets.values():
+            await communicator.disconnect()
+
+    async def test_reorder_broadcasts_delta(self):
+        """Test reorder broadcasts a versioned track.moved delta"""
+        communicator = WebsocketCommunicator(PlaylistConsumer.as_asgi(), '/ws/playlist/')
+        await communicator.connect()
+        await communicator.receive_json_from()
+
+        track = await Track.objects.acreate(id='track-1', title='A', artist='B', duration_seconds=100)
+        await PlaylistTrack.objects.acreate(id='playlist-item-1', track=track, position=1.0)
+        url = reverse('playlist-reorder', args=['playlist-item-1'])
+        await sync_to_async(APIClient().post)(url, {'target_index': 0}, format='json')
+
+        event = await communicator.receive_json_from()
+        self.assertEqual(event, {
+            'type': 'track.moved',
+            'item': {'id': 'playlist-item-1', 'position': 1.0},
+            'version': 1
+        })
+        await communicator.disconnect()
+
+    async def test_mutations_over_socket(self):
+        """Test commands sent over the socket are broadcast and acknowledged"""
+        await Track.objects.acreate(id='track-1', title='A', artist='B', duration_seconds=100)
+        communicator = WebsocketCommunicator(PlaylistConsumer.as_asgi(), '/ws/playlist/')
+        await communicator.connect()
+        await communicator.receive_json_from()
+
+        await communicator.send_json_to({'type': 'add', 'request_id': 'r1', 'track_id': 'track-1'})
+        ack = await communicator.receive_json_from()
+        self.assertEqual((ack['type'], ack['request_id'], ack['ok']), ('ack', 'r1', True))
+        item = ack['data']
+        self.assertEqual(item['track']['title'], 'A')
+        event = await communicator.receive_json_from()
+        self.assertEqual((event['type'], event['version']), ('track.added', 1))
+
+        await communicator.send_json_to({'type': 'vote', 'request_id': 'r2', 'id': item['id']})
+        self.assertEqual((await communicator.receive_json_from())['data']['votes'], 1)
+        self.assertEqual((await communicator.receive_json_from())['type'], 'track.voted')
+
+        await communicator.send_json_to({'type': 'play', 'request_id': 'r3', 'id': item['id']})
+        self.assertTrue((await communicator.receive_json_from())['data']['is_playing'])
+        self.assertEqual((await communicator.receive_json_from())['type'], 'track.playing')
+
+        await communicator.send_json_to({'type': 'move', 'request_id': 'r4', 'id': item['id'], 'position': 'x'})
+        ack = await communicator.receive_json_from()
+        self.assertEqual((ack['ok'], ack['status'], ack['error']['code']), (False, 400, 'INVALID_POSITION'))
+
+        await communicator.send_json_to({'type': 'remove', 'request_id': 'r5', 'id': 'missing'})
+        ack = await communicator.receive_json_from()
+        self.assertEqual((ack['request_id'], ack['ok'], ack['status']), ('r5', False, 404))
+        self.assertTrue(await communicator.receive_nothing())
+        self.assertEqual(await sync_to_async(Playlist.current_version)(), 3)
+        await communicator.disconnect()
+
+    async def test_resync_sends_snapshot(self):
+        """Test an explicit resync request returns the full playlist"""
+        track = await Track.objects.acreate(id='track-1', title='A', artist='B', duration_seconds=100)
+        await PlaylistTrack.objects.acreate(id='playlist-item-1', track=track, position=1.0)
+
+        communicator = WebsocketCommunicator(PlaylistConsumer.as_asgi(), '/ws/playlist/')
+        await communicator.connect()
+        await communicator.receive_json_from()
+
+        await communicator.send_json_to({'type': 'resync'})
+        snapshot = await communicator.receive_json_from()
+        self.assertEqual(snapshot['type'], 'playlist.snapshot')
+        self.assertEqual(snapshot['version'], 0)
+        self.assertEqual([item['id'] for item in snapshot['items']], ['playlist-item-1'])
+        await communicator.disconnect()
+
+    async def test_resume_replays_missed_events(self):
+        """Test connecting with since=<version> replays only the missed events"""
+        for votes in range(3):
+            await sync_to_async(publish_event)({
+                'type': 'track.voted',
+                'item': {'id': 'playlist-item-1', 'votes': votes}
+            })
+
+        communicator = WebsocketCommunicator(PlaylistConsumer.as_asgi(), '/ws/playlist/?since=1')
+        await communicator.connect()
+        self.assertEqual((await communicator.receive_json_from())['type'], 'ping')
+
+        replayed = [await communicator.receive_json_from() for _ in range(2)]
+        self.assertEqual([event['version'] for event in replayed], [2, 3])
+        self.assertTrue(await communicator.receive_nothing())
+        await communicator.disconnect()
+
+    @override_settings(PLAYLIST_EVENT_LOG_SIZE=2)
+    async def test_resume_outside_window_sends_snapshot(self):
+        """Test a gap older than the retained log falls back to a snapshot"""
+        for votes in range(5):
+            await sync_to_async(publish_event)({
+                'type': 'track.voted',
+                'item': {'id': 'playlist-item-1', 'votes': votes}
+            })
+
+        communicator = WebsocketCommunicator(PlaylistConsumer.as_asgi(), '/ws/playlist/?since=1')
+        await communicator.connect()
+        await communicator.receive_json_from()
+
+        snapshot = await communicator.receive_json_from()
+        self.assertEqual(snapshot['type'], 'playlist.snapshot')
+        self.assertEqual(snapshot['version'], 5)
+        await communicator.disconnect()
+
+
+class WireEncodingTests(TestCase):
+    """Tests for the compact and MessagePack WebSocket encodings"""
+
+    def test_compact_keys_round_trip(self):
+        """Test compact keys are unique, never clash with a long key and expand back"""
+        shorts = list(COMPACT_KEYS.values())
+        self.assertEqual(len(shorts), len(set(shorts)))
+        self.assertFalse(set(shorts) & (set(COMPACT_KEYS) | {'id', 'ts', 'ok', 'op', 'index', 'detail'}))
+
+        message = {
+            'type': 'playlist.batch', 'version': 4, 'trace': {'id': 't-1', 'ts': 1.5},
+            'operations': [{'op': 'add', 'item': {'id': 'a', 'track': {'title': 'T', 'genre': 'Pop'}}}],
+        }
+        self.assertEqual(compact(message)['t'], 'pb')
+        self.assertEqual(expand(compact(message)), message)
+
+    def test_deflate_offer_accepted(self):
+        """Test playlist.server accepts a permessage-deflate offer"""
+        from autobahn.websocket.compress import PerMessageDeflateOffer, PerMessageDeflateOfferAccept
+
+        from .server import accept_deflate
+
+        self.assertIsInstance(accept_deflate([PerMessageDeflateOffer()]), PerMessageDeflateOfferAccept)
+        self.assertIsNone(accept_deflate([]))
+
+    def test_deflate_factory_selected_by_server(self):
+        """Test only a server started with deflate uses the deflate factory"""
+        import daphne.server
+
+        from .server import BackpressureServer, DeflateWebSocketFactory
+
+        factories = {}
+        for deflate in (False, True):
+            server = BackpressureServer(None, endpoints=['tcp:port=0'], deflate=deflate)
+            server.ws_factory = daphne.server.WebSocketFactory(server, server=server.server_name)
+            factories[deflate] = server.ws_factory
+        self.assertNotIsInstance(factories[False], DeflateWebSocketFactory)
+        self.assertIsInstance(factories[True], DeflateWebSocketFactory)
+        # Daphne's own module is left alone
+        self.assertIsNot(daphne.server.WebSocketFactory, DeflateWebSocketFactory)
+
+    async def connect(self, subprotocol):
+        communicator = WebsocketCommunicator(
+            PlaylistConsumer.as_asgi(), '/ws/playlist/', subprotocols=[subprotocol, 'playlist.json']
+        )
+        connected, accepted = await communicator.connect()
+        self.assertEqual((connected, accepted), (True, subprotocol))
+        return communicator
+
+    async def test_negotiated_encodings(self):
+        """Test clients receive events in the encoding they negotiated"""
+        track = await Track.objects.acreate(id='track-1', title='A', artist='B', duration_seconds=100)
+        await PlaylistTrack.objects.acreate(id='playlist-item-1', track=track, position=1.0)
+        binary = await self.connect('playlist.msgpack')
+        short = await self.connect('playlist.compact')
+        self.assertEqual(msgpack.unpackb((await binary.receive_output())['bytes'])['type'], 'ping')
+        self.assertEqual((await short.receive_json_from())['t'], 'pi')
+
+        # Commands may be sent as MessagePack binary frames
+        await binary.send_to(bytes_data=msgpack.packb({'type': 'vote', 'request_id': 'r1', 'id': 'playlist-item-1'}))
+        replies = [msgpack.unpackb((await binary.receive_output())['bytes']) for _ in range(2)]
+        self.assertEqual(
+            sorted((reply['type'], reply.get('ok')) for reply in replies), [('ack', True), ('track.voted', None)]
+        )
+        event = await short.receive_json_from()
+        self.assertEqual(event, {'t': 'tv', 'i': {'id': 'playlist-item-1', 'n': 1}, 'v': 1})
+
+        await binary.send_to(bytes_data=b'\xc1')
+        self.assertTrue(await binary.receive_nothing())
+        await binary.disconnect()
+        await short.disconnect()
+
+
+class FailingConsumer(PlaylistConsumer):
+    """A consumer whose every frame fails to send"""
+
+    async def send(self, *args, **kwargs):
+        raise ConnectionError('Connection lost')
+
+
+class StalledConsumer(PlaylistConsumer):
+    """A consumer whose client reads nothing until `gate` is set"""
+    gate = None
+
+    async def send(self, *args, **kwargs):
+        await self.gate.wait()
+        await super().send(*args, **kwargs)
+
+
+@override_settings(PLAYLIST_SOCKET_QUEUE_SIZE=2)
+class BackpressureTests(TestCase):
+    """Tests for the bounded per-connection outbox"""
+
+    async def connect_stalled(self):
+        StalledConsumer.gate = asyncio.Event()
+        communicator = WebsocketCommunicator(StalledConsumer.as_asgi(), '/ws/playlist/')
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+        return communicator
+
+    async def publish_votes(self, count):
+        for votes in range(count):
+            await sync_to_async(publish_event)({
+                'type': 'track.voted',
+                'item': {'id': 'playlist-item-1', 'votes': votes}
+            })
+
+    async def test_overflow_collapses_into_snapshot(self):
+        """Test events beyond the limit are replaced by one snapshot"""
+        resyncs = outbox_stats()['resyncs']
+        communicator = await self.connect_stalled()
+        await self.publish_votes(5)
+        self.assertTrue(await communicator.receive_nothing())
+        self.assertEqual(outbox_stats()['resyncs'], resyncs + 1)
+
+        StalledConsumer.gate.set()
+        self.assertEqual((await communicator.receive_json_from())['type'], 'ping')
+        snapshot = await communicator.receive_json_from()
+        self.assertEqual((snapshot['type'], snapshot['version']), ('playlist.snapshot', 5))
+        self.assertTrue(await communicator.receive_nothing())
+
+        # Back to deltas once the client catches up
+        await self.publish_votes(1)
+        self.assertEqual((await communicator.receive_json_from())['version'], 6)
+        await communicator.disconnect()
+
+    @override_settings(PLAYLIST_SOCKET_STALL_TIMEOUT=0)
+    async def test_stalled_client_is_evicted(self):
+        """Test a client stuck on a frame past the timeout is disconnected"""
+        evictions = outbox_stats()['evictions']
+        communicator = await self.connect_stalled()
+        with self.assertLogs('playlist.consumers', 'WARNING'):
+            await self.publish_votes(1)
+            await asyncio.wait_for(communicator.future, 1)
+        self.assertEqual(outbox_stats()['evictions'], evictions + 1)
+
+        response = await sync_to_async(APIClient().get)(reverse('socket-stats'))
+        self.assertEqual(response.data['evictions'], evictions + 1)
+
+    async def test_snapshot_failure_keeps_writer(self):
+        """Test a snapshot that fails to build is skipped and later frames still go out"""
+        communicator = await self.connect_stalled()
+        await self.publish_votes(5)
+        with mock.patch.object(StalledConsumer, 'get_snapshot', mock.AsyncMock(side_effect=RuntimeError)):
+            with self.assertLogs('playlist.consumers', 'ERROR'):
+                StalledConsumer.gate.set()
+                self.assertEqual((await communicator.receive_json_from())['type'], 'ping')
+                self.assertTrue(await communicator.receive_nothing())
+        await self.publish_votes(1)
+        self.assertEqual((await communicator.receive_json_from())['type'], 'track.voted')
+        await communicator.disconnect()
+
+    async def test_send_failure_evicts(self):
+        """Test the writer gives up on a socket it cannot send to and evicts it"""
+        evictions = outbox_stats()['evictions']
+        communicator = WebsocketCommunicator(FailingConsumer.as_asgi(), '/ws/playlist/')
+        with self.assertLogs('playlist.consumers', 'WARNING') as logs:
+            await communicator.connect()
+            self.assertEqual(
+                await communicator.receive_output(), {'type': 'websocket.close', 'code': EVICTED_CLOSE_CODE}
+            )
+            await asyncio.wait_for(communicator.future, 1)
+        self.assertIn('ERROR', {record.levelname for record in logs.records})
+        self.assertEqual(outbox_stats()['evictions'], evictions + 1)
+
+    async def connect_with_backpressure(self):
+        """A client behind playlist.server, whose transport buffer starts empty"""
+        from .server import BACKPRESSURE_EXTENSION, Backpressure
+
+        backpressure = Backpressure()
+        consumer = PlaylistConsumer.as_asgi()
+
+        async def application(scope, receive, send):
+            scope = {**scope, 'extensions': {BACKPRESSURE_EXTENSION: backpressure}}
+            return await consumer(scope, receive, send)
+
+        communicator = WebsocketCommunicator(application, '/ws/playlist/')
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+        self.assertEqual((await communicator.receive_json_from())['type'], 'ping')
+        return communicator, backpressure
+
+    async def test_full_transport_buffer_holds_frames(self):
+        """Test frames wait in the outbox while the server's buffer is full"""
+        resyncs = outbox_stats()['resyncs']
+        communicator, backpressure = await self.connect_with_backpressure()
+        backpressure.pauseProducing()
+        await self.publish_votes(5)
+        self.assertTrue(await communicator.receive_nothing())
+        self.assertEqual(outbox_stats()['resyncs'], resyncs + 1)
+
+        backpressure.resumeProducing()
+        # The writer held the first event while it waited for the buffer
+        self.assertEqual((await communicator.receive_json_from())['version'], 1)
+        snapshot = await communicator.receive_json_from()
+        self.assertEqual((snapshot['type'], snapshot['version']), ('playlist.snapshot', 5))
+        await communicator.disconnect()
+
+    @override_settings(PLAYLIST_SOCKET_STALL_TIMEOUT=0.05)
+    async def test_undrained_buffer_evicts_without_further_events(self):
+        """Test the writer evicts a client whose buffer stays full past the timeout"""
+        communicator, backpressure = await self.connect_with_backpressure()
+        backpressure.pauseProducing()
+        with self.assertLogs('playlist.consumers', 'WARNING'):
+            await self.publish_votes(1)
+            self.assertEqual(
+                await communicator.receive_output(), {'type': 'websocket.close', 'code': EVICTED_CLOSE_CODE}
+            )
+            await asyncio.wait_for(communicator.future, 1)
+
+    @override_settings(PLAYLIST_SOCKET_STALL_TIMEOUT=0)
+    async def test_evicted_client_is_closed(self):
+        """Test a client whose buffer stays full past the timeout gets a close frame"""
+        communicator, backpressure = await self.connect_with_backpressure()
+        backpressure.pauseProducing()
+        with self.assertLogs('playlist.consumers', 'WARNING'):
+            await self.publish_votes(2)
+            self.assertEqual(
+                await communicator.receive_output(), {'type': 'websocket.close', 'code': EVICTED_CLOSE_CODE}
+            )
+            await asyncio.wait_for(communicator.future, 1)
+
+
+class MetricsTests(TestCase):
+    """Tests for the realtime pipeline histograms and trace IDs"""
+
+    def setUp(self):
+        cache.clear()
+        reset_metrics()
+
+    def test_histogram(self):
+        """Test buckets are cumulative and quantiles are bucket bounds"""
+        histogram = Histogram()
+        for seconds in [0.0002, 0.0002, 0.003, 20.0]:
+            histogram.observe(seconds)
+        data = histogram.as_dict()
+        self.assertEqual(data['count'], 4)
+        self.assertEqual(data['buckets']['0.00025'], 2)
+        self.assertEqual(data['buckets']['0.005'], 3)
+        self.assertEqual(data['buckets']['10.0'], 3)
+        self.assertEqual(data['buckets']['+Inf'], 4)
+        self.assertEqual(data['p50'], 0.00025)
+        self.assertEqual(data['p99'], float('inf'))
+
+    async def test_mutation_is_timed_and_traced(self):
+        """Test each pipeline stage is timed and the trace ID reaches the socket"""
+        track = await Track.objects.acreate(id='track-1', title='A', artist='B', duration_seconds=100)
+        await PlaylistTrack.objects.acreate(id='playlist-item-1', track=track, position=1.0)
+        communicator = WebsocketCommunicator(PlaylistConsumer.as_asgi(), '/ws/playlist/')
+        await communicator.connect()
+        await communicator.receive_json_from()
+
+        url = reverse('playlist-vote', args=['playlist-item-1'])
+        await sync_to_async(APIClient().post)(
+            url, {'direction': 'up'}, format='json', headers={'X-Trace-Id': 'trace-1'}
+        )
+        event = await communicator.receive_json_from()
+        self.assertEqual(event['trace']['id'], 'trace-1')
+
+        response = await sync_to_async(APIClient().get)(reverse('metrics'))
+        histograms = response.data['histograms']
+        self.assertEqual(histograms['db_seconds']['vote_track']['count'], 1)
+        # The nested track serializer is not counted on its own
+        self.assertEqual(histograms['serialize_seconds']['vote_track']['count'], 1)
+        for name in ['encode_seconds', 'group_send_seconds', 'outbox_wait_seconds', 'socket_send_seconds']:
+            self.assertEqual(histograms[name]['track.voted']['count'], 1)
+        self.assertGreaterEqual(response.data['sockets'], 1)
+
+        response = await sync_to_async(APIClient().get)(reverse('metrics-prometheus'))
+        self.assertIn(b'playlist_db_seconds_count{service="vote_track"} 1', response.content)
+        self.assertIn(b'playlist_serialize_seconds_count{service="vote_track"} 1', response.content)
+        await communicator.disconnect()
+
+    def test_serialization_timed_once_per_response(self):
+        """Test a many=True serializer and the fast path each record one duration"""
+        Track.objects.bulk_create(
+            Track(id=f'track-{i}', title=f'Song {i}', artist='Artist', duration_seconds=100)
+            for i in range(3)
+        )
+        self.client.get(reverse('tracks-search'), {'q': 'song'})
+        self.client.get(reverse('tracks-list'))
+        histograms = self.client.get(reverse('metrics')).json()['histograms']['serialize_seconds']
+        self.assertEqual(histograms['search_tracks']['count'], 1)
+        self.assertEqual(histograms['cached_tracks']['count'], 1)
+
+
+class SerializerFastPathTests(TestCase):
+    """Tests that the values_list() serializers match the DRF serializers"""
+
+    def test_playlist_rows_match_serializer(self):
+        """Test playlist rows render to the same JSON, edge values included"""
+        track = Track.objects.create(
+            id='track-1', title='Café \u2028 "Live"', artist='Björk', album='',
+            duration_seconds=215, genre='Pop', cover_url='https://example.com/a.jpg'
+        )
+        bare = Track.objects.create(id='track-2', title='Plain', artist='A', duration_seconds=1)
+        PlaylistTrack.objects.create(id='playlist-item-1', track=track, position=1e-05, votes=-3)
+        PlaylistTrack.objects.create(
+            id='playlist-item-2', track=bare, position=1e16, is_playing=True,
+            played_at=timezone.now(), added_by='Ünïcode'
+        )
+        items = PlaylistTrack.objects.order_by('position')
+
+        expected = PlaylistTrackSerializer(items.select_related('track'), many=True).data
+        rows = playlist_track_rows(items)
+        self.assertEqual(JSONRenderer().render(rows), JSONRenderer().render(expected))
+        self.assertEqual([list(row) for row in rows], [list(item) for item in expected])
+
+        expected = TrackSerializer(Track.objects.order_by('id'), many=True).data
+        self.assertEqual(
+            JSONRenderer().render(track_rows(Track.objects.order_by('id'))), JSONRenderer().render(expected)
+        )
+
+
+class QueryBudgetTests(TestCase):
+    """Tests for the query-count and serialization budget of each endpoint"""
+
+    def setUp(self):
+        cache.clear()
+        tracks = Track.objects.bulk_create(
+            Track(id=f'track-{i}', title=f'Track {i}', artist='Artist', duration_seconds=100)
+            for i in range(BUDGET_ITEMS + 1)
+        )
+        PlaylistTrack.objects.bulk_create(
+            PlaylistTrack(id=f'playlist-item-{i}', track=track, position=float(i + 1))
+            for i, track in enumerate(tracks[:BUDGET_ITEMS])
+        )
+        self.item_ids = [f'playlist-item-{i}' for i in range(BUDGET_ITEMS)]
+
+    def test_every_endpoint_within_budget(self):
+        """Test no endpoint runs more queries or serializes longer than its budget"""
+        results = measure_endpoints(self.client, self.item_ids, f'track-{BUDGET_ITEMS}')
+        self.assertEqual({key for key, _, _ in results}, set(BUDGETS))
+        for key, response, usage in results:
+            with self.subTest(endpoint=key):
+                self.assertLess(response.status_code, 300)
+                self.assertEqual(over_budget(key, usage), [])
+
+    def test_query_count_does_not_grow_with_playlist(self):
+        """Test the playlist is serialized without a query per item"""
+        with measure() as usage:
+            self.client.get(reverse('playlist-list'))
+        PlaylistTrack.objects.filter(id__in=self.item_ids[10:]).delete()
+        cache.clear()
+        with measure() as smaller:
+            self.client.get(reverse('playlist-list'))
+        self.assertEqual(usage.query_count, smaller.query_count)
+        self.assertGreater(usage.serialize_ms, 0)
+
+    def test_query_plans(self):
+        """Test the report explains each SELECT and flags full table scans"""
+        with measure() as usage:
+            self.client.get(reverse('tracks-list'))
+        plans = query_plans(usage)
+        self.assertTrue(plans)
+        self.assertTrue(all(plan['plan'] for plan in plans))
+        # The library page and its version lookup use indexes
+        self.assertFalse(any(plan['full_scan'] for plan in plans))
+
+        with measure() as usage:
+            list(Track.objects.filter(album='Album').order_by())
+        self.assertTrue(query_plans(usage)[0]['full_scan'])
+
+    @override_settings(PLAYLIST_BUDGET_CHECKS=True)
+    def test_middleware_logs_requests_over_budget(self):
+        """Test live requests over their budget are logged when checks are on"""
+        self.client.get(reverse('playlist-list'))
+        with mock.patch.dict(BUDGETS, {'GET playlist-list': Budget(1, 50)}):
+            cache.clear()
+            with self.assertLogs('playlist.budgets', 'WARNING') as logs:
+                self.client.get(reverse('playlist-list'))
+        self.assertIn('GET playlist-list is over budget: 5 queries (budget 1)', logs.output[0])
+
+
+class PeerWorkerConsumer(PlaylistConsumer):
+    """A consumer served by a second worker, with its own channel layer"""
+    channel_layer_alias = 'worker-b'
+
+
+class MultiWorkerBroadcastTests(TestCase):
+    """Tests for broadcasts between workers through a Redis channel layer"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.redis = RespServer().start()
+        cls.addClassCleanup(cls.redis.stop)
+
+    async def test_vote_reaches_socket_on_other_worker(self):
+        """Test a vote on one worker reaches a socket on another, quickly"""
+        # Two layer instances with their own Redis connections, as two
+        # worker processes would have
+        layer = {
+            'BACKEND': 'channels_redis.pubsub.RedisPubSubChannelLayer',
+            'CONFIG': {'hosts': [self.redis.url]},
+        }
+        track = await Track.objects.acreate(id='track-1', title='A', artist='B', duration_seconds=100)
+        await PlaylistTrack.objects.acreate(id='playlist-item-1', track=track, position=1.0)
+        url = reverse('playlist-vote', args=['playlist-item-1'])
+
+        with override_settings(CHANNEL_LAYERS={'default': layer, 'worker-b': layer}):
+            communicator = WebsocketCommunicator(PeerWorkerConsumer.as_asgi(), '/ws/playlist/')
+            await communicator.connect()
+            await communicator.receive_json_from()
+            while not self.redis.subscriber_count(b'asgi__group__playlist'):
+                await asyncio.sleep(0.001)
+
+            latencies = []
+            for votes in range(1, 22):
+                start = time.perf_counter()
+                await sync_to_async(APIClient().post)(url, {'direction': 'up'}, format='json')
+                event = await communicator.receive_json_from(timeout=2)
+                latencies.append(time.perf_counter() - start)
+                self.assertEqual(event['type'], 'track.voted')
+                self.assertEqual(event['item']['votes'], votes)
+
+            await communicator.disconnect()
+            for alias in ['default', 'worker-b']:
+                await get_channel_layer(alias).flush()
+
+        # The first vote also waits for the receiver to start polling
+        latencies = sorted(latencies[1:])
+        self.assertLess(latencies[len(latencies) // 2], 0.1)
+        self.assertLess(latencies[-1], 0.5)
+
+
+class EventLogTests(TestCase):
+    """Tests for the bounded, versioned event log"""
+
+    def publish_votes(self, count):
+        for votes in range(count):
+            publish_event({'type': 'track.voted', 'item': {'id': 'playlist-item-1', 'votes': votes}})
+
+    @override_settings(PLAYLIST_EVENT_LOG_SIZE=3)
+    def test_log_is_bounded(self):
+        """Test only the most recent events are retained"""
+        self.publish_votes(5)
+        versions = list(PlaylistEvent.objects.values_list('version', flat=True))
+        self.assertEqual(versions, [3, 4, 5])
+
+    def test_events_since(self):
+        """Test events_since returns frames in order, or None on unknown gaps"""
+        self.publish_votes(3)
+        frames = events_since(1)
+        self.assertEqual([json.loads(frame)['version'] for frame in frames], [2, 3])
+        self.assertEqual(events_since(3), [])
+        self.assertIsNone(events_since(10))
+
+
+class PlaybackTests(TestCase):
+    """Tests for the server-side playback clock and auto-advance"""
+
+    def setUp(self):
+        self.started = timezone.now() - timedelta(seconds=202)
+        for number, votes in [(1, 0), (2, 1), (3, 5)]:
+            track = Track.objects.create(
+                id=f'track-{number}', title=f'Track {number}', artist='Artist', duration_seconds=200
+            )
+            PlaylistTrack.objects.create(
+                id=f'playlist-item-{number}', track=track, position=float(number), votes=votes,
+                is_playing=number == 1, played_at=self.started if number == 1 else None
+            )
+
+    def playing(self):
+        return list(PlaylistTrack.objects.filter(is_playing=True).values_list('id', 'played_at'))
+
+    def test_timer_wheel(self):
+        """Test timers expire once due, including those a revolution or more away"""
+        wheel = TimerWheel(tick=1.0, slots=8, start=0.0)
+        wheel.schedule('a', 2.5, 'item-a')
+        wheel.schedule('b', 20.0, 'item-b')
+        wheel.schedule('c', 3.0, 'item-c')
+        wheel.cancel('c')
+        self.assertEqual(wheel.advance(2.9), [])
+        self.assertEqual(wheel.advance(3.0), [('a', 'item-a')])
+        self.assertEqual(wheel.advance(12.0), [])
+
+        # Rescheduling replaces the earlier timer
+        wheel.schedule('b', 13.0, 'item-b2')
+        self.assertEqual(wheel.advance(100.0), [('b', 'item-b2')])
+        self.assertEqual(len(wheel), 0)
+
+    def test_advance_by_position(self):
+        """Test the next item starts exactly when the finished one ended"""
+        item, events = advance_playback('default', 'playlist-item-1')
+        self.assertEqual(item.id, 'playlist-item-2')
+        ended = self.started + timedelta(seconds=200)
+        self.assertEqual(self.playing(), [('playlist-item-2', ended)])
+
+        _, message = events[0]
+        event = json.loads(message['text'])
+        self.assertEqual(event['id'], 'playlist-item-2')
+        self.assertTrue(event['is_playing'])
+        self.assertEqual(event['played_at'], ended.isoformat())
+        self.assertIn('server_time', event)
+
+    @override_settings(PLAYLIST_ADVANCE_BY='votes')
+    def test_advance_by_votes(self):
+        """Test vote order plays the highest voted unplayed item next"""
+        item, _ = advance_playback('default', 'playlist-item-1')
+        self.assertEqual(item.id, 'playlist-item-3')
+
+    def test_advance_stops_at_end(self):
+        """Test playback stops after the last item"""
+        PlaylistTrack.objects.filter(id__in=['playlist-item-2', 'playlist-item-3']).delete()
+        item, events = advance_playback('default', 'playlist-item-1')
+        self.assertIsNone(item)
+        self.assertEqual(self.playing(), [])
+        self.assertFalse(json.loads(events[0][1]['text'])['is_playing'])
+
+    def test_advance_ignores_changed_room(self):
+        """Test a stale or early deadline leaves the room alone"""
+        item, events = advance_playback('default', 'playlist-item-2')
+        self.assertEqual((item.id, events), ('playlist-item-1', []))
+
+        item, events = advance_playback('default', 'playlist-item-1', now=self.started)
+        self.assertEqual((item.id, events), ('playlist-item-1', []))
+
+    async def test_scheduler_advances_and_broadcasts(self):
+        """Test the scheduler moves the room on and broadcasts track.playing"""
+        communicator = WebsocketCommunicator(PlaylistConsumer.as_asgi(), '/ws/playlist/')
+        await communicator.connect()
+        await communicator.receive_json_from()
+
+        now = [time.time()]
+        scheduler = PlaybackScheduler(tick=0.25, clock=lambda: now[0])
+        await scheduler.tick()
+        self.assertIn('default', scheduler.wheel)
+
+        # The room's track ended 2 s ago, so it is due at the next tick
+        now[0] += 0.25
+        await scheduler.tick()
+        event = await communicator.receive_json_from()
+        self.assertEqual((event['type'], event['id']), ('track.playing', 'playlist-item-2'))
+        self.assertEqual(scheduler.wheel.timers['default'][1], 'playlist-item-2')
+
+        now[0] += 200
+        await scheduler.tick()
+        event = await communicator.receive_json_from()
+        self.assertEqual(event['id'], 'playlist-item-3')
+        await communicator.disconnect()
+
+
+class DatabaseTuningTests(TestCase):
+    """Tests for the SQLite connection settings and write transactions"""
+
+    def test_pragmas_applied_to_connection(self):
+        """Test new connections get the configured busy timeout and cache"""
+        values = sqlite_settings(connection)
+        self.assertEqual(values['busy_timeout'], settings.SQLITE_PRAGMAS['busy_timeout'])
+        self.assertEqual(values['cache_size'], settings.SQLITE_PRAGMAS['cache_size'])
+
+    def test_write_transaction_writes_first(self):
+        """Test the write lock is taken before the transaction's first read"""
+        with CaptureQueriesContext(connection) as queries:
+            with write_transaction():
+                PlaylistTrack.objects.count()
+        # The test case's own transaction makes this block a savepoint
+        statements = [query['sql'] for query in queries if 'SAVEPOINT' not in query['sql']]
+        self.assertTrue(statements[0].startswith('UPDATE'))
+
+    def test_write_transaction_holds_process_lock(self):
+        """Test other threads in the process wait while a write transaction runs"""
+        acquired = []
+
+        def try_lock():
+            acquired.append(database._write_lock.acquire(blocking=False))
+
+        with write_transaction():
+            with write_transaction():
+                thread = threading.Thread(target=try_lock)
+                thread.start()
+                thread.join()
+        self.assertEqual(acquired, [False])
+        self.assertTrue(database._write_lock.acquire(blocking=False))
+        database._write_lock.release()
+
+
+class SeedDataImportTests(TestCase):
+    """Tests for seed_data and importing catalogs with seed_data --file"""
+
+    def write_catalog(self, name, content):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = os.path.join(directory.name, name)
+        with open(path, 'w', encoding='utf-8') as catalog:
+            catalog.write(content)
+        return path
+
+    def test_seed_replaces_only_the_default_room(self):
+        """Test reseeding keeps other rooms, and --clear expires every room it empties"""
+        track = Track.objects.create(id='other-track', title='Other', artist='Artist', duration_seconds=100)
+        room = Playlist.objects.create(id='other')
+        PlaylistTrack.objects.create(id='other-item', playlist=room, track=track, position=1.0)
+
+        call_command('seed_data', stdout=StringIO())
+        self.assertTrue(PlaylistTrack.objects.filter(id='other-item').exists())
+        self.assertEqual(PlaylistTrack.objects.filter(playlist_id=Playlist.DEFAULT_ID).count(), 10)
+
+        versions = Playlist.current_version(), Playlist.current_version('other')
+        call_command('seed_data', clear=True, stdout=StringIO())
+        self.assertFalse(PlaylistTrack.objects.filter(playlist_id='other').exists())
+        self.assertGreater(Playlist.current_version('other'), versions[1])
+        self.assertGreater(Playlist.current_version(), versions[0])
+
+    def test_import_csv_in_batches(self):
+        """Test CSV rows are imported in batches and invalid rows skipped"""
+        path = self.write_catalog('catalog.csv', (
+            'id,title,artist,album,duration_seconds,genre\n'
+            'cat-1,"Song, One",Artist A,Album,200,Rock\n'
+            'cat-2,Song Two,Artist B,,180,\n'
+            'cat-3,No Duration,Artist C,,,Jazz\n'
+            'cat-4,Song Four,Artist D,,240,Jazz\n'
+        ))
+        output = StringIO()
+        call_command('seed_data', file=path, batch_size=2, stdout=output)
+
+        self.assertEqual(Track.objects.count(), 3)
+        self.assertEqual(Track.objects.get(id='cat-1').title, 'Song, One')
+        self.assertIsNone(Track.objects.get(id='cat-2').cover_url)
+        self.assertIn('Skipped line 4: missing duration_seconds', output.getvalue())
+        self.assertIn('rows/sec', output.getvalue())
+        self.assertIn('peak RSS', output.getvalue())
+
+    def test_import_jsonl_upserts_with_workers(self):
+        """Test JSON Lines imports update existing tracks, parsed in parallel"""
+        track = Track.objects.create(id='cat-1', title='Old Title', artist='Artist', duration_seconds=100)
+        PlaylistTrack.objects.create(id='playlist-item-1', track=track, position=1.0)
+        versions = Playlist.current_version(), Library.current_version()
+        path = self.write_catalog('catalog.jsonl', ''.join(
+            json.dumps({'id': f'cat-{i}', 'title': f'Title {i}', 'artist': 'Artist',
+                        'duration_seconds': 100 + i}) + '\n'
+            for i in range(1, 8)
+        ))
+        call_command('seed_data', file=path, batch_size=3, workers=2, stdout=StringIO())
+
+        self.assertEqual(Track.objects.count(), 7)
+        self.assertEqual(Track.objects.get(id='cat-1').title, 'Title 1')
+        # Cached library pages and the playlist listing cat-1 expire
+        self.assertGreater(Playlist.current_version(), versions[0])
+        self.assertEqual(Library.current_version(), versions[1] + 3)
+        # Upserted rows are re-indexed for search
+        self.assertEqual(
+            [track['id'] for track in self.client.get(reverse('tracks-search'), {'q': 'title 1'}).json()],
+            ['cat-1']
+        )
+
+
+class BenchmarkBaselineTests(TestCase):
+    """Tests for comparing benchmark results to a saved baseline"""
+
+    baseline = [
+        {'mode': 'socket', 'listeners': 10, 'errors': 0,
+         'mutations_per_sec': 100.0, 'p99_ms': 20.0, 'shifted_avg': 3.0},
+    ]
+
+    def test_regressions_beyond_tolerance(self):
+        """Test metrics fail only when worse than the baseline by the tolerance"""
+        within = [{**self.baseline[0], 'mutations_per_sec': 90.0, 'p99_ms': 24.0, 'shifted_avg': 9.0}]
+        self.assertEqual(compare_rows(self.baseline, within, 0.25), [])
+
+        worse = [{**self.baseline[0], 'mutations_per_sec': 70.0, 'p99_ms': 30.0, 'errors': 2}]
+        regressions = compare_rows(self.baseline, worse, 0.25)
+        self.assertEqual(len(regressions), 3)
+        self.assertTrue(regressions[0].startswith('mode=socket listeners=10: errors'))
+
+    def test_different_runs_do_not_compare(self):
+        """Test a baseline recorded with other options is rejected"""
+        with self.assertRaises(BaselineMismatch):
+            compare_rows(self.baseline, [{**self.baseline[0], 'listeners': 100}], 0.25)
+        with self.assertRaises(BaselineMismatch):
+            compare_rows(self.baseline, [], 0.25)
+
+
+class BenchmarkSmokeTests(SimpleTestCase):
+    """Runs every registered benchmark at a tiny size"""
+
+    options = {
+        'broadcast': ['--subscribers', '1,2', '--events', '2'],
+        'layers': ['--processes', '1', '--sockets', '2', '--events', '3'],
+        'load': ['--listeners', '2', '--writers', '2', '--mutations', '10', '--size', '10'],
+        'mutations': ['--requests', '10', '--clients', '1', '--size', '5'],
+        'playback': ['--rooms', '10', '--window', '1'],
+        'positions': ['--inserts', '100', '--size', '20'],
+        'ranking': ['--items', '50', '--votes', '50'],
+        'rest': ['--requests', '10', '--concurrency', '2', '--size', '5'],
+        'rooms': ['--rooms', '1,2', '--sockets', '2', '--events', '2'],
+        'search': ['--sizes', '200', '--queries', '5'],
+        'serialize': ['--sizes', '20', '--repeat', '2'],
+        'votes': ['--requests', '10', '--concurrency', '2', '--size', '5', '--windows', '0,5'],
+        'wire': ['--size', '10', '--events', '8', '--repeat', '1'],
+        'writes': ['--requests', '20', '--processes', '2'],
+    }
+
+    def test_every_benchmark_runs(self):
+        """Test each benchmark completes and reports rows"""
+        self.assertEqual(set(self.options), set(BENCHMARKS))
+        manage = os.path.join(settings.BASE_DIR, 'manage.py')
+        for name, options in self.options.items():
+            with self.subTest(benchmark=name):
+                # A process of its own, as benchmarks create their own database
+                result = subprocess.run(
+                    [sys.executable, manage, 'benchmark', name, '--json', *options],
+                    capture_output=True, text=True, timeout=300,
+                )
+                self.assertEqual(result.returncode, 0, result.stderr)
+                self.assertTrue(json.loads(result.stdout))
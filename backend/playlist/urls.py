@@ -1,11 +1,25 @@
-from django.urls import path
+from django.urls import include, path, re_path
 from . import views
+from .utils import ROOM_ID_PATTERN
 
-urlpatterns = [
-    path('tracks', views.tracks_list, name='tracks-list'),
+# Playlist routes, served for the default room at /api/playlist and for any
+# other room at /api/rooms/<room>/playlist
+playlist_patterns = [
     path('playlist', views.playlist_list, name='playlist-list'),
+    path('playlist/mode', views.playlist_mode, name='playlist-mode'),
+    path('playlist/batch', views.playlist_batch, name='playlist-batch'),
     path('playlist/<str:playlist_id>', views.playlist_update, name='playlist-update'),
     path('playlist/<str:playlist_id>/vote', views.playlist_vote, name='playlist-vote'),
     path('playlist/<str:playlist_id>/reorder', views.playlist_reorder, name='playlist-reorder'),
 ]
 
+urlpatterns = [
+    path('tracks', views.tracks_list, name='tracks-list'),
+    path('tracks/search', views.tracks_search, name='tracks-search'),
+    path('cache/stats', views.cache_stats_view, name='cache-stats'),
+    path('sockets/stats', views.socket_stats_view, name='socket-stats'),
+    path('metrics', views.metrics_view, name='metrics'),
+    path('metrics/prometheus', views.prometheus_metrics_view, name='metrics-prometheus'),
+    *playlist_patterns,
+    re_path(rf'^rooms/(?P<room>{ROOM_ID_PATTERN})/', include((playlist_patterns, 'room'))),
+]
@@ -2,6 +2,9 @@
 Utility functions for playlist operations
 """
 
+# Playlist room IDs as matched in URLs; short enough for a channel group name
+ROOM_ID_PATTERN = r'[-a-zA-Z0-9_]{1,64}'
+
 
 def calculate_position(prev_position=None, next_position=None):
     """
@@ -30,27 +33,90 @@ def calculate_position(prev_position=None, next_position=None):
     return (prev_position + next_position) / 2
 
 
-def get_playlist_bounds(index, playlist_items):
+# Smallest gap, relative to the magnitude of the positions, that still leaves
+# room for a distinct midpoint. Doubles resolve about 2.2e-16 relative to
+# their magnitude, so this keeps 12 halvings of margin before neighbouring
+# positions can collide.
+POSITION_EPSILON = 1e-12
+
+# Halvings a renumbered window must allow before another rebalance is
+# needed: its gaps must be at least POSITION_EPSILON * 2**REBALANCE_HEADROOM
+# relative to the positions. Spacing of 1.0 meets that up to ~950,000.
+REBALANCE_HEADROOM = 20
+
+
+def gap_is_safe(prev_position, next_position, min_gap=POSITION_EPSILON):
     """
-    Get the previous and next positions for inserting at a specific index.
-    
+    Check whether a track can still be inserted between two positions.
+
     Args:
-        index: The index where to insert
-        playlist_items: QuerySet or list of PlaylistTrack items ordered by position
-    
+        prev_position: Position of the track before (None at the start)
+        next_position: Position of the track after (None at the end)
+        min_gap: Minimum gap relative to the magnitude of the positions
+
     Returns:
-        tuple: (prev_position, next_position) - either can be None
+        bool: True if the midpoint is safely distinct from both neighbours
     """
-    prev_position = None
-    next_position = None
-    
-    if index > 0:
-        prev_item = playlist_items[index - 1]
-        prev_position = prev_item.position
-    
-    if index < len(playlist_items):
-        next_item = playlist_items[index]
-        next_position = next_item.position
-    
-    return prev_position, next_position
+    if prev_position is None or next_position is None:
+        return True
+    scale = max(1.0, abs(prev_position), abs(next_position))
+    return next_position - prev_position > min_gap * scale
+
+
+def spread_positions(count, lower=None, upper=None):
+    """
+    Evenly space positions for a window of tracks.
 
+    Args:
+        count: Number of positions needed
+        lower: Position of the track bounding the window below (None if the
+            window starts the playlist)
+        upper: Position of the track bounding the window above (None if the
+            window ends the playlist)
+
+    Returns:
+        list: `count` ascending positions strictly between lower and upper
+    """
+    if lower is None and upper is None:
+        return [float(i + 1) for i in range(count)]
+    if lower is None:
+        return [upper - (count - i) for i in range(count)]
+    if upper is None:
+        return [lower + (i + 1) for i in range(count)]
+    step = (upper - lower) / (count + 1)
+    return [lower + step * (i + 1) for i in range(count)]
+
+
+def plan_rebalance(fetch_window):
+    """
+    Find the smallest window around an insertion point that can be
+    renumbered to restore safe gaps, and compute its new positions.
+
+    The window starts with the two neighbours of the insertion point and
+    doubles on each side until the evenly spread positions leave
+    REBALANCE_HEADROOM halvings of room, or it reaches an end of the
+    playlist (where spacing of 1.0 is always available).
+
+    Args:
+        fetch_window: Callable taking `k` and returning
+            (before, after, lower, upper): up to `k` items on each side of
+            the insertion point in playlist order, plus the positions of the
+            items bounding the window (None where the window reaches an end)
+
+    Returns:
+        tuple: (before, after, before_positions, insert_position,
+        after_positions) - the window items and their new positions
+    """
+    k = 1
+    while True:
+        before, after, lower, upper = fetch_window(k)
+        positions = spread_positions(len(before) + len(after) + 1, lower, upper)
+        bounded = [lower] + positions + [upper]
+        safe = all(
+            gap_is_safe(a, b, POSITION_EPSILON * 2 ** REBALANCE_HEADROOM)
+            for a, b in zip(bounded, bounded[1:])
+        )
+        if safe or lower is None or upper is None:
+            split = len(before)
+            return before, after, positions[:split], positions[split], positions[split + 1:]
+        k *= 2
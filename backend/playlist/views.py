@@ -1,226 +1,180 @@
+from django.http import HttpResponse
 from rest_framework import status
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
-from django.shortcuts import get_object_or_404
-from django.db import transaction
-from django.utils import timezone
-import uuid
 
-from .models import Track, PlaylistTrack
-from .serializers import TrackSerializer, PlaylistTrackSerializer
-from .utils import calculate_position, get_playlist_bounds
-from asgiref.sync import async_to_sync
-from channels.layers import get_channel_layer
+from . import services
+from .caching import cache_stats, cached_playlist, cached_tracks
+from .events import broadcast_events
+from .metrics import metrics, prometheus_metrics, timed_service
+from .models import Playlist
+from .outbox import outbox_stats
+from .services import PlaylistError
+
+
+def run_service(service, *args):
+    """Call a playlist service, timing it in the db_seconds histogram"""
+    with timed_service(service.__name__):
+        return service(*args)
+
+
+def error_response(error):
+    """Response for a rejected playlist operation"""
+    return Response(error.as_data(), status=error.status)
+
+
+def cached_response(data, headers):
+    """Response for a cached GET, empty if the client's copy is current"""
+    if data is None:
+        return Response(status=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(data, headers=headers)
 
 
 @api_view(['GET'])
 def tracks_list(request):
-    """GET /api/tracks - Get all available tracks in library"""
-    tracks = Track.objects.all()
-    serializer = TrackSerializer(tracks, many=True)
-    return Response(serializer.data)
+    """GET /api/tracks - Get one page of the track library, optionally filtered"""
+    try:
+        tracks, headers = run_service(
+            cached_tracks, request.query_params, request.headers.get('If-None-Match')
+        )
+    except PlaylistError as error:
+        return error_response(error)
+    return cached_response(tracks, headers)
+
+
+@api_view(['GET'])
+def tracks_search(request):
+    """GET /api/tracks/search - Ranked prefix search of the track library"""
+    try:
+        tracks = run_service(
+            services.search_tracks,
+            request.query_params.get('q', '').strip(),
+            request.query_params.get('limit', services.SEARCH_LIMIT)
+        )
+    except PlaylistError as error:
+        return error_response(error)
+    return Response(tracks)
 
 
 @api_view(['GET', 'POST'])
-def playlist_list(request):
+def playlist_list(request, room=Playlist.DEFAULT_ID):
     """GET /api/playlist - Get current playlist ordered by position
        POST /api/playlist - Add track to playlist"""
     if request.method == 'GET':
-        playlist_items = PlaylistTrack.objects.select_related('track').order_by('position')
-        serializer = PlaylistTrackSerializer(playlist_items, many=True)
-        return Response(serializer.data)
-    
-    # POST method - Add track to playlist
-    track_id = request.data.get('track_id')
-    added_by = request.data.get('added_by', 'Anonymous')
+        return cached_response(*run_service(cached_playlist, request.headers.get('If-None-Match'), room))
 
-    if not track_id:
-        return Response(
-            {'error': {'code': 'MISSING_TRACK_ID', 'message': 'track_id is required'}},
-            status=status.HTTP_400_BAD_REQUEST
+    # POST method - Add track to playlist
+    try:
+        data, events = run_service(
+            services.add_track,
+            request.data.get('track_id'),
+            request.data.get('added_by', 'Anonymous'),
+            room
         )
+    except PlaylistError as error:
+        return error_response(error)
 
-    # Check if track exists
-    track = get_object_or_404(Track, id=track_id)
+    # Broadcast to WebSocket clients
+    broadcast_events(events)
 
-    # Check if track is already in playlist
-    if PlaylistTrack.objects.filter(track_id=track_id).exists():
-        return Response(
-            {'error': {'code': 'DUPLICATE_TRACK', 'message': 'This track is already in the playlist', 'details': {'track_id': track_id}}},
-            status=status.HTTP_400_BAD_REQUEST
-        )
+    return Response(data, status=status.HTTP_201_CREATED)
 
-    # Get all playlist items ordered by position
-    playlist_items = list(PlaylistTrack.objects.all().order_by('position'))
-    
-    # Calculate position (append to end)
-    prev_position = playlist_items[-1].position if playlist_items else None
-    next_position = None
-    position = calculate_position(prev_position, next_position)
-
-    # Create playlist item
-    playlist_item = PlaylistTrack.objects.create(
-        id=f'playlist-item-{uuid.uuid4().hex[:12]}',
-        track=track,
-        position=position,
-        added_by=added_by,
-        votes=0,
-        is_playing=False
-    )
-
-    serializer = PlaylistTrackSerializer(playlist_item)
-    
-    # Broadcast to WebSocket clients
-    channel_layer = get_channel_layer()
-    if channel_layer:
-        async_to_sync(channel_layer.group_send)(
-            'playlist',
-            {
-                'type': 'track_added',
-                'item': serializer.data
-            }
-        )
 
-    return Response(serializer.data, status=status.HTTP_201_CREATED)
+@api_view(['GET', 'PUT'])
+def playlist_mode(request, room=Playlist.DEFAULT_ID):
+    """GET /api/playlist/mode - Get the queue mode (position or votes)
+       PUT /api/playlist/mode - Switch the queue mode"""
+    if request.method == 'GET':
+        return Response(services.get_queue_mode(room))
+
+    try:
+        data, events = run_service(services.set_queue_mode, request.data.get('mode'), room)
+    except PlaylistError as error:
+        return error_response(error)
+
+    broadcast_events(events)
+    return Response(data)
+
+
+@api_view(['POST'])
+def playlist_batch(request, room=Playlist.DEFAULT_ID):
+    """POST /api/playlist/batch - Apply several operations in one transaction"""
+    try:
+        data, events = run_service(services.apply_batch, request.data.get('operations'), room)
+    except PlaylistError as error:
+        return error_response(error)
+
+    # One event for the whole batch
+    broadcast_events(events)
+    return Response(data)
 
 
 @api_view(['PATCH', 'DELETE'])
-def playlist_update(request, playlist_id):
+def playlist_update(request, playlist_id, room=Playlist.DEFAULT_ID):
     """PATCH /api/playlist/{id} - Update position or playing status
        DELETE /api/playlist/{id} - Remove track from playlist"""
     if request.method == 'DELETE':
-        playlist_item = get_object_or_404(PlaylistTrack, id=playlist_id)
-        playlist_item.delete()
-        
-        # Broadcast removal event
-        channel_layer = get_channel_layer()
-        if channel_layer:
-            async_to_sync(channel_layer.group_send)(
-                'playlist',
-                {
-                    'type': 'track_removed',
-                    'id': playlist_id
-                }
-            )
-        
+        broadcast_events(run_service(services.remove_track, playlist_id, room))
         return Response(status=status.HTTP_204_NO_CONTENT)
-    
+
     # PATCH method
-    playlist_item = get_object_or_404(PlaylistTrack, id=playlist_id)
-    
-    # Update position if provided
-    if 'position' in request.data:
-        new_position = request.data['position']
-        playlist_item.position = new_position
-        playlist_item.save()
-        
-        # Broadcast move event
-        channel_layer = get_channel_layer()
-        if channel_layer:
-            async_to_sync(channel_layer.group_send)(
-                'playlist',
-                {
-                    'type': 'track_moved',
-                    'item': {
-                        'id': playlist_item.id,
-                        'position': playlist_item.position
-                    }
-                }
-            )
-    
-    # Update playing status if provided
-    if 'is_playing' in request.data:
-        is_playing = request.data['is_playing']
-        playlist_item.is_playing = is_playing
-        playlist_item.save()
-        
-        # Broadcast playing event
-        channel_layer = get_channel_layer()
-        if channel_layer:
-            async_to_sync(channel_layer.group_send)(
-                'playlist',
-                {
-                    'type': 'track_playing',
-                    'id': playlist_item.id
-                }
-            )
-    
-    serializer = PlaylistTrackSerializer(playlist_item)
-    return Response(serializer.data)
+    try:
+        data, events = run_service(services.update_track, playlist_id, request.data, room)
+    except PlaylistError as error:
+        return error_response(error)
+    broadcast_events(events)
+    return Response(data)
 
 
 @api_view(['POST'])
-def playlist_vote(request, playlist_id):
+def playlist_vote(request, playlist_id, room=Playlist.DEFAULT_ID):
     """POST /api/playlist/{id}/vote - Vote on a track"""
-    playlist_item = get_object_or_404(PlaylistTrack, id=playlist_id)
-    direction = request.data.get('direction', 'up')
-    
-    if direction == 'up':
-        playlist_item.votes += 1
-    elif direction == 'down':
-        playlist_item.votes -= 1
-    else:
-        return Response(
-            {'error': {'code': 'INVALID_DIRECTION', 'message': 'direction must be "up" or "down"'}},
-            status=status.HTTP_400_BAD_REQUEST
+    try:
+        data, events = run_service(
+            services.vote_track, playlist_id, request.data.get('direction', 'up'), room
         )
-    
-    playlist_item.save()
-    
-    # Broadcast vote event
-    channel_layer = get_channel_layer()
-    if channel_layer:
-        async_to_sync(channel_layer.group_send)(
-            'playlist',
-            {
-                'type': 'track_voted',
-                'item': {
-                    'id': playlist_item.id,
-                    'votes': playlist_item.votes
-                }
-            }
-        )
-    
-    serializer = PlaylistTrackSerializer(playlist_item)
-    return Response(serializer.data)
+    except PlaylistError as error:
+        return error_response(error)
+
+    broadcast_events(events)
+    return Response(data)
 
 
 @api_view(['POST'])
-def playlist_reorder(request, playlist_id):
+def playlist_reorder(request, playlist_id, room=Playlist.DEFAULT_ID):
     """POST /api/playlist/{id}/reorder - Reorder track to a new position"""
-    playlist_item = get_object_or_404(PlaylistTrack, id=playlist_id)
-    target_index = request.data.get('target_index')
-    
-    if target_index is None:
-        return Response(
-            {'error': {'code': 'MISSING_TARGET_INDEX', 'message': 'target_index is required'}},
-            status=status.HTTP_400_BAD_REQUEST
-        )
-    
-    # Get all playlist items ordered by position
-    playlist_items = list(PlaylistTrack.objects.exclude(id=playlist_id).order_by('position'))
-    
-    # Calculate new position
-    prev_position, next_position = get_playlist_bounds(target_index, playlist_items)
-    new_position = calculate_position(prev_position, next_position)
-    
-    playlist_item.position = new_position
-    playlist_item.save()
-    
-    # Get updated full playlist
-    updated_items = PlaylistTrack.objects.select_related('track').order_by('position')
-    serializer = PlaylistTrackSerializer(updated_items, many=True)
-    
-    # Broadcast full reorder event
-    channel_layer = get_channel_layer()
-    if channel_layer:
-        async_to_sync(channel_layer.group_send)(
-            'playlist',
-            {
-                'type': 'playlist_reordered',
-                'items': serializer.data
-            }
+    try:
+        data, events = run_service(
+            services.reorder_track, playlist_id, request.data.get('target_index'), room
         )
-    
-    return Response(serializer.data)
+    except PlaylistError as error:
+        return error_response(error)
+
+    # Clients get only the moved item; they resync explicitly if they
+    # detect a version gap
+    broadcast_events(events)
+    return Response(data)
+
 
+@api_view(['GET'])
+def cache_stats_view(request):
+    """GET /api/cache/stats - Response cache hit rates for this process"""
+    return Response(cache_stats())
+
+
+@api_view(['GET'])
+def socket_stats_view(request):
+    """GET /api/sockets/stats - WebSocket outbound queues of this process"""
+    return Response(outbox_stats())
+
+
+@api_view(['GET'])
+def metrics_view(request):
+    """GET /api/metrics - Realtime pipeline latency histograms of this process"""
+    return Response(metrics())
+
+
+@api_view(['GET'])
+def prometheus_metrics_view(request):
+    """GET /api/metrics/prometheus - The same in the Prometheus text format"""
+    return HttpResponse(prometheus_metrics(), content_type='text/plain; version=0.0.4')
@@ -0,0 +1,116 @@
+"""
+Vote coalescing for the async request path.
+
+During a voting burst every click would otherwise be its own write
+transaction and its own track.voted broadcast. The buffer collects the
+votes that arrive within PLAYLIST_VOTE_COALESCE_WINDOW_MS, folds them into
+net per-item deltas, applies them with one UPDATE per playlist room and
+broadcasts one track.voted event per room listing every changed item. Each request waits for the
+flush that contains its vote and gets the item's resulting state.
+"""
+
+import asyncio
+import weakref
+
+from channels.db import database_sync_to_async
+from django.conf import settings
+from django.http import Http404
+
+from . import services
+from .events import abroadcast_events
+
+
+class VoteBuffer:
+    """Folds the votes arriving within one window into a single write"""
+
+    def __init__(self, window):
+        self.window = window
+        self.deltas = {}
+        self.waiters = {}
+        self.flush_task = None
+
+    async def add(self, playlist_id, delta, room):
+        """
+        Queue a vote in a room and wait for the flush that applies it.
+
+        Returns:
+            dict: Serialized playlist item after the flush
+
+        Raises:
+            Http404: If the item does not exist
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        deltas = self.deltas.setdefault(room, {})
+        deltas[playlist_id] = deltas.get(playlist_id, 0) + delta
+        self.waiters.setdefault((room, playlist_id), []).append(future)
+
+        if self.flush_task is None:
+            self.flush_task = loop.create_task(self.flush_later())
+        return await future
+
+    async def flush_later(self):
+        """Wait out the window, then apply everything collected in it"""
+        await asyncio.sleep(self.window)
+        deltas, waiters = self.deltas, self.waiters
+        self.deltas, self.waiters, self.flush_task = {}, {}, None
+
+        try:
+            items, events = await database_sync_to_async(apply_room_votes)(deltas)
+        except Exception as error:
+            for futures in waiters.values():
+                for future in futures:
+                    # A cancelled request (client gone) no longer waits
+                    if not future.done():
+                        future.set_exception(error)
+            return
+
+        await abroadcast_events(events)
+        for key, futures in waiters.items():
+            for future in futures:
+                if future.done():
+                    continue
+                if key in items:
+                    future.set_result(items[key])
+                else:
+                    future.set_exception(Http404('No PlaylistTrack matches the given query.'))
+
+
+def apply_room_votes(deltas):
+    """
+    Apply a window of votes room by room in one database hop.
+
+    Args:
+        deltas: Dict mapping room ID to a dict of net vote changes by item ID
+
+    Returns:
+        tuple: (dict of item data by (room, item ID), events to broadcast)
+    """
+    items, events = {}, []
+    for room, room_deltas in deltas.items():
+        room_items, room_events = services.apply_votes(room_deltas, room)
+        items.update(((room, playlist_id), data) for playlist_id, data in room_items.items())
+        events.extend(room_events)
+    return items, events
+
+
+# One buffer per event loop, since its futures belong to that loop
+_buffers = weakref.WeakKeyDictionary()
+
+
+def get_vote_buffer():
+    """
+    Get the vote buffer for the running event loop.
+
+    Returns:
+        VoteBuffer: The buffer, or None if coalescing is disabled
+    """
+    window_ms = settings.PLAYLIST_VOTE_COALESCE_WINDOW_MS
+    if not window_ms:
+        return None
+
+    loop = asyncio.get_running_loop()
+    buffer = _buffers.get(loop)
+    if buffer is None or buffer.window != window_ms / 1000:
+        buffer = _buffers[loop] = VoteBuffer(window_ms / 1000)
+    return buffer
@@ -0,0 +1,156 @@
+"""
+Wire encodings of the playlist WebSocket, negotiated as a subprotocol.
+
+Events are encoded as JSON once per broadcast (consumers.encode_event) and
+stored in the event log that way. A client may instead ask for a smaller
+encoding by offering one of these subprotocols when it connects:
+
+- playlist.json: the JSON frames as broadcast (also used when the client
+  offers no subprotocol)
+- playlist.compact: JSON text with short keys and event type codes
+  (COMPACT_KEYS, COMPACT_TYPES)
+- playlist.msgpack: binary MessagePack frames with the usual keys
+
+A broadcast frame is converted at most once per encoding in each process
+(convert_event), not once per socket. Clients may send their messages as
+JSON text in every encoding, and msgpack clients as binary frames too.
+"""
+
+import json
+from functools import lru_cache
+
+import msgpack
+
+
+SUBPROTOCOLS = {
+    'playlist.json': 'json',
+    'playlist.compact': 'compact',
+    'playlist.msgpack': 'msgpack',
+}
+
+# Keys of the compact encoding; keys not listed (id, ts, ok, op, index,
+# detail) are sent as they are
+COMPACT_KEYS = {
+    'type': 't',
+    'version': 'v',
+    'item': 'i',
+    'items': 'l',
+    'position': 'p',
+    'votes': 'n',
+    'rank': 'r',
+    'track': 'k',
+    'track_id': 'K',
+    'title': 'a',
+    'artist': 'b',
+    'album': 'c',
+    'duration_seconds': 'd',
+    'genre': 'g',
+    'cover_url': 'u',
+    'added_by': 'w',
+    'added_at': 'x',
+    'is_playing': 'y',
+    'played_at': 'z',
+    'server_time': 's',
+    'mode': 'm',
+    'order': 'o',
+    'operations': 'O',
+    'request_id': 'q',
+    'data': 'D',
+    'trace': 'T',
+    'status': 'S',
+    'error': 'e',
+    'code': 'C',
+    'message': 'M',
+    'details': 'E',
+    'results': 'R',
+}
+EXPANDED_KEYS = {short: key for key, short in COMPACT_KEYS.items()}
+
+# Values of `type` in the compact encoding
+COMPACT_TYPES = {
+    'track.added': 'ta',
+    'track.removed': 'tr',
+    'track.moved': 'tm',
+    'track.voted': 'tv',
+    'track.playing': 'tp',
+    'playlist.rebalanced': 'pr',
+    'playlist.mode': 'pm',
+    'playlist.batch': 'pb',
+    'playlist.snapshot': 'ps',
+    'ack': 'k',
+    'ping': 'pi',
+    'pong': 'po',
+}
+EXPANDED_TYPES = {short: event_type for event_type, short in COMPACT_TYPES.items()}
+
+
+def negotiate(subprotocols):
+    """
+    Pick the first encoding the client offered that the server supports.
+
+    Returns:
+        tuple: (subprotocol to accept or None, encoding name)
+    """
+    for subprotocol in subprotocols or ():
+        if subprotocol in SUBPROTOCOLS:
+            return subprotocol, SUBPROTOCOLS[subprotocol]
+    return None, 'json'
+
+
+def rename(value, keys, types, type_key):
+    """Rename the keys of every dict in a message, and the values of its `type_key`"""
+    if isinstance(value, dict):
+        return {
+            keys.get(key, key): types.get(item, item) if key == type_key else rename(item, keys, types, type_key)
+            for key, item in value.items()
+        }
+    if isinstance(value, list):
+        return [rename(item, keys, types, type_key) for item in value]
+    return value
+
+
+def compact(message):
+    """A message with the short keys and type codes of the compact encoding"""
+    return rename(message, COMPACT_KEYS, COMPACT_TYPES, 'type')
+
+
+def expand(message):
+    """Inverse of compact()"""
+    return rename(message, EXPANDED_KEYS, EXPANDED_TYPES, COMPACT_KEYS['type'])
+
+
+def convert(frame, encoding):
+    """
+    Re-encode a JSON frame for a client.
+
+    Returns:
+        str or bytes: A text frame, or a binary frame for msgpack
+    """
+    if encoding == 'json':
+        return frame
+    message = json.loads(frame)
+    if encoding == 'msgpack':
+        return msgpack.packb(message)
+    return json.dumps(compact(message), separators=(',', ':'), ensure_ascii=False)
+
+
+@lru_cache(maxsize=256)
+def convert_event(frame, encoding):
+    """
+    convert() for broadcast frames, which every socket of a room receives;
+    the recent ones are kept so each is converted once per process.
+    """
+    return convert(frame, encoding)
+
+
+def decode_message(text_data=None, bytes_data=None):
+    """
+    A client message from a text (JSON) or binary (MessagePack) frame.
+
+    Raises:
+        ValueError: If the frame cannot be decoded
+    """
+    if text_data is not None:
+        return json.loads(text_data)
+    # msgpack's decoding errors are ValueErrors too
+    return msgpack.unpackb(bytes_data)
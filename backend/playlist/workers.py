@@ -0,0 +1,128 @@
+"""
+Supervisor for running several ASGI worker processes on one port.
+
+The supervisor binds the listening socket once and starts N Daphne workers
+(playlist.server, Daphne with WebSocket backpressure) that all accept from
+it (--fd), so the kernel spreads HTTP and WebSocket connections over the
+workers and every core can serve sockets.
+Broadcasts reach sockets on other workers through the channel layer, which
+therefore has to be a Redis layer. Workers that exit are restarted; SIGINT
+or SIGTERM stops them all.
+"""
+
+import signal
+import socket
+import subprocess
+import sys
+import time
+
+from django.conf import settings
+
+
+DEFAULT_APPLICATION = 'playlist_project.asgi:application'
+
+# A worker that exits sooner than this after starting is restarted only
+# after the same delay, so a crashing worker cannot spin the supervisor
+RESTART_DELAY = 1.0
+
+STOP_TIMEOUT = 10.0
+
+
+def layer_is_shared():
+    """Whether the default channel layer reaches other processes"""
+    backend = settings.CHANNEL_LAYERS.get('default', {}).get('BACKEND', '')
+    return not backend.endswith('InMemoryChannelLayer')
+
+
+def listen(host, port, backlog=1024):
+    """Bind the listening socket that every worker inherits"""
+    family = socket.AF_INET6 if ':' in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+class WorkerSupervisor:
+    """Starts, restarts and stops a fixed number of Daphne workers"""
+
+    def __init__(self, workers, host='0.0.0.0', port=4000, application=DEFAULT_APPLICATION,
+                 daphne_args=(), deflate=False, log=print):
+        self.workers = workers
+        self.deflate = deflate
+        self.host = host
+        self.port = port
+        self.application = application
+        self.daphne_args = list(daphne_args)
+        self.log = log
+        self.sock = None
+        self.processes = {}
+        self.started = {}
+        self.stopping = False
+
+    def command(self):
+        """Command line of one worker"""
+        return [
+            sys.executable, '-m', 'playlist.server',
+            '--fd', str(self.sock.fileno()),
+            *(['--deflate'] if self.deflate else []),
+            *self.daphne_args,
+            self.application,
+        ]
+
+    def spawn(self, slot):
+        process = subprocess.Popen(self.command(), pass_fds=[self.sock.fileno()])
+        self.processes[slot] = process
+        self.started[slot] = time.monotonic()
+        self.log(f'worker {slot} started (pid {process.pid})')
+
+    def stop(self, *args):
+        """Signal handler: stop restarting workers and shut them down"""
+        self.stopping = True
+
+    def run(self, poll_interval=0.5):
+        """Serve until SIGINT or SIGTERM; returns once every worker exited"""
+        self.sock = listen(self.host, self.port)
+        self.log(f'listening on {self.host}:{self.port} with {self.workers} workers')
+        previous = {
+            signum: signal.signal(signum, self.stop)
+            for signum in (signal.SIGINT, signal.SIGTERM)
+        }
+        try:
+            for slot in range(self.workers):
+                self.spawn(slot)
+            while not self.stopping:
+                time.sleep(poll_interval)
+                self.restart_exited()
+        finally:
+            self.shutdown()
+            for signum, handler in previous.items():
+                signal.signal(signum, handler)
+            self.sock.close()
+
+    def restart_exited(self):
+        now = time.monotonic()
+        for slot, process in list(self.processes.items()):
+            code = process.poll()
+            if code is None or self.stopping:
+                continue
+            if now - self.started[slot] < RESTART_DELAY:
+                # Crashed right after starting; try again once the delay is up
+                continue
+            self.log(f'worker {slot} (pid {process.pid}) exited with {code}, restarting')
+            self.spawn(slot)
+
+    def shutdown(self):
+        for process in self.processes.values():
+            if process.poll() is None:
+                process.terminate()
+        deadline = time.monotonic() + STOP_TIMEOUT
+        for process in self.processes.values():
+            try:
+                process.wait(max(0.0, deadline - time.monotonic()))
+            except subprocess.TimeoutExpired:
+                process.kill()
+                process.wait()
+        self.log('all workers stopped')
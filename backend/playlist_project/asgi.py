@@ -20,7 +20,9 @@ os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'playlist_project.settings')
 # is populated before importing code that may import ORM models.
 django_asgi_app = get_asgi_application()
 
-application = ProtocolTypeRouter({
+from playlist.playback import PlaybackSchedulerMiddleware  # noqa: E402
+
+application = PlaybackSchedulerMiddleware(ProtocolTypeRouter({
     "http": django_asgi_app,
     "websocket": AllowedHostsOriginValidator(
         AuthMiddlewareStack(
@@ -29,5 +31,5 @@ application = ProtocolTypeRouter({
             )
         )
     ),
-})
+}))
 
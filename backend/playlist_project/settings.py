@@ -4,6 +4,7 @@ Django settings for playlist_project project.
 
 from pathlib import Path
 import os
+from corsheaders.defaults import default_headers
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -48,6 +49,8 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'playlist.metrics.TraceMiddleware',
+    'playlist.budgets.BudgetMiddleware',
 ]
 
 ROOT_URLCONF = 'playlist_project.urls'
@@ -79,9 +82,27 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # Close connections after each request, as Django advises under ASGI:
+        # a request may run its queries on any thread, and a persistent
+        # connection is kept per thread and never closed. Reuse (a number of
+        # seconds) only pays off under WSGI, where threads are long-lived
+        'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', '0')),
+        'CONN_HEALTH_CHECKS': True,
     }
 }
 
+# PRAGMAs applied to every new SQLite connection (playlist.database). WAL
+# lets reads proceed while a write commits, and with synchronous=NORMAL a
+# commit no longer waits for an fsync. busy_timeout makes a writer wait for
+# the lock instead of failing with "database is locked".
+SQLITE_PRAGMAS = {
+    'journal_mode': 'wal',
+    'synchronous': 'normal',
+    'busy_timeout': int(os.getenv('SQLITE_BUSY_TIMEOUT_MS', '5000')),
+    'cache_size': -32000,  # in KiB: 32 MB of page cache per connection
+    'mmap_size': 268435456,  # 256 MB
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
@@ -144,19 +165,75 @@ CORS_ALLOWED_ORIGINS = [
 
 CORS_ALLOW_CREDENTIALS = True
 
-# Channels configuration
+# Request headers beyond the defaults: X-Trace-Id stamps a mutation's
+# events with a client trace ID (playlist.metrics)
+CORS_ALLOW_HEADERS = (*default_headers, 'x-trace-id')
+
+# Response headers the frontend reads (pagination and cache validation)
+CORS_EXPOSE_HEADERS = ['ETag', 'X-Next-Cursor', 'X-Playlist-Version']
+
+# Serve the REST API from the native async views (playlist.async_views).
+# Recommended when running under an ASGI server such as Daphne.
+PLAYLIST_ASYNC_VIEWS = os.getenv('PLAYLIST_ASYNC_VIEWS', 'False') == 'True'
+
+# Window (in milliseconds) over which the async views fold concurrent votes
+# into one UPDATE and one track.voted broadcast. 0 applies each vote as it
+# arrives.
+PLAYLIST_VOTE_COALESCE_WINDOW_MS = int(os.getenv('PLAYLIST_VOTE_COALESCE_WINDOW_MS', '0'))
+
+# Number of recent playlist events kept for replay on WebSocket reconnect.
+# Clients further behind than this receive a full snapshot instead.
+PLAYLIST_EVENT_LOG_SIZE = int(os.getenv('PLAYLIST_EVENT_LOG_SIZE', '1000'))
+
+# Seconds a cached GET /api/playlist or /api/tracks response is kept. Entries
+# are keyed by version, so this only bounds how long superseded ones linger.
+PLAYLIST_RESPONSE_CACHE_TIMEOUT = int(os.getenv('PLAYLIST_RESPONSE_CACHE_TIMEOUT', '300'))
+
+# Advance each room to its next track when the playing one finishes, from a
+# scheduler in every ASGI process (playlist.playback). Deadlines are checked
+# every PLAYLIST_PLAYBACK_TICK_MS.
+PLAYLIST_PLAYBACK_SCHEDULER = os.getenv('PLAYLIST_PLAYBACK_SCHEDULER', 'True') == 'True'
+PLAYLIST_PLAYBACK_TICK_MS = int(os.getenv('PLAYLIST_PLAYBACK_TICK_MS', '250'))
+
+# What plays next: 'position' (the next item down the list) or 'votes' (the
+# highest voted item not played yet)
+PLAYLIST_ADVANCE_BY = os.getenv('PLAYLIST_ADVANCE_BY', 'position')
+
+# Check every REST request against its endpoint's query and serialization
+# budget (playlist.budgets) and log the ones that go over
+PLAYLIST_BUDGET_CHECKS = os.getenv('PLAYLIST_BUDGET_CHECKS', 'False') == 'True'
+
+# Frames queued per WebSocket connection before its pending events are
+# dropped for one snapshot, and seconds a connection may take to accept a
+# single frame before it is disconnected as stalled
+PLAYLIST_SOCKET_QUEUE_SIZE = int(os.getenv('PLAYLIST_SOCKET_QUEUE_SIZE', '256'))
+PLAYLIST_SOCKET_STALL_TIMEOUT = float(os.getenv('PLAYLIST_SOCKET_STALL_TIMEOUT', '30'))
+
+# Response cache (per process). Point this at a shared backend such as Redis
+# to share cached responses between server processes.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+}
+
+# Channels configuration. The in-memory layer only reaches sockets in the
+# same process, so running several ASGI workers (manage.py runworkers) needs
+# a Redis layer: channels_redis.pubsub.RedisPubSubChannelLayer (recommended;
+# broadcasts go straight out over Redis pub/sub) or
+# channels_redis.core.RedisChannelLayer.
+CHANNEL_LAYERS_BACKEND = os.getenv('CHANNEL_LAYERS_BACKEND', 'channels.layers.InMemoryChannelLayer')
+
 CHANNEL_LAYERS = {
     'default': {
-        'BACKEND': 'channels.layers.InMemoryChannelLayer',
+        'BACKEND': CHANNEL_LAYERS_BACKEND,
     },
 }
 
-# For production, use Redis:
-# CHANNEL_LAYERS = {
-#     'default': {
-#         'BACKEND': 'channels_redis.core.RedisChannelLayer',
-#         'CONFIG': {
-#             "hosts": [('127.0.0.1', 6379)],
-#         },
-#     },
-# }
+if CHANNEL_LAYERS_BACKEND.startswith('channels_redis.'):
+    CHANNEL_LAYERS['default']['CONFIG'] = {
+        'hosts': [os.getenv(
+            'REDIS_URL',
+            f"redis://{os.getenv('REDIS_HOST', '127.0.0.1')}:{os.getenv('REDIS_PORT', '6379')}/0"
+        )],
+    }
@@ -1,11 +1,15 @@
 """
 URL configuration for playlist_project project.
 """
+from django.conf import settings
 from django.contrib import admin
 from django.urls import path, include
 
+# Serve the API from the async views when running under ASGI
+api_urls = 'playlist.async_urls' if settings.PLAYLIST_ASYNC_VIEWS else 'playlist.urls'
+
 urlpatterns = [
     path('admin/', admin.site.urls),
-    path('api/', include('playlist.urls')),
+    path('api/', include(api_urls)),
 ]
 
@@ -1,14 +1,15 @@
 "use client"
 
-import { useState, useEffect, useCallback } from "react"
+import { useState, useEffect, useCallback, useRef } from "react"
 import Sidebar from "@/components/sidebar"
 import PlaylistPanel from "@/components/playlist-panel"
 import TrackLibraryPanel from "@/components/track-library-panel"
 import NowPlayingBar from "@/components/now-playing-bar"
 import ConnectionStatus from "@/components/connection-status"
-import { api, type Track, type PlaylistTrack } from "@/lib/api"
-import { useWebSocket, type WebSocketEvent } from "@/hooks/use-websocket"
+import { api, type Track, type PlaylistTrack, type QueueMode, type TrackQuery } from "@/lib/api"
+import { useWebSocket, type SocketCommand, type WebSocketEvent } from "@/hooks/use-websocket"
 import { calculatePosition, getPlaylistBounds } from "@/lib/position-utils"
+import { applyBatch, placeAtRanks, sortQueue } from "@/lib/queue-utils"
 
 // Transform API data to component format
 function transformPlaylistTrack(pt: PlaylistTrack): any {
@@ -23,6 +24,7 @@ function transformPlaylistTrack(pt: PlaylistTrack): any {
     addedTime: formatTimeAgo(pt.added_at),
     votes: pt.votes,
     isPlaying: pt.is_playing,
+    playedAt: pt.played_at,
     cover: pt.track.cover_url || "/placeholder.jpg",
     position: pt.position,
     track_id: pt.track_id,
@@ -58,8 +60,14 @@ function formatTimeAgo(dateString: string): string {
 export default function Home() {
   const [isOnline, setIsOnline] = useState(true)
   const [playlistTracks, setPlaylistTracks] = useState<any[]>([])
+  const [queueMode, setQueueMode] = useState<QueueMode>("position")
   const [libraryTracks, setLibraryTracks] = useState<any[]>([])
+  const [libraryQuery, setLibraryQuery] = useState<TrackQuery>({})
+  const [libraryCursor, setLibraryCursor] = useState<string | null>(null)
+  const libraryRequestRef = useRef<{ cursor?: string }>({})
   const [durationElapsed, setDurationElapsed] = useState(0)
+  // Server clock minus ours, in ms, from the timestamps on server events
+  const clockOffsetRef = useRef(0)
   const [isLoading, setIsLoading] = useState(true)
   const [error, setError] = useState<string | null>(null)
 
@@ -69,15 +77,14 @@ export default function Home() {
       setIsLoading(true)
       setError(null)
       
-      const [tracks, playlist] = await Promise.all([
-        api.getTracks(),
+      const [{ tracks, nextCursor }, playlist, mode] = await Promise.all([
+        api.getTracks(libraryQuery),
         api.getPlaylist(),
+        api.getQueueMode(),
       ])
 
       // Transform playlist tracks
-      const transformedPlaylist = playlist
-        .sort((a, b) => a.position - b.position)
-        .map(transformPlaylistTrack)
+      const transformedPlaylist = sortQueue(playlist.map(transformPlaylistTrack), mode)
 
       // Transform library tracks and mark which are in playlist
       const playlistTrackIds = new Set(playlist.map((pt) => pt.track_id))
@@ -85,22 +92,59 @@ export default function Home() {
         transformLibraryTrack(track, playlistTrackIds.has(track.id))
       )
 
+      setQueueMode(mode)
       setPlaylistTracks(transformedPlaylist)
       setLibraryTracks(transformedLibrary)
+      setLibraryCursor(nextCursor)
     } catch (err: any) {
       console.error("Failed to load data:", err)
       setError(err?.error?.message || "Failed to load data")
     } finally {
       setIsLoading(false)
     }
+    // Library searches reload only the library, see loadLibrary
+    // eslint-disable-next-line react-hooks/exhaustive-deps
   }, [])
 
   useEffect(() => {
     loadData()
   }, [loadData])
 
+  // Load a page of the library; the server does the searching and filtering
+  const loadLibrary = useCallback(
+    async (query: TrackQuery, cursor?: string) => {
+      // Scrolling fires repeatedly; fetch each page only once
+      if (cursor && libraryRequestRef.current.cursor === cursor) return
+      const request = { cursor }
+      libraryRequestRef.current = request
+      try {
+        const { tracks, nextCursor } = await api.getTracks({ ...query, cursor })
+        // A newer search or page superseded this one
+        if (libraryRequestRef.current !== request) return
+        const playlistTrackIds = new Set(playlistTracks.map((t) => t.track_id))
+        const page = tracks.map((track) =>
+          transformLibraryTrack(track, playlistTrackIds.has(track.id))
+        )
+        setLibraryTracks((prev) => (cursor ? [...prev, ...page] : page))
+        setLibraryCursor(nextCursor)
+      } catch (err) {
+        console.error("Failed to load tracks:", err)
+      }
+    },
+    [playlistTracks]
+  )
+
+  const handleLibrarySearch = (query: TrackQuery) => {
+    setLibraryQuery(query)
+    loadLibrary(query)
+  }
+
+  const handleLoadMoreTracks = () => {
+    if (libraryCursor) loadLibrary(libraryQuery, libraryCursor)
+  }
+
   // WebSocket connection for realtime updates
-  const { isConnected: wsConnected } = useWebSocket({
+  const { isConnected: wsConnected, sendCommand } = useWebSocket({
     onMessage: (event: WebSocketEvent) => {
       handleWebSocketEvent(event)
     },
@@ -122,8 +166,12 @@ export default function Home() {
         if (event.item) {
           const newTrack = transformPlaylistTrack(event.item)
           setPlaylistTracks((prev) => {
-            const updated = [...prev, newTrack].sort((a, b) => a.position - b.position)
-            return updated
+            // Votes mode: the server says where the new item ranks
+            if (event.rank !== undefined) {
+              return placeAtRanks(prev, [{ item: newTrack, rank: event.rank }])
+            }
+            const updated = [...prev.filter((t) => t.id !== newTrack.id), newTrack]
+            return updated.sort((a, b) => a.position - b.position)
           })
           // Update library to mark track as in playlist
           setLibraryTracks((prev) =>
@@ -151,83 +199,154 @@ export default function Home() {
 
       case "track.moved":
         if (event.item) {
-          setPlaylistTracks((prev) =>
-            prev
-              .map((t) =>
-                t.id === event.item!.id
-                  ? { ...t, position: event.item!.position }
-                  : t
-              )
-              .sort((a, b) => a.position - b.position)
-          )
+          setPlaylistTracks((prev) => {
+            const moved = prev.map((t) =>
+              t.id === event.item!.id
+                ? { ...t, position: event.item!.position }
+                : t
+            )
+            if (event.item!.rank !== undefined) {
+              const item = moved.find((t) => t.id === event.item!.id)
+              return item ? placeAtRanks(moved, [{ item, rank: event.item!.rank }]) : moved
+            }
+            return moved.sort((a, b) => a.position - b.position)
+          })
         }
         break
 
       case "track.voted":
-        if (event.item) {
+        if (event.item || event.items) {
+          // Coalesced votes arrive as one event listing every changed item
+          const entries: any[] = event.items ?? [event.item]
+          const voted = new Map(entries.map((item) => [item.id, item.votes]))
+          setPlaylistTracks((prev) => {
+            const updated = prev.map((t) =>
+              voted.has(t.id) ? { ...t, votes: voted.get(t.id) } : t
+            )
+            // Votes mode: move only the voted items, to their new ranks
+            const ranked = entries
+              .filter((entry) => entry.rank !== undefined)
+              .map((entry) => ({ item: updated.find((t) => t.id === entry.id), rank: entry.rank }))
+              .filter(({ item }) => item)
+            return ranked.length ? placeAtRanks(updated, ranked) : updated
+          })
+        }
+        break
+
+      case "track.playing":
+        if (event.id) {
+          if (event.server_time) {
+            clockOffsetRef.current = Date.parse(event.server_time) - Date.now()
+          }
+          // Stopped items report is_playing: false; older servers omit it
+          const playing = event.is_playing !== false
           setPlaylistTracks((prev) =>
             prev.map((t) =>
-              t.id === event.item!.id ? { ...t, votes: event.item!.votes } : t
+              t.id === event.id
+                ? { ...t, isPlaying: playing, playedAt: event.played_at ?? t.playedAt }
+                : playing
+                  ? { ...t, isPlaying: false }
+                  : t
             )
           )
         }
         break
 
-      case "track.playing":
-        if (event.id) {
+      case "playlist.rebalanced":
+        if (event.items) {
+          const renumbered = new Map(event.items.map((item) => [item.id, item.position]))
           setPlaylistTracks((prev) =>
-            prev.map((t) => ({
-              ...t,
-              isPlaying: t.id === event.id,
-            }))
+            prev
+              .map((t) =>
+                renumbered.has(t.id) ? { ...t, position: renumbered.get(t.id) } : t
+              )
+              .sort((a, b) => a.position - b.position)
+          )
+        }
+        break
+
+      case "playlist.batch":
+        if (event.operations) {
+          const operations = event.operations
+          setPlaylistTracks((prev) => applyBatch(prev, operations, queueMode, transformPlaylistTrack))
+          // Library flags follow the tracks added and removed
+          const inPlaylist = new Map<string, boolean>()
+          for (const operation of operations) {
+            if (operation.op === "add" && operation.item) {
+              inPlaylist.set(operation.item.track.id, true)
+            } else if (operation.op === "remove") {
+              const removed = playlistTracks.find((t) => t.id === operation.id)
+              if (removed) inPlaylist.set(removed.track_id, false)
+            }
+          }
+          setLibraryTracks((prev) =>
+            prev.map((t) => (inPlaylist.has(t.id) ? { ...t, inPlaylist: inPlaylist.get(t.id) } : t))
           )
-          setDurationElapsed(0)
         }
         break
 
-      case "playlist.reordered":
+      case "playlist.mode":
+        if (event.mode) {
+          const mode = event.mode
+          setQueueMode(mode)
+          setPlaylistTracks((prev) => {
+            if (!event.order) return sortQueue(prev, mode)
+            const byId = new Map(prev.map((t) => [t.id, t]))
+            return event.order.map((id) => byId.get(id)).filter(Boolean)
+          })
+        }
+        break
+
+      case "playlist.snapshot":
         if (event.items) {
-          const reordered = event.items
-            .map(transformPlaylistTrack)
-            .sort((a, b) => a.position - b.position)
-          setPlaylistTracks(reordered)
+          // Items arrive in the room's queue order
+          const mode = event.mode ?? "position"
+          setQueueMode(mode)
+          setPlaylistTracks(sortQueue(event.items.map(transformPlaylistTrack), mode))
         }
         break
 
       case "ping":
-        // Heartbeat - no action needed
+        if (event.ts) {
+          clockOffsetRef.current = Date.parse(event.ts) - Date.now()
+        }
         break
     }
-  }, [playlistTracks])
+  }, [playlistTracks, queueMode])
 
-  // Simulate playback progression
+  // Playback position from the server's clock; the server advances tracks
   useEffect(() => {
-    const interval = setInterval(() => {
-      setDurationElapsed((prev) => {
-        const currentTrack = playlistTracks.find((t) => t.isPlaying)
-        if (currentTrack && prev < currentTrack.duration) {
-          return prev + 1
-        }
-        // Auto-advance to next track
-        if (currentTrack && prev >= currentTrack.duration) {
-          handleSkipTrack()
-          return 0
-        }
-        return 0
-      })
-    }, 1000)
+    const update = () => {
+      const currentTrack = playlistTracks.find((t) => t.isPlaying)
+      if (!currentTrack?.playedAt) {
+        setDurationElapsed(0)
+        return
+      }
+      const serverNow = Date.now() + clockOffsetRef.current
+      const elapsed = Math.floor((serverNow - Date.parse(currentTrack.playedAt)) / 1000)
+      setDurationElapsed(Math.min(Math.max(elapsed, 0), currentTrack.duration))
+    }
+    update()
+    const interval = setInterval(update, 1000)
     return () => clearInterval(interval)
   }, [playlistTracks])
 
+  // Mutations go over the open socket, skipping an HTTP request each;
+  // REST is the fallback while disconnected
+  const mutate = <T,>(command: SocketCommand, viaRest: () => Promise<T>): Promise<T> =>
+    wsConnected ? sendCommand<T>(command) : viaRest()
+
   const handleAddToPlaylist = async (track: any) => {
     try {
-      const addedTrack = await api.addToPlaylist(track.id, "You")
+      const addedTrack = await mutate<PlaylistTrack>(
+        { type: "add", track_id: track.id, added_by: "You" },
+        () => api.addToPlaylist(track.id, "You")
+      )
       // WebSocket will handle the update, but we can optimistically update
       const newTrack = transformPlaylistTrack(addedTrack)
-      setPlaylistTracks((prev) => {
-        const updated = [...prev, newTrack].sort((a, b) => a.position - b.position)
-        return updated
-      })
+      setPlaylistTracks((prev) =>
+        sortQueue([...prev.filter((t) => t.id !== newTrack.id), newTrack], queueMode)
+      )
       setLibraryTracks((prev) =>
         prev.map((t) => (t.id === track.id ? { ...t, inPlaylist: true } : t))
       )
@@ -243,7 +362,7 @@ export default function Home() {
 
   const handleRemoveTrack = async (trackId: string) => {
     try {
-      await api.removeFromPlaylist(trackId)
+      await mutate({ type: "remove", id: trackId }, () => api.removeFromPlaylist(trackId))
       // WebSocket will handle the update
       setPlaylistTracks((prev) => prev.filter((t) => t.id !== trackId))
       const removedTrack = playlistTracks.find((t) => t.id === trackId)
@@ -262,7 +381,7 @@ export default function Home() {
 
   const handleVote = async (trackId: string, voteType: "up" | "down") => {
     try {
-      await api.vote(trackId, voteType)
+      await mutate({ type: "vote", id: trackId, direction: voteType }, () => api.vote(trackId, voteType))
       // WebSocket will handle the update
       setPlaylistTracks((prev) =>
         prev.map((t) =>
@@ -276,6 +395,15 @@ export default function Home() {
     }
   }
 
+  const handleQueueModeChange = async (mode: QueueMode) => {
+    try {
+      // The playlist.mode event reorders the list
+      await api.setQueueMode(mode)
+    } catch (err) {
+      console.error("Failed to change queue mode:", err)
+    }
+  }
+
   const handleReorderTracks = async (startIndex: number, endIndex: number) => {
     if (startIndex === endIndex) return
 
@@ -294,11 +422,13 @@ export default function Home() {
       const updated = playlistTracks.map((t) =>
         t.id === draggedTrack.id ? { ...t, position: newPosition } : t
       )
-      const sorted = updated.sort((a, b) => a.position - b.position)
-      setPlaylistTracks(sorted)
+      // In votes mode position only breaks ties between equal votes
+      setPlaylistTracks(sortQueue(updated, queueMode))
 
       // Update on server
-      await api.updatePlaylistTrack(draggedTrack.id, { position: newPosition })
+      await mutate({ type: "move", id: draggedTrack.id, position: newPosition }, () =>
+        api.updatePlaylistTrack(draggedTrack.id, { position: newPosition })
+      )
       // WebSocket will broadcast the update
     } catch (err) {
       console.error("Failed to reorder:", err)
@@ -312,14 +442,10 @@ export default function Home() {
     if (currentIndex < playlistTracks.length - 1) {
       const nextTrack = playlistTracks[currentIndex + 1]
       try {
-        // Stop current track
-        if (currentIndex >= 0) {
-          const currentTrack = playlistTracks[currentIndex]
-          await api.updatePlaylistTrack(currentTrack.id, { is_playing: false })
-        }
-        // Start next track
-        await api.updatePlaylistTrack(nextTrack.id, { is_playing: true })
-        setDurationElapsed(0)
+        // Starting the next track stops the current one on the server
+        await mutate({ type: "play", id: nextTrack.id }, () =>
+          api.updatePlaylistTrack(nextTrack.id, { is_playing: true })
+        )
       } catch (err) {
         console.error("Failed to skip track:", err)
       }
@@ -367,8 +493,16 @@ export default function Home() {
             onVote={handleVote}
             onReorder={handleReorderTracks}
             onlineStatus={connectionStatus}
+            queueMode={queueMode}
+            onQueueModeChange={handleQueueModeChange}
+          />
+          <TrackLibraryPanel
+            tracks={libraryTracks}
+            hasMore={libraryCursor !== null}
+            onSearch={handleLibrarySearch}
+            onLoadMore={handleLoadMoreTracks}
+            onAddToPlaylist={handleAddToPlaylist}
           />
-          <TrackLibraryPanel tracks={libraryTracks} onAddToPlaylist={handleAddToPlaylist} />
         </div>
       </div>
       {currentTrack && (
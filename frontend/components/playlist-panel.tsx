@@ -26,9 +26,19 @@ interface PlaylistPanelProps {
   onVote: (trackId: string, voteType: "up" | "down") => void
   onReorder: (startIndex: number, endIndex: number) => void
   onlineStatus: boolean
+  queueMode?: "position" | "votes"
+  onQueueModeChange?: (mode: "position" | "votes") => void
 }
 
-export default function PlaylistPanel({ tracks, onRemove, onVote, onReorder, onlineStatus }: PlaylistPanelProps) {
+export default function PlaylistPanel({
+  tracks,
+  onRemove,
+  onVote,
+  onReorder,
+  onlineStatus,
+  queueMode = "position",
+  onQueueModeChange,
+}: PlaylistPanelProps) {
   const [draggedIndex, setDraggedIndex] = useState<number | null>(null)
 
   const handleDragStart = (index: number) => {
@@ -65,6 +75,14 @@ export default function PlaylistPanel({ tracks, onRemove, onVote, onReorder, onl
             total
           </div>
           <div>Last updated now</div>
+          {onQueueModeChange && (
+            <button
+              onClick={() => onQueueModeChange(queueMode === "votes" ? "position" : "votes")}
+              className="ml-auto font-semibold text-card-foreground hover:text-accent"
+            >
+              {queueMode === "votes" ? "Sorted by votes" : "Sort by votes"}
+            </button>
+          )}
         </div>
       </div>
 
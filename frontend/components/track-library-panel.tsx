@@ -1,6 +1,6 @@
 "use client"
 
-import { useState } from "react"
+import { useEffect, useRef, useState } from "react"
 import { Search, Plus } from "lucide-react"
 
 interface Track {
@@ -15,6 +15,9 @@ interface Track {
 
 interface TrackLibraryPanelProps {
   tracks: Track[]
+  hasMore: boolean
+  onSearch: (query: { q?: string; genre?: string }) => void
+  onLoadMore: () => void
   onAddToPlaylist: (track: Track) => void
 }
 
@@ -31,17 +34,39 @@ const GENRES = [
   "Indie",
 ]
 
-export default function TrackLibraryPanel({ tracks, onAddToPlaylist }: TrackLibraryPanelProps) {
+export default function TrackLibraryPanel({
+  tracks,
+  hasMore,
+  onSearch,
+  onLoadMore,
+  onAddToPlaylist,
+}: TrackLibraryPanelProps) {
   const [searchQuery, setSearchQuery] = useState("")
   const [selectedGenre, setSelectedGenre] = useState("All")
+  const isFirstSearch = useRef(true)
 
-  const filteredTracks = tracks.filter((track) => {
-    const matchesSearch =
-      track.title.toLowerCase().includes(searchQuery.toLowerCase()) ||
-      track.artist.toLowerCase().includes(searchQuery.toLowerCase())
-    const matchesGenre = selectedGenre === "All" || track.genre === selectedGenre
-    return matchesSearch && matchesGenre
-  })
+  // Search on the server, debounced while typing
+  useEffect(() => {
+    if (isFirstSearch.current) {
+      isFirstSearch.current = false
+      return
+    }
+    const timeout = setTimeout(() => {
+      onSearch({
+        q: searchQuery.trim() || undefined,
+        genre: selectedGenre === "All" ? undefined : selectedGenre,
+      })
+    }, 250)
+    return () => clearTimeout(timeout)
+    // eslint-disable-next-line react-hooks/exhaustive-deps
+  }, [searchQuery, selectedGenre])
+
+  const handleScroll = (e: React.UIEvent<HTMLDivElement>) => {
+    const { scrollTop, scrollHeight, clientHeight } = e.currentTarget
+    if (hasMore && scrollHeight - scrollTop - clientHeight < 200) {
+      onLoadMore()
+    }
+  }
 
   const minutesDuration = (seconds: number) => {
     const m = Math.floor(seconds / 60)
@@ -59,7 +84,7 @@ export default function TrackLibraryPanel({ tracks, onAddToPlaylist }: TrackLibr
           <Search className="absolute left-3 top-3 w-4 h-4 text-muted-foreground" />
           <input
             type="text"
-            placeholder="Search by title or artist..."
+            placeholder="Search by title, artist or album..."
             value={searchQuery}
             onChange={(e) => setSearchQuery(e.target.value)}
             className="w-full pl-9 pr-3 py-2 bg-secondary border border-border rounded-lg text-sm text-card-foreground placeholder-muted-foreground focus:outline-none focus:ring-2 focus:ring-accent"
@@ -84,16 +109,16 @@ export default function TrackLibraryPanel({ tracks, onAddToPlaylist }: TrackLibr
         </div>
       </div>
 
-      {filteredTracks.length === 0 ? (
+      {tracks.length === 0 ? (
         <div className="flex-1 flex flex-col items-center justify-center p-6 text-center">
           <Search className="w-10 h-10 text-muted-foreground/40 mb-3" />
           <p className="text-card-foreground font-semibold mb-1">No tracks found</p>
           <p className="text-muted-foreground text-xs">Try adjusting your search or filters</p>
         </div>
       ) : (
-        <div className="flex-1 overflow-y-auto">
+        <div className="flex-1 overflow-y-auto" onScroll={handleScroll}>
           <div className="divide-y divide-border">
-            {filteredTracks.map((track) => (
+            {tracks.map((track) => (
               <div key={track.id} className="p-3 hover:bg-secondary/30 transition-all">
                 <div className="flex items-center gap-3">
                   <div className="relative w-9 h-9 rounded-md overflow-hidden flex-shrink-0 bg-secondary/50">
@@ -3,6 +3,8 @@
  */
 
 import { useEffect, useRef, useState, useCallback } from 'react';
+import { currentRoom, DEFAULT_ROOM, type BatchResult } from '@/lib/api';
+import { decodeFrame, WS_SUBPROTOCOLS } from '@/lib/wire';
 
 const WS_URL = process.env.NEXT_PUBLIC_WS_URL || 'ws://localhost:4000';
 
@@ -13,13 +15,45 @@ export interface WebSocketEvent {
     | 'track.moved'
     | 'track.voted'
     | 'track.playing'
-    | 'playlist.reordered'
+    | 'playlist.rebalanced'
+    | 'playlist.mode'
+    | 'playlist.batch'
+    | 'playlist.snapshot'
+    | 'ack'
     | 'ping'
     | 'pong';
   item?: any;
   id?: string;
   items?: any[];
   ts?: string;
+  version?: number;
+  is_playing?: boolean;
+  played_at?: string | null;
+  server_time?: string;
+  rank?: number;
+  mode?: 'position' | 'votes';
+  order?: string[];
+  operations?: BatchResult[];
+  request_id?: string;
+  ok?: boolean;
+  data?: any;
+  // Set on the events of a mutation sent with a trace ID
+  trace?: { id: string; ts: number };
+}
+
+// Mutations the server accepts over the socket, acknowledged by request_id
+export type SocketCommand =
+  | { type: 'add'; track_id: string; added_by?: string }
+  | { type: 'remove'; id: string }
+  | { type: 'vote'; id: string; direction: 'up' | 'down' }
+  | { type: 'reorder'; id: string; target_index: number }
+  | { type: 'move'; id: string; position: number }
+  | { type: 'play'; id: string; is_playing?: boolean }
+  | { type: 'batch'; operations: any[] };
+
+interface PendingCommand {
+  resolve: (data: any) => void;
+  reject: (error: any) => void;
 }
 
 export interface UseWebSocketOptions {
@@ -46,6 +80,11 @@ export function useWebSocket(options: UseWebSocketOptions = {}) {
   const wsRef = useRef<WebSocket | null>(null);
   const reconnectTimeoutRef = useRef<NodeJS.Timeout | null>(null);
   const shouldReconnectRef = useRef(true);
+  const versionRef = useRef<number | null>(null);
+  const pendingRef = useRef(new Map<string, PendingCommand>());
+  const requestIdRef = useRef(0);
+  // Start times of this client's traced commands, by trace ID
+  const tracesRef = useRef(new Map<string, number>());
 
   const connect = useCallback(() => {
     if (wsRef.current?.readyState === WebSocket.OPEN) {
@@ -53,7 +92,11 @@ export function useWebSocket(options: UseWebSocketOptions = {}) {
     }
 
     try {
-      const ws = new WebSocket(`${WS_URL}/ws/playlist/`);
+      // Resume from the last applied version so the server replays only missed events
+      const since = versionRef.current !== null ? `?since=${versionRef.current}` : '';
+      const room = currentRoom();
+      const roomPath = room === DEFAULT_ROOM ? '' : `${encodeURIComponent(room)}/`;
+      const ws = new WebSocket(`${WS_URL}/ws/playlist/${roomPath}${since}`, WS_SUBPROTOCOLS);
       wsRef.current = ws;
 
       ws.onopen = () => {
@@ -64,7 +107,34 @@ export function useWebSocket(options: UseWebSocketOptions = {}) {
 
       ws.onmessage = (event) => {
         try {
-          const data: WebSocketEvent = JSON.parse(event.data);
+          const data: WebSocketEvent = decodeFrame(event.data, ws.protocol);
+          if (data.type === 'ack') {
+            const pending = pendingRef.current.get(data.request_id!);
+            pendingRef.current.delete(data.request_id!);
+            // Failed commands reject with the same body as the REST error
+            if (data.ok) pending?.resolve(data.data);
+            else pending?.reject(data);
+            return;
+          }
+          if (data.version !== undefined) {
+            const lastVersion = versionRef.current;
+            if (data.type !== 'playlist.snapshot' && lastVersion !== null) {
+              // Already applied (replayed and then broadcast again)
+              if (data.version <= lastVersion) {
+                return;
+              }
+              // Ask for a full snapshot if we missed any versioned event
+              if (data.version > lastVersion + 1) {
+                ws.send(JSON.stringify({ type: 'resync' }));
+              }
+            }
+            versionRef.current = data.version;
+          }
+          const startedAt = data.trace && tracesRef.current.get(data.trace.id);
+          if (startedAt !== undefined) {
+            tracesRef.current.delete(data.trace!.id);
+            console.debug(`${data.type} round trip: ${(performance.now() - startedAt).toFixed(1)} ms`);
+          }
           onMessage?.(data);
         } catch (error) {
           console.error('Failed to parse WebSocket message:', error);
@@ -73,6 +143,12 @@ export function useWebSocket(options: UseWebSocketOptions = {}) {
 
       ws.onclose = () => {
         setIsConnected(false);
+        // Commands in flight are lost with the connection
+        pendingRef.current.forEach(({ reject }) =>
+          reject({ error: { code: 'DISCONNECTED', message: 'WebSocket closed' } })
+        );
+        pendingRef.current.clear();
+        tracesRef.current.clear();
         onClose?.();
 
         // Attempt to reconnect
@@ -105,6 +181,22 @@ export function useWebSocket(options: UseWebSocketOptions = {}) {
     }
   }, []);
 
+  // Send a mutation over the open socket; resolves with its ack's data
+  const sendCommand = useCallback(<T = any>(command: SocketCommand): Promise<T> => {
+    const ws = wsRef.current;
+    if (!ws || ws.readyState !== WebSocket.OPEN) {
+      return Promise.reject({ error: { code: 'DISCONNECTED', message: 'WebSocket is not open' } });
+    }
+    const requestId = String(++requestIdRef.current);
+    // Timed until the broadcast of the change reaches this socket
+    const traceId = `${Date.now().toString(36)}-${requestId}`;
+    tracesRef.current.set(traceId, performance.now());
+    return new Promise<T>((resolve, reject) => {
+      pendingRef.current.set(requestId, { resolve, reject });
+      ws.send(JSON.stringify({ ...command, request_id: requestId, trace_id: traceId }));
+    });
+  }, []);
+
   useEffect(() => {
     connect();
     return () => {
@@ -117,6 +209,7 @@ export function useWebSocket(options: UseWebSocketOptions = {}) {
     reconnectAttempts,
     connect,
     disconnect,
+    sendCommand,
   };
 }
 
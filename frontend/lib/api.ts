@@ -4,6 +4,20 @@
 
 const API_URL = process.env.NEXT_PUBLIC_API_URL || 'http://localhost:4000/api';
 
+export const DEFAULT_ROOM = 'default';
+
+// Playlist room of this page, chosen with ?room=<id> in the URL
+export function currentRoom(): string {
+  if (typeof window === 'undefined') return DEFAULT_ROOM;
+  return new URLSearchParams(window.location.search).get('room') || DEFAULT_ROOM;
+}
+
+function playlistUrl(path: string = ''): string {
+  const room = currentRoom();
+  const base = room === DEFAULT_ROOM ? API_URL : `${API_URL}/rooms/${encodeURIComponent(room)}`;
+  return `${base}/playlist${path}`;
+}
+
 export interface Track {
   id: string;
   title: string;
@@ -26,6 +40,39 @@ export interface PlaylistTrack {
   played_at?: string;
 }
 
+// Order a room lists and plays its items in
+export type QueueMode = 'position' | 'votes';
+
+// One operation of a playlist batch, applied in order
+export type BatchOperation =
+  | { op: 'add'; track_id: string; added_by?: string }
+  | { op: 'remove'; id: string }
+  | { op: 'vote'; id: string; direction: 'up' | 'down' }
+  | { op: 'move'; id: string; position: number };
+
+// Outcome of one batch operation; `rank` is set in votes mode
+export interface BatchResult {
+  op: BatchOperation['op'];
+  id?: string;
+  item?: PlaylistTrack;
+  votes?: number;
+  position?: number;
+  rank?: number;
+}
+
+export interface TrackQuery {
+  q?: string;
+  genre?: string;
+  artist?: string;
+  cursor?: string;
+  limit?: number;
+}
+
+export interface TrackPage {
+  tracks: Track[];
+  nextCursor: string | null;
+}
+
 export interface ApiError {
   error: {
     code: string;
@@ -48,21 +95,44 @@ async function handleResponse<T>(response: Response): Promise<T> {
 }
 
 export const api = {
-  // Get all tracks from library
-  async getTracks(): Promise<Track[]> {
-    const response = await fetch(`${API_URL}/tracks`);
-    return handleResponse<Track[]>(response);
+  // Get one page of the track library, filtered on the server
+  async getTracks(query: TrackQuery = {}): Promise<TrackPage> {
+    const params = new URLSearchParams();
+    Object.entries(query).forEach(([key, value]) => {
+      if (value !== undefined && value !== '') params.set(key, String(value));
+    });
+    const response = await fetch(`${API_URL}/tracks?${params}`);
+    const tracks = await handleResponse<Track[]>(response);
+    return { tracks, nextCursor: response.headers.get('X-Next-Cursor') };
   },
 
   // Get current playlist
   async getPlaylist(): Promise<PlaylistTrack[]> {
-    const response = await fetch(`${API_URL}/playlist`);
+    const response = await fetch(playlistUrl());
     return handleResponse<PlaylistTrack[]>(response);
   },
 
+  // Get the room's queue mode
+  async getQueueMode(): Promise<QueueMode> {
+    const response = await fetch(playlistUrl('/mode'));
+    return (await handleResponse<{ mode: QueueMode }>(response)).mode;
+  },
+
+  // Switch the room between position and votes order
+  async setQueueMode(mode: QueueMode): Promise<QueueMode> {
+    const response = await fetch(playlistUrl('/mode'), {
+      method: 'PUT',
+      headers: {
+        'Content-Type': 'application/json',
+      },
+      body: JSON.stringify({ mode }),
+    });
+    return (await handleResponse<{ mode: QueueMode }>(response)).mode;
+  },
+
   // Add track to playlist
   async addToPlaylist(trackId: string, addedBy: string = 'Anonymous'): Promise<PlaylistTrack> {
-    const response = await fetch(`${API_URL}/playlist`, {
+    const response = await fetch(playlistUrl(), {
       method: 'POST',
       headers: {
         'Content-Type': 'application/json',
@@ -80,7 +150,7 @@ export const api = {
     playlistId: string,
     updates: { position?: number; is_playing?: boolean }
   ): Promise<PlaylistTrack> {
-    const response = await fetch(`${API_URL}/playlist/${playlistId}`, {
+    const response = await fetch(playlistUrl(`/${playlistId}`), {
       method: 'PATCH',
       headers: {
         'Content-Type': 'application/json',
@@ -92,7 +162,7 @@ export const api = {
 
   // Delete track from playlist
   async removeFromPlaylist(playlistId: string): Promise<void> {
-    const response = await fetch(`${API_URL}/playlist/${playlistId}`, {
+    const response = await fetch(playlistUrl(`/${playlistId}`), {
       method: 'DELETE',
     });
     if (!response.ok) {
@@ -102,7 +172,7 @@ export const api = {
 
   // Vote on a track
   async vote(playlistId: string, direction: 'up' | 'down'): Promise<PlaylistTrack> {
-    const response = await fetch(`${API_URL}/playlist/${playlistId}/vote`, {
+    const response = await fetch(playlistUrl(`/${playlistId}/vote`), {
       method: 'POST',
       headers: {
         'Content-Type': 'application/json',
@@ -112,16 +182,28 @@ export const api = {
     return handleResponse<PlaylistTrack>(response);
   },
 
+  // Apply several operations atomically, with one broadcast
+  async batch(operations: BatchOperation[]): Promise<BatchResult[]> {
+    const response = await fetch(playlistUrl('/batch'), {
+      method: 'POST',
+      headers: {
+        'Content-Type': 'application/json',
+      },
+      body: JSON.stringify({ operations }),
+    });
+    return (await handleResponse<{ results: BatchResult[] }>(response)).results;
+  },
+
   // Reorder track to new position
-  async reorderTrack(playlistId: string, targetIndex: number): Promise<PlaylistTrack[]> {
-    const response = await fetch(`${API_URL}/playlist/${playlistId}/reorder`, {
+  async reorderTrack(playlistId: string, targetIndex: number): Promise<PlaylistTrack> {
+    const response = await fetch(playlistUrl(`/${playlistId}/reorder`), {
       method: 'POST',
       headers: {
         'Content-Type': 'application/json',
       },
       body: JSON.stringify({ target_index: targetIndex }),
     });
-    return handleResponse<PlaylistTrack[]>(response);
+    return handleResponse<PlaylistTrack>(response);
   },
 };
 
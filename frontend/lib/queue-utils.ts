@@ -0,0 +1,75 @@
+/**
+ * Utility functions for keeping the playlist in its queue order
+ */
+
+import type { BatchResult, PlaylistTrack, QueueMode } from './api';
+
+export interface QueuedItem {
+  id: string;
+  position: number;
+  votes: number;
+}
+
+/**
+ * Sort items into the queue order of a mode. Used for full loads only;
+ * in votes mode events carry ranks, see placeAtRanks.
+ */
+export function sortQueue<T extends QueuedItem>(items: T[], mode: QueueMode): T[] {
+  if (mode === 'votes') {
+    return [...items].sort((a, b) => b.votes - a.votes || a.position - b.position);
+  }
+  return [...items].sort((a, b) => a.position - b.position);
+}
+
+/**
+ * Move items to the ranks the server reported, without re-sorting.
+ * The items are taken out and put back in ascending rank order, so every
+ * other item keeps its relative place.
+ */
+export function placeAtRanks<T extends { id: string }>(
+  items: T[],
+  ranked: { item: T; rank: number }[]
+): T[] {
+  const moving = new Set(ranked.map(({ item }) => item.id));
+  const result = items.filter((item) => !moving.has(item.id));
+  for (const { item, rank } of [...ranked].sort((a, b) => a.rank - b.rank)) {
+    result.splice(Math.min(rank, result.length), 0, item);
+  }
+  return result;
+}
+
+/**
+ * Replay the operations of a playlist.batch event in order. In votes mode
+ * every result that moves an item carries its rank at that point.
+ */
+export function applyBatch<T extends QueuedItem>(
+  items: T[],
+  operations: BatchResult[],
+  mode: QueueMode,
+  toItem: (item: PlaylistTrack) => T
+): T[] {
+  let result = items;
+  for (const operation of operations) {
+    let moved: T | undefined;
+    if (operation.op === 'add' && operation.item) {
+      moved = toItem(operation.item);
+      result = [...result.filter((item) => item.id !== moved!.id), moved];
+    } else if (operation.op === 'remove') {
+      result = result.filter((item) => item.id !== operation.id);
+    } else {
+      result = result.map((item) => {
+        if (item.id !== operation.id) return item;
+        moved = {
+          ...item,
+          votes: operation.votes ?? item.votes,
+          position: operation.position ?? item.position,
+        };
+        return moved;
+      });
+    }
+    if (moved && operation.rank !== undefined) {
+      result = placeAtRanks(result, [{ item: moved, rank: operation.rank }]);
+    }
+  }
+  return mode === 'votes' ? result : sortQueue(result, mode);
+}
@@ -0,0 +1,77 @@
+/**
+ * Compact WebSocket encoding (the playlist.compact subprotocol), which
+ * sends events with short keys and type codes; see backend/playlist/wire.py
+ */
+
+export const WS_ENCODING = process.env.NEXT_PUBLIC_WS_ENCODING === 'compact' ? 'compact' : 'json';
+
+export const WS_SUBPROTOCOLS = WS_ENCODING === 'compact' ? ['playlist.compact', 'playlist.json'] : [];
+
+// Short key -> key, the inverse of COMPACT_KEYS on the server
+const EXPANDED_KEYS: Record<string, string> = {
+  t: 'type',
+  v: 'version',
+  i: 'item',
+  l: 'items',
+  p: 'position',
+  n: 'votes',
+  r: 'rank',
+  k: 'track',
+  K: 'track_id',
+  a: 'title',
+  b: 'artist',
+  c: 'album',
+  d: 'duration_seconds',
+  g: 'genre',
+  u: 'cover_url',
+  w: 'added_by',
+  x: 'added_at',
+  y: 'is_playing',
+  z: 'played_at',
+  s: 'server_time',
+  m: 'mode',
+  o: 'order',
+  O: 'operations',
+  q: 'request_id',
+  D: 'data',
+  T: 'trace',
+  S: 'status',
+  e: 'error',
+  C: 'code',
+  M: 'message',
+  E: 'details',
+  R: 'results',
+};
+
+// Type code -> event type, the inverse of COMPACT_TYPES on the server
+const EXPANDED_TYPES: Record<string, string> = {
+  ta: 'track.added',
+  tr: 'track.removed',
+  tm: 'track.moved',
+  tv: 'track.voted',
+  tp: 'track.playing',
+  pr: 'playlist.rebalanced',
+  pm: 'playlist.mode',
+  pb: 'playlist.batch',
+  ps: 'playlist.snapshot',
+  k: 'ack',
+  pi: 'ping',
+  po: 'pong',
+};
+
+// A compact message with its usual keys and event type
+export function expand(value: any): any {
+  if (Array.isArray(value)) return value.map(expand);
+  if (value === null || typeof value !== 'object') return value;
+  const expanded: Record<string, any> = {};
+  for (const [key, item] of Object.entries(value)) {
+    expanded[EXPANDED_KEYS[key] ?? key] = key === 't' ? EXPANDED_TYPES[item as string] ?? item : expand(item);
+  }
+  return expanded;
+}
+
+// Parse a text frame received in the negotiated encoding
+export function decodeFrame(text: string, protocol: string): any {
+  const message = JSON.parse(text);
+  return protocol === 'playlist.compact' ? expand(message) : message;
+}